@@ -0,0 +1,40 @@
+from google.cloud import bigquery
+from google.oauth2 import service_account
+
+from utils.environment import config
+
+
+def add_position_state_columns(client: bigquery.Client, table: str, location: str) -> None:
+    # 列の追加（存在する場合は何もしない）
+    # 既存行は元の position を持たないため NULL のまま（集計状態のマージは値を持つ行のみが対象）
+    ddl = f"""
+        ALTER TABLE `{table}`
+        ADD COLUMN IF NOT EXISTS position_sum FLOAT64,
+        ADD COLUMN IF NOT EXISTS position_count INT64,
+        ADD COLUMN IF NOT EXISTS weighted_position_sum FLOAT64
+    """
+    client.query(ddl, location=location).result()
+
+
+def main() -> None:
+    project_id = config.get_config_value('BIGQUERY', 'PROJECT_ID')
+    dataset_id = config.get_config_value('BIGQUERY', 'DATASET_ID')
+    table_id = config.get_config_value('BIGQUERY', 'TABLE_ID')
+    location = config.get_config_value('BIGQUERY', 'LOCATION', 'asia-northeast1')
+    table = f"{project_id}.{dataset_id}.{table_id}"
+
+    credentials_path = config.credentials_path
+    credentials = service_account.Credentials.from_service_account_file(str(credentials_path))
+    client = bigquery.Client(credentials=credentials, project=project_id)
+
+    add_position_state_columns(client, table, location)
+
+    print(f"position state columns ready on {table}.")
+    print("Set [BIGQUERY] store_position_state = true in settings.ini to populate them for new rows.")
+    # 例: 週単位のロールアップ
+    #   SUM(position_sum) / SUM(position_count)               -> 平均順位（avg_position と同じ定義）
+    #   SUM(weighted_position_sum) / SUM(impressions)         -> インプレッション加重の平均順位
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+from google.cloud import bigquery
+from google.oauth2 import service_account
+
+from utils.environment import config
+from utils.row_fingerprint import FINGERPRINT_SQL
+
+
+def add_row_fingerprint_column(client: bigquery.Client, table: str, location: str) -> None:
+    # 列の追加（存在する場合は何もしない）
+    ddl = f"""
+        ALTER TABLE `{table}`
+        ADD COLUMN IF NOT EXISTS row_fingerprint STRING
+    """
+    client.query(ddl, location=location).result()
+
+
+def cluster_by_row_fingerprint(client: bigquery.Client, table: str) -> list:
+    # 既存のクラスタリング列（url, query など）の後ろに row_fingerprint を追加（クラスタリング列は最大4列）
+    # 変更後に書き込まれたデータから適用され、既存の行は BigQuery の自動再クラスタリングで順次反映される
+    bq_table = client.get_table(table)
+    fields = list(bq_table.clustering_fields or [])
+    if 'row_fingerprint' not in fields and len(fields) < 4:
+        bq_table.clustering_fields = fields + ['row_fingerprint']
+        bq_table = client.update_table(bq_table, ['clustering_fields'])
+    return list(bq_table.clustering_fields or [])
+
+
+def backfill_row_fingerprint(client: bigquery.Client, table: str, location: str) -> int:
+    # 既存行のフィンガープリントを Python 側（utils.row_fingerprint）と同じ計算式で埋め戻す
+    sql = f"""
+        UPDATE `{table}`
+        SET row_fingerprint = {FINGERPRINT_SQL}
+        WHERE data_date BETWEEN DATE('1900-01-01') AND DATE('9999-12-31')
+          AND row_fingerprint IS NULL
+    """
+    job = client.query(sql, location=location)
+    job.result()
+    return job.num_dml_affected_rows or 0
+
+
+def main() -> None:
+    project_id = config.get_config_value('BIGQUERY', 'PROJECT_ID')
+    dataset_id = config.get_config_value('BIGQUERY', 'DATASET_ID')
+    table_id = config.get_config_value('BIGQUERY', 'TABLE_ID')
+    location = config.get_config_value('BIGQUERY', 'LOCATION', 'asia-northeast1')
+    table = f"{project_id}.{dataset_id}.{table_id}"
+
+    credentials_path = config.credentials_path
+    credentials = service_account.Credentials.from_service_account_file(str(credentials_path))
+    client = bigquery.Client(credentials=credentials, project=project_id)
+
+    add_row_fingerprint_column(client, table, location)
+    clustering_fields = cluster_by_row_fingerprint(client, table)
+    updated = backfill_row_fingerprint(client, table, location)
+
+    print(f"row_fingerprint column ready on {table}. backfilled_rows={updated}, clustering={clustering_fields}")
+    print("Set [BIGQUERY] store_row_fingerprint = true in settings.ini to populate it for new rows.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import random
+import timeit
+
+from utils import record_batch
+from utils.record_batch import RecordBatch
+from utils.url_utils import aggregate_records_python
+
+
+def make_records(count: int, seed: int = 0) -> list:
+    # GSC の query × page に近い分布（クエリ・URLの重複とクエリパラメータ付きURLを含む）
+    rnd = random.Random(seed)
+    return [
+        {
+            "keys": [
+                f"query{rnd.randint(0, count // 3)}",
+                f"https://www.juku.st/info/entry/{rnd.randint(0, count // 10)}?utm_source={rnd.randint(0, 3)}",
+            ],
+            "clicks": rnd.randint(0, 5),
+            "impressions": rnd.randint(1, 500),
+            "position": rnd.random() * 50,
+        }
+        for _ in range(count)
+    ]
+
+
+def same_output(expected: list, actual: list) -> bool:
+    if len(expected) != len(actual):
+        return False
+    for a, b in zip(expected, actual):
+        if (a["query"], a["url"], a["clicks"], a["impressions"]) != (b["query"], b["url"], b["clicks"], b["impressions"]):
+            return False
+        if abs(a["avg_position"] - b["avg_position"]) > 1e-9:
+            return False
+    return True
+
+
+def aggregate_batch(batch: RecordBatch, use_pandas: bool) -> list:
+    # 件数の閾値に関係なく、RecordBatch の辞書による集計と pandas による集計を切り替える
+    threshold = record_batch.PANDAS_MIN_RECORDS
+    record_batch.PANDAS_MIN_RECORDS = 0 if use_pandas else float("inf")
+    try:
+        return batch.aggregate()
+    finally:
+        record_batch.PANDAS_MIN_RECORDS = threshold
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="集計の実装（dict のリスト / RecordBatch の辞書集計 / RecordBatch の pandas 集計）の処理時間を比較します。"
+    )
+    parser.add_argument("--sizes", default="100,1000,5000,25000", help="1ページあたりのレコード数（カンマ区切り）")
+    parser.add_argument("--repeat", type=int, default=5, help="計測回数（最良値を表示）")
+    args = parser.parse_args()
+
+    # 初回呼び出しのインポート等のオーバーヘッドを除外
+    aggregate_batch(RecordBatch.from_rows(make_records(10)), use_pandas=True)
+
+    print(f"{'records':>8} {'list(ms)':>9} {'batch(ms)':>10} {'pandas(ms)':>11}  identical")
+    for size in (int(value) for value in args.sizes.split(",")):
+        records = make_records(size)
+        batch = RecordBatch.from_rows(records)
+        list_ms = min(timeit.repeat(lambda: aggregate_records_python(records), number=1, repeat=args.repeat)) * 1000
+        batch_ms = min(timeit.repeat(lambda: aggregate_batch(batch, False), number=1, repeat=args.repeat)) * 1000
+        pandas_ms = min(timeit.repeat(lambda: aggregate_batch(batch, True), number=1, repeat=args.repeat)) * 1000
+        expected = aggregate_records_python(records)
+        identical = (same_output(expected, aggregate_batch(batch, False))
+                     and same_output(expected, aggregate_batch(batch, True)))
+        print(f"{size:>8} {list_ms:>9.1f} {batch_ms:>10.1f} {pandas_ms:>11.1f}  {identical}")
+
+
+if __name__ == '__main__':
+    main()
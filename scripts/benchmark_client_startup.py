@@ -0,0 +1,66 @@
+import argparse
+import subprocess
+import sys
+import time
+
+# 各モードを新しいプロセスで実行し、API クライアントの構築にかかる時間（モジュールの読み込みを除く）を出力する
+CHILD = """
+import sys, time
+from google.auth.credentials import AnonymousCredentials
+from googleapiclient.discovery import build
+from utils.discovery import build_service
+mode, builds = sys.argv[1], int(sys.argv[2])
+credentials = AnonymousCredentials()
+started = time.perf_counter()
+for _ in range(builds):
+    for name in ("searchconsole", "chat"):
+        if mode == "cached":
+            build_service(name, "v1", credentials=credentials)
+        else:
+            build(name, "v1", credentials=credentials, static_discovery=(mode == "static"))
+print(time.perf_counter() - started)
+"""
+
+MODES = {
+    "network": "build(static_discovery=False): ディスカバリドキュメントを API から取得",
+    "static": "build(): ライブラリ同梱のドキュメントを構築のたびに読み込み・解析",
+    "cached": "build_service(): 同梱のドキュメントをプロセスごとに1回だけ解析",
+}
+
+
+def measure(mode: str, builds: int, repeat: int) -> float:
+    """mode のクライアント構築を新しいプロセスで repeat 回実行し、最短の時間（秒）を返します。"""
+    best = float("inf")
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", CHILD, mode, str(builds)],
+                                capture_output=True, text=True, check=True).stdout
+        best = min(best, float(output.strip().splitlines()[-1]))
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="searchconsole / chat の API クライアント構築時間をディスカバリドキュメントの読み込み方法ごとに比較します。")
+    parser.add_argument("--builds", type=int, default=4,
+                        help="1プロセスで構築するクライアント数（max_workers・プロパティ数に相当）")
+    parser.add_argument("--repeat", type=int, default=3, help="各モードの実行回数（最短時間を表示）")
+    parser.add_argument("--modes", default="static,cached",
+                        help=f"計測するモード（カンマ区切り、{'/'.join(MODES)}。network はネットワーク接続が必要）")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = {}
+    for mode in args.modes.split(","):
+        try:
+            results[mode] = measure(mode, args.builds, args.repeat)
+        except subprocess.CalledProcessError as e:
+            print(f"{mode:<8}: failed ({e.stderr.strip().splitlines()[-1]})")
+    print(f"builds={args.builds} x (searchconsole, chat), repeat={args.repeat} "
+          f"({time.perf_counter() - started:.1f} s in total)")
+    baseline = max(results.values(), default=0)
+    for mode, elapsed in results.items():
+        print(f"{mode:<8}: {elapsed * 1000:8.1f} ms (x{baseline / elapsed:.2f})  {MODES[mode]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import os
+import random
+import time
+
+from utils.parallel_aggregate import ParallelAggregator
+from utils.record_batch import RecordBatch
+from utils.url_utils import aggregate_records
+
+
+def make_rows(count: int, seed: int = 0) -> list:
+    # 1日分の大規模なページ（同じページが多数のクエリで現れる）
+    rnd = random.Random(seed)
+    return [
+        {
+            "keys": [f"塾 おすすめ {rnd.randint(0, count // 3)}",
+                     f"https://www.juku.st/info/entry/{rnd.randint(0, count // 25)}?utm_source={rnd.randint(0, 3)}"],
+            "clicks": rnd.randint(0, 5),
+            "impressions": rnd.randint(1, 500),
+            "position": rnd.random() * 50,
+        }
+        for _ in range(count)
+    ]
+
+
+def timed(func, repeat: int):
+    """func を repeat 回実行し、最後の結果と最短の実行時間を返します。"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="プロセスプールによる並列集計のコア数ごとの速度を比較します。")
+    parser.add_argument("--rows", type=int, default=200000, help="集計するレコード数")
+    parser.add_argument("--processes", default=f"2,4,{os.cpu_count()}", help="計測するプロセス数（カンマ区切り）")
+    parser.add_argument("--repeat", type=int, default=3, help="各条件の実行回数（最短時間を表示）")
+    args = parser.parse_args()
+
+    batch = RecordBatch.from_rows(make_rows(args.rows))
+    expected, sequential = timed(lambda: aggregate_records(batch, include_state=True), args.repeat)
+    print(f"rows={args.rows}, keys={len(expected)}, cpu_count={os.cpu_count()}")
+    print(f"sequential   : {sequential * 1000:8.1f} ms")
+
+    for processes in sorted({int(value) for value in args.processes.split(",")}):
+        if processes <= 1:
+            continue
+        pool = ParallelAggregator(processes, min_records=0)
+        try:
+            # プロセスの起動時間を除くため、1度集計してから計測
+            aggregate_records(batch, include_state=True, pool=pool)
+            result, elapsed = timed(lambda: aggregate_records(batch, include_state=True, pool=pool), args.repeat)
+        finally:
+            pool.close()
+        assert result == expected, f"processes={processes}: output differs from sequential aggregation"
+        print(f"processes={processes:<3}: {elapsed * 1000:8.1f} ms (x{sequential / elapsed:.2f})")
+
+
+if __name__ == '__main__':
+    main()
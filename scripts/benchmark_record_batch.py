@@ -0,0 +1,56 @@
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+
+from utils.record_batch import RecordBatch
+
+
+def make_response(count: int, seed: int = 0) -> str:
+    # Search Analytics API のレスポンス（query × page、同じページが多数のクエリで現れる）
+    rnd = random.Random(seed)
+    rows = [
+        {
+            "keys": [f"塾 おすすめ {rnd.randint(0, count // 3)}",
+                     f"https://www.juku.st/info/entry/{rnd.randint(0, count // 25)}?utm_source={rnd.randint(0, 3)}"],
+            "clicks": rnd.randint(0, 5),
+            "impressions": rnd.randint(1, 500),
+            "ctr": rnd.random(),
+            "position": rnd.random() * 50,
+        }
+        for _ in range(count)
+    ]
+    return json.dumps({"rows": rows, "responseAggregationType": "byPage"})
+
+
+def measure(build, payload: str):
+    """build(payload) が返すオブジェクトを保持した状態の使用メモリとピークを返します。"""
+    gc.collect()
+    tracemalloc.start()
+    result = build(payload)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="1ページ分の GSC レコードの保持に必要なメモリを比較します。")
+    parser.add_argument("--rows", type=int, default=25000, help="1ページあたりのレコード数")
+    args = parser.parse_args()
+
+    payload = make_response(args.rows)
+    records, dict_retained, dict_peak = measure(lambda data: json.loads(data)["rows"], payload)
+    batch, batch_retained, batch_peak = measure(lambda data: RecordBatch.from_rows(json.loads(data)["rows"]), payload)
+    assert batch.to_records() == [{key: record[key] for key in ("keys", "clicks", "impressions", "position")}
+                                  for record in records]
+
+    print(f"rows={args.rows}")
+    print(f"list of dicts : retained {dict_retained / 1024 ** 2:7.2f} MB, peak {dict_peak / 1024 ** 2:7.2f} MB")
+    print(f"RecordBatch   : retained {batch_retained / 1024 ** 2:7.2f} MB, peak {batch_peak / 1024 ** 2:7.2f} MB")
+    print(f"retained ratio: {batch_retained / dict_retained:.2%}")
+
+
+if __name__ == '__main__':
+    main()
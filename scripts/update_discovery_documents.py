@@ -0,0 +1,41 @@
+import argparse
+import json
+
+import requests
+from googleapiclient.discovery_cache import get_static_doc
+
+from utils.discovery import DISCOVERY_DIR
+
+# 同梱するディスカバリドキュメント（GSCConnector・WebhookNotifier が使用）
+SERVICES = [("searchconsole", "v1"), ("chat", "v1")]
+
+DISCOVERY_URL = "https://{name}.googleapis.com/$discovery/rest?version={version}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="config/discovery に同梱するディスカバリドキュメントを更新します。"
+                    "ネットワークに接続できない環境では --from-library でインストール済みの google-api-python-client に"
+                    "同梱されたドキュメントをコピーします（requirements.txt のバージョンと同じ revision になります）。")
+    parser.add_argument("--from-library", action="store_true",
+                        help="API から取得せず、google-api-python-client に同梱されたドキュメントをコピーする")
+    args = parser.parse_args()
+
+    DISCOVERY_DIR.mkdir(parents=True, exist_ok=True)
+    for name, version in SERVICES:
+        if args.from_library:
+            content = get_static_doc(name, version)
+            if content is None:
+                raise SystemExit(f"{name}.{version} is not bundled with google-api-python-client")
+        else:
+            response = requests.get(DISCOVERY_URL.format(name=name, version=version), timeout=30)
+            response.raise_for_status()
+            content = response.text
+        document = json.loads(content)
+        path = DISCOVERY_DIR / f"{name}.{version}.json"
+        path.write_text(content, encoding="utf-8")
+        print(f"{path}: revision {document.get('revision')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -29,7 +29,9 @@ def main() -> None:
 
         # 進捗テーブルの不要行を軽くクリーンアップ（ストリーミングバッファが乗る前の早期段階で実施）
         try:
-            cleanup_progress_table(config, retention_minutes=90)
+            # 複数プロパティの取得時は、プロパティごとの進捗テーブルをクリーンアップ
+            for property_config in config.gsc_properties() or [config]:
+                cleanup_progress_table(property_config, retention_minutes=90)
         except Exception as e:
             logger.warning(f"進捗テーブルのクリーンアップ中にエラーが発生しました: {e}")
             # クリーンアップのエラーは致命的ではないため、通知は送信しない
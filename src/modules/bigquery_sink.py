@@ -0,0 +1,395 @@
+# src/modules/bigquery_sink.py
+
+import gzip
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from google.cloud import bigquery
+
+from utils.retry import insert_rows_chunked, DEFAULT_CHUNK_ROWS, DEFAULT_CHUNK_BYTES
+from utils.row_fingerprint import row_fingerprint
+from modules.star_schema import DimensionStore, StarSchemaSink
+from utils.logging_config import get_logger
+
+# Parquet 出力（pyarrow は db-dtypes の依存としてインストールされる）
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = get_logger(__name__)
+
+WRITE_MODES = ("APPEND", "LOAD", "REPLACE_PARTITION")
+OUTPUT_MODES = ("flat", "star", "both")
+
+# ディメンションテーブルごとにプロセス全体で1つの DimensionStore を共有する
+# （複数プロパティのシンクが同じテーブルにIDを割り当てても重複しないように）
+_dimension_lock = threading.Lock()
+_dimension_stores = {}
+
+
+class SinkStats:
+    """書き込み件数・バイト数・所要時間を集計するクラス（ストリーミングとロードジョブの比較用）"""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.rows = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def add(self, rows: int, size: int, seconds: float) -> None:
+        with self._lock:
+            self.rows += rows
+            self.bytes += size
+            self.seconds += seconds
+            self.requests += 1
+
+    def summary(self) -> str:
+        rows_per_sec = self.rows / self.seconds if self.seconds else 0.0
+        mb_per_sec = self.bytes / 1024 ** 2 / self.seconds if self.seconds else 0.0
+        return (f"{self.mode}: {self.rows} rows, {self.bytes} bytes in {self.requests} requests, "
+                f"{self.seconds:.2f}s ({rows_per_sec:.0f} rows/s, {mb_per_sec:.2f} MB/s)")
+
+
+def _flat_row_id(row) -> str:
+    """フラットテーブルの行の insertId（data_date・url・query のフィンガープリント）"""
+    return row.get("row_fingerprint") or row_fingerprint(row["data_date"], row["url"], row["query"])
+
+
+def _fact_row_id(row) -> str:
+    """スタースキーマのファクト行の insertId（data_date・url_id・query_id のフィンガープリント）"""
+    return row_fingerprint(row["data_date"], str(row["url_id"]), str(row["query_id"]))
+
+
+class StreamingSink:
+    """insert_rows_json によるストリーミング挿入（write_mode = APPEND）
+
+    行データは行数・バイト数の上限内のチャンクに分割し、共有クライアントで並列に送信します。
+    日付の集計器から flush する行（page_key なし）は (data_date, url, query) が日付内で一意のため、各行の insertId には
+    (data_date, url, query) のフィンガープリントを使用し、リトライや再実行で同じ行を再送しても
+    BigQuery 側で重複が排除されます（ベストエフォート）。
+    ページ単位の集計では同じ (data_date, url, query) が日付内の複数のページに現れ、
+    フィンガープリントのみでは別の行が重複として破棄されるため、insertId にページの識別子（page_key。
+    ページの startRow など）とページ内の行番号を加えます。同じページを再送・再取得した場合は同じ insertId になります。
+    """
+
+    # 途中のページから再開できるか（進捗テーブルの record_position を使用するか）
+    resumable = True
+
+    def __init__(self, client, table_id: str, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                 chunk_bytes: int = DEFAULT_CHUNK_BYTES, workers: int = 4, row_id_func=None):
+        self.client = client
+        self.row_id_func = row_id_func or _flat_row_id
+        self.table_id = table_id
+        self.chunk_rows = chunk_rows
+        self.chunk_bytes = chunk_bytes
+        self.workers = workers
+        self.stats = SinkStats("streaming")
+
+    def write(self, rows, date: str, page_key=None) -> bool:
+        """
+        行データを挿入します。
+
+        Args:
+            rows (list): 挿入する行データ
+            date (str): データ取得対象の日付（YYYY-MM-DD）
+            page_key (str, optional): 日付内のページの識別子（同じページでは実行をまたいで同じ値）。
+                None の場合は行が日付内で一意（日付の集計器からの flush）として扱います。
+
+        Returns:
+            bool: 行データが BigQuery に反映済みかどうか（ストリーミングでは常に True）
+        """
+        started = time.monotonic()
+        row_ids = [self.row_id_func(row) for row in rows]
+        if page_key is not None:
+            # ページの識別子と行番号を加え、別のページの同じキーの行が重複として破棄されないようにする
+            row_ids = [f"{row_id}-{page_key}-{index}" for index, row_id in enumerate(row_ids)]
+        size = insert_rows_chunked(self.client, self.table_id, rows, logger,
+                                   max_rows=self.chunk_rows, max_bytes=self.chunk_bytes, max_workers=self.workers,
+                                   row_ids=row_ids)
+        self.stats.add(len(rows), size, time.monotonic() - started)
+        return True
+
+    def flush(self, date: str) -> bool:
+        """ストリーミングでは保留中の行がないため何もしません。"""
+        return False
+
+    def discard(self, date: str) -> None:
+        """ストリーミングでは保留中の行がないため何もしません。"""
+
+
+class LoadJobSink:
+    """日付ごとに行データをファイルへステージングし、ロードジョブでまとめて反映する（write_mode = LOAD）
+
+    ストリーミング挿入の料金がかからず、ストリーミングバッファも発生しないため
+    進捗テーブルのクリーンアップ（DELETE）を阻害しません。
+    行データは flush されるまで反映されないため、呼び出し側は flush 後に進捗を確定させる必要があります。
+    """
+
+    resumable = True
+
+    def __init__(self, client, table_id: str, staging_dir, file_format: str = "NDJSON", batch_rows: int = 0):
+        """
+        Args:
+            client (bigquery.Client): BigQuery クライアント
+            table_id (str): 反映先のテーブルID
+            staging_dir: ステージングファイルの出力先ディレクトリ
+            file_format (str): "NDJSON"（gzip 圧縮）または "PARQUET"（snappy 圧縮）
+            batch_rows (int): この行数を超えるたびに日付の途中でもロードする（0 の場合は日付単位）
+        """
+        file_format = file_format.upper()
+        if file_format == "PARQUET" and not PYARROW_AVAILABLE:
+            logger.warning("pyarrow is not installed; falling back to NDJSON staging files.")
+            file_format = "NDJSON"
+        self.client = client
+        self.table_id = table_id
+        self.staging_dir = Path(staging_dir)
+        self.file_format = file_format
+        self.batch_rows = batch_rows
+        self.stats = SinkStats(f"load({file_format.lower()})")
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+
+    def write(self, rows, date: str, page_key=None) -> bool:
+        """
+        行データを日付ごとのバッファに追加します（page_key はロードジョブでは使用しません）。batch_rows を超えた場合はロードジョブを実行します。
+
+        Returns:
+            bool: 行データが BigQuery に反映済みかどうか
+        """
+        with self._lock:
+            pending = self._pending.setdefault(date, [])
+            pending.extend(rows)
+            should_flush = self.batch_rows and len(pending) >= self.batch_rows
+        if should_flush:
+            return self.flush(date)
+        return False
+
+    def flush(self, date: str) -> bool:
+        """
+        日付のバッファをステージングファイルに書き出し、ロードジョブで反映します。
+
+        Returns:
+            bool: ロードジョブを実行した場合は True
+        """
+        with self._lock:
+            rows = self._pending.pop(date, [])
+        if not rows:
+            return self._flush_empty(date)
+
+        started = time.monotonic()
+        path = self._stage(rows, date)
+        try:
+            size = path.stat().st_size
+            self._load(path, date)
+        finally:
+            path.unlink(missing_ok=True)
+        elapsed = time.monotonic() - started
+        self.stats.add(len(rows), size, elapsed)
+        logger.info(f"Loaded {len(rows)} rows ({size} bytes) for {date} into {self.table_id} in {elapsed:.2f}s.")
+        return True
+
+    def _flush_empty(self, date: str) -> bool:
+        """行データのない日付の flush（追記では反映するものがないため何もしない）"""
+        return False
+
+    def discard(self, date: str) -> None:
+        """反映前のバッファを破棄します（エラー時。未反映分は次回実行で再取得されます）。"""
+        with self._lock:
+            rows = self._pending.pop(date, [])
+        if rows:
+            logger.warning(f"Discarded {len(rows)} staged rows for {date}.")
+
+    def _stage(self, rows, date: str) -> Path:
+        """行データを圧縮ファイルに書き出します。"""
+        stem = f"{date}_{os.getpid()}_{threading.get_ident()}"
+        if self.file_format == "PARQUET":
+            path = self.staging_dir / f"{stem}.parquet"
+            pq.write_table(self._to_arrow(rows), path, compression="snappy")
+        else:
+            path = self.staging_dir / f"{stem}.json.gz"
+            with gzip.open(path, "wt", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False))
+                    f.write("\n")
+        return path
+
+    @staticmethod
+    def _to_arrow(rows):
+        """行データを BigQuery の DATE / DATETIME 型に対応する Arrow テーブルへ変換します。"""
+        columns = {name: [row[name] for row in rows] for name in rows[0]}
+        arrays = {}
+        for name, values in columns.items():
+            if name == "data_date":
+                arrays[name] = pa.array(values).cast(pa.date32())
+            elif name == "insert_time_japan":
+                arrays[name] = pa.array(values).cast(pa.timestamp("s"))
+            else:
+                arrays[name] = pa.array(values)
+        return pa.table(arrays)
+
+    def _load(self, path: Path, date: str) -> None:
+        """ステージングファイルをロードジョブで追記します。"""
+        if self.file_format == "PARQUET":
+            source_format = bigquery.SourceFormat.PARQUET
+        else:
+            source_format = bigquery.SourceFormat.NEWLINE_DELIMITED_JSON
+        job_config = bigquery.LoadJobConfig(
+            source_format=source_format,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+        )
+        with open(path, "rb") as f:
+            job = self.client.load_table_from_file(f, self.table_id, job_config=job_config)
+        job.result()
+
+
+class PartitionReplaceSink(LoadJobSink):
+    """日付の集計結果をまとめてステージングし、data_date パーティションを丸ごと置き換える（write_mode = REPLACE_PARTITION）
+
+    パーティションデコレータ（table$YYYYMMDD）への WRITE_TRUNCATE ロードはアトミックなため、
+    同じ日付を再取得しても重複行は発生せず、再実行のコストは1パーティションの書き込みのみです。
+    反映先は data_date でパーティション分割されたテーブル（scripts/migrate_searchdata_table.py で作成する _v2）である必要があります。
+    日付全体を置き換えるため途中のページからの再開はできず、未完了の日付は常に 0 から再取得します。
+    再取得した日付が 0 件の場合も、以前の実行で書き込まれたパーティションの行を削除して空にします。
+    """
+
+    resumable = False
+
+    def __init__(self, client, table_id: str, staging_dir, file_format: str = "NDJSON"):
+        # 日付の途中でロードすると先行分が置き換えで消えるため、常に日付単位で反映する
+        super().__init__(client, table_id, staging_dir, file_format=file_format, batch_rows=0)
+        self.stats.mode = f"replace_partition({self.file_format.lower()})"
+
+    def _load(self, path: Path, date: str) -> None:
+        """ステージングファイルで日付のパーティションを置き換えます。"""
+        if self.file_format == "PARQUET":
+            source_format = bigquery.SourceFormat.PARQUET
+        else:
+            source_format = bigquery.SourceFormat.NEWLINE_DELIMITED_JSON
+        job_config = bigquery.LoadJobConfig(
+            source_format=source_format,
+            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+        )
+        partition = f"{self.table_id}${date.replace('-', '')}"
+        with open(path, "rb") as f:
+            job = self.client.load_table_from_file(f, partition, job_config=job_config)
+        job.result()
+        logger.info(f"Replaced partition {partition}.")
+
+    def _flush_empty(self, date: str) -> bool:
+        """行データのない日付のパーティションを空にします（パーティション単位の DELETE はメタデータ操作のみ）。"""
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ScalarQueryParameter("data_date", "DATE", date)]
+        )
+        self.client.query(
+            f"DELETE FROM `{self.table_id}` WHERE data_date = @data_date",
+            job_config=job_config,
+        ).result()
+        logger.info(f"Truncated partition {self.table_id}${date.replace('-', '')} (no rows for {date}).")
+        return True
+
+
+class MultiSink:
+    """複数のシンクに同じ行データを書き込むシンク（output_mode = both）"""
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+        self.stats = self
+
+    @property
+    def resumable(self) -> bool:
+        return all(sink.resumable for sink in self.sinks)
+
+    def summary(self) -> str:
+        return "; ".join(sink.stats.summary() for sink in self.sinks)
+
+    def write(self, rows, date: str, page_key=None) -> bool:
+        # すべてのシンクに書き込み、いずれかが保留中の場合は未反映として扱う
+        landed = [sink.write(rows, date, page_key) for sink in self.sinks]
+        return all(landed)
+
+    def flush(self, date: str) -> bool:
+        flushed = [sink.flush(date) for sink in self.sinks]
+        return any(flushed)
+
+    def discard(self, date: str) -> None:
+        for sink in self.sinks:
+            sink.discard(date)
+
+
+def _create_table_sink(config, client, table_id: str, row_id_func=None):
+    """[BIGQUERY] write_mode に応じて、1つのテーブルへの書き込み先を生成します。"""
+    write_mode = config.get_config_value('BIGQUERY', 'WRITE_MODE', 'APPEND').upper()
+    if write_mode not in WRITE_MODES:
+        raise ValueError(f"Unsupported BIGQUERY.write_mode: {write_mode}")
+
+    if write_mode in ("LOAD", "REPLACE_PARTITION"):
+        staging_dir = Path(config.get_config_value('BIGQUERY', 'STAGING_DIR', 'data/staging'))
+        if not staging_dir.is_absolute():
+            staging_dir = config.base_path / staging_dir
+        if write_mode == "REPLACE_PARTITION":
+            return PartitionReplaceSink(
+                client,
+                table_id,
+                staging_dir,
+                file_format=config.get_config_value('BIGQUERY', 'LOAD_FORMAT', 'NDJSON'),
+            )
+        return LoadJobSink(
+            client,
+            table_id,
+            staging_dir,
+            file_format=config.get_config_value('BIGQUERY', 'LOAD_FORMAT', 'NDJSON'),
+            batch_rows=int(config.get_config_value('BIGQUERY', 'LOAD_BATCH_ROWS', '0')),
+        )
+    return StreamingSink(
+        client,
+        table_id,
+        chunk_rows=int(config.get_config_value('BIGQUERY', 'STREAM_CHUNK_ROWS', str(DEFAULT_CHUNK_ROWS))),
+        chunk_bytes=int(config.get_config_value('BIGQUERY', 'STREAM_CHUNK_BYTES', str(DEFAULT_CHUNK_BYTES))),
+        workers=int(config.get_config_value('BIGQUERY', 'STREAM_WORKERS', '4')),
+        row_id_func=row_id_func,
+    )
+
+
+def get_dimension_store(client, table_id: str, value_column: str, id_column: str) -> DimensionStore:
+    """ディメンションテーブルの DimensionStore を返します（テーブルごとに1度だけ生成して共有）。"""
+    with _dimension_lock:
+        store = _dimension_stores.get(table_id)
+        if store is None:
+            store = _dimension_stores[table_id] = DimensionStore(client, table_id, value_column, id_column)
+        return store
+
+
+def create_sink(config, client):
+    """[BIGQUERY] write_mode / output_mode に応じた書き込み先を生成します。"""
+    project_id = config.get_config_value('BIGQUERY', 'PROJECT_ID')
+    dataset_id = config.get_config_value('BIGQUERY', 'DATASET_ID')
+    table_id = f"{project_id}.{dataset_id}.{config.get_config_value('BIGQUERY', 'TABLE_ID')}"
+
+    output_mode = config.get_config_value('BIGQUERY', 'OUTPUT_MODE', 'flat').lower()
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unsupported BIGQUERY.output_mode: {output_mode}")
+    if output_mode == "flat":
+        return _create_table_sink(config, client, table_id)
+
+    def dataset_table(key, default):
+        return f"{project_id}.{dataset_id}.{config.get_config_value('BIGQUERY', key, default)}"
+
+    star_sink = StarSchemaSink(
+        client,
+        _create_table_sink(config, client, dataset_table('FACT_TABLE_ID', 'T_searchdata_fact'),
+                           row_id_func=_fact_row_id),
+        get_dimension_store(client, dataset_table('DIM_URL_TABLE_ID', 'dim_url'), "url", "url_id"),
+        get_dimension_store(client, dataset_table('DIM_QUERY_TABLE_ID', 'dim_query'), "query", "query_id"),
+    )
+    if output_mode == "star":
+        return star_sink
+    return MultiSink([_create_table_sink(config, client, table_id), star_sink])
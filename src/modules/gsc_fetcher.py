@@ -1,55 +1,138 @@
 # src/modules/gsc_fetcher.py
 
 import os
-from google.oauth2 import service_account
-from google.auth import default
-from googleapiclient.discovery import build
+import threading
 from googleapiclient.errors import HttpError
 from google.cloud import bigquery
 from utils.date_utils import get_current_jst_datetime, format_datetime_jst
 from utils.url_utils import aggregate_records
+from utils.parallel_aggregate import ParallelAggregator
+from utils.date_aggregator import DateAggregator
+from utils.record_batch import RecordBatch
+from utils.string_dictionary import StringDictionary
+from utils.row_fingerprint import row_fingerprints
 from datetime import datetime
-from utils.retry import insert_rows_with_retry
+from utils.bigquery_client import get_bigquery_client, get_credentials
+from utils.discovery import build_service
+from utils.quota_scheduler import QuotaScheduler, QuotaExceededError
+from utils.response_cache import GSCResponseCache, CacheMissError
+from modules.bigquery_sink import create_sink
+from modules.row_cap_splitter import RowCapSplitter
 
 from utils.logging_config import get_logger
 from utils.webhook_notifier import send_error_notification
 
 logger = get_logger(__name__)
 
+# Search Analytics API の1リクエストあたりの最大行数（rowLimit の上限）
+MAX_ROW_LIMIT = 25000
+
 class GSCConnector:
     """Google Search Console データを取得するクラス"""
 
-    def __init__(self, config):
+    def __init__(self, config, quota_scheduler=None, shared=None):
         """
         コンストラクタ
 
         Args:
-            config (Config): Config クラスのインスタンス
+            config (Config or PropertyConfig): Config クラスのインスタンス（複数プロパティの取得時は PropertyConfig）
+            quota_scheduler (QuotaScheduler, optional): API呼び出しを調整するスケジューラ。
+                省略時は設定ファイルから生成します。
+            shared (GSCConnector, optional): 文字列辞書・集計プール・レスポンスキャッシュ・GSC API クライアントを
+                共有する接続（複数プロパティの取得時に、2つ目以降のプロパティで指定）
         """
         self.config = config
         self.logger = get_logger(__name__)  # ロガーを初期化
 
-        # 認証情報ファイルのパスを Config から取得
-        credentials_path = self.config.credentials_path
-
-        # Cloud Run環境ではデフォルトの認証情報を使用
-        if not credentials_path:
-            # デフォルトの認証情報を使用（Cloud Run環境）
-            credentials, _ = default(scopes=["https://www.googleapis.com/auth/webmasters.readonly"])
-            self.logger.info("Using default service account credentials for GSC API")
-        else:
-            # サービスアカウント認証を設定（ローカル環境）
-            credentials = service_account.Credentials.from_service_account_file(
-                str(credentials_path),
-                scopes=["https://www.googleapis.com/auth/webmasters.readonly"]
-            )
-            self.logger.info(f"Using service account file: {credentials_path}")
+        # すべての GSC API 呼び出しはこのスケジューラを経由する（並列ワーカー間でも共有）
+        self.quota = quota_scheduler or QuotaScheduler.from_config(config)
+
+        # BigQuery への書き込み先（write_mode に応じてストリーミング挿入またはロードジョブ）
+        self.sink = create_sink(config, get_bigquery_client(config))
+
+        # 行のフィンガープリントを row_fingerprint 列として保存するか（列の追加は scripts/add_row_fingerprint_column.py）
+        self.store_row_fingerprint = str(
+            config.get_config_value('BIGQUERY', 'STORE_ROW_FINGERPRINT', 'false')
+        ).lower() == 'true'
+
+        # マージ可能な集計状態（position_sum / position_count / weighted_position_sum）を列として保存するか
+        # （列の追加は scripts/add_position_state_columns.py）
+        self.store_position_state = str(
+            config.get_config_value('BIGQUERY', 'STORE_POSITION_STATE', 'false')
+        ).lower() == 'true'
+
+        # 実行全体で共有する文字列辞書（同じクエリ・URLはページ・日付を跨いで1つの文字列として保持）
+        self.query_dictionary = shared.query_dictionary if shared else StringDictionary("query")
+        self.url_dictionary = shared.url_dictionary if shared else StringDictionary("url")
+
+        # 集計の単位（page: ページごと / date: 日付全体をページ跨ぎで集計し、日付の完了時に挿入）
+        self.aggregate_scope = config.gsc_settings.get('aggregate_scope', 'page')
+        self._date_aggregators = {}
+        self._aggregators_lock = threading.Lock()
+
+        # 行数の上限に達する日付の分割取得（split_row_cap が 0 の場合は無効）
+        row_cap = config.gsc_settings.get('split_row_cap', 0)
+        self.splitter = RowCapSplitter(
+            self,
+            row_cap,
+            config.gsc_settings['batch_size'],
+            workers=config.gsc_settings.get('split_workers', 4),
+            fanout=config.gsc_settings.get('split_fanout', 8),
+            max_depth=config.gsc_settings.get('split_max_depth', 6),
+            probe_ratio=config.gsc_settings.get('split_probe_ratio', 0.5),
+        ) if row_cap > 0 else None
+
+        # 最終ページの判定に1行多く取得し、末尾の空ページの呼び出しを省略するか
+        self.page_lookahead = config.gsc_settings.get('page_lookahead', False)
+
+        # 共有元がある場合、プロセスプールの終了と API クライアントの構築は共有元が行う
+        self._shared = shared is not None
+        if self._shared:
+            self.aggregate_pool = shared.aggregate_pool
+            self.cache = shared.cache
+            self._thread_local = shared._thread_local
+            self._credentials = shared._credentials
+            self.service = shared.service
+            return
+
+        # ページの並列集計に使用するプロセスプール（aggregate_processes が 1 以下の場合は None）
+        processes = config.gsc_settings.get('aggregate_processes', 0)
+        self.aggregate_pool = ParallelAggregator(
+            processes, config.gsc_settings.get('aggregate_parallel_min_records', 20000)
+        ) if processes > 1 else None
+
+        # 生レスポンスのローカルキャッシュ（無効の場合は None）
+        self.cache = GSCResponseCache.from_config(config)
+        self._thread_local = threading.local()
+
+        if self.cache is not None and self.cache.offline:
+            # キャッシュのみで再実行するため、GSC API クライアントは構築しない
+            self._credentials = None
+            self.service = None
+            self.logger.info(f"GSC レスポンスキャッシュのみを参照するオフラインモードです: {self.cache.cache_dir}")
+            return
 
-        # GSC API クライアントを構築
-        self.service = build('searchconsole', 'v1', credentials=credentials)
+        # 認証情報はプロセス全体で共有（Cloud Run環境ではデフォルトの認証情報を使用）
+        self._credentials = get_credentials(self.config, scopes=["https://www.googleapis.com/auth/webmasters.readonly"])
+        # GSC API クライアントを構築（httplib2 はスレッドセーフではないため、スレッドごとに保持）
+        self.service = self._get_service()
         self.logger.info("Google Search Console API クライアントを初期化しました。")
 
-    def fetch_records(self, date: str, start_record: int, limit: int):
+    @property
+    def resumable(self) -> bool:
+        """未完了の日付を途中のページから再開できるか（日付全体を集計・置換する場合は 0 から再取得）"""
+        return self.sink.resumable and self.aggregate_scope != 'date'
+
+    def _get_service(self):
+        """呼び出し元スレッド専用の GSC API クライアントを返します。"""
+        service = getattr(self._thread_local, 'service', None)
+        if service is None:
+            # ディスカバリドキュメントは同梱のものをプロセスごとに1回だけ解析して共有
+            service = build_service('searchconsole', 'v1', credentials=self._credentials)
+            self._thread_local.service = service
+        return service
+
+    def fetch_records(self, date: str, start_record: int, limit: int, dimension_filter_groups=None):
         """
         指定された日付のGSCデータをフェッチします。
 
@@ -57,10 +140,57 @@ class GSCConnector:
             date (str): データ取得対象の日付（YYYY-MM-DD）
             start_record (int): 取得開始位置
             limit (int): 取得するレコード数
+            dimension_filter_groups (list, optional): リクエストの dimensionFilterGroups（行数の上限による分割時）
+
+        Returns:
+            tuple: (取得したレコードの RecordBatch, 次のレコード位置)
+
+        Raises:
+            QuotaExceededError: 1日あたりのAPIクォータに達している場合
+            CacheMissError: オフラインモードでキャッシュに存在しない場合
+        """
+        rows = self._fetch_rows(date, start_record, limit, dimension_filter_groups)
+
+        # 行ごとの dict を保持せず、列指向のバッチに変換して後段へ渡す
+        records = RecordBatch.from_rows(rows, self.query_dictionary, self.url_dictionary)
+        next_record = start_record + len(records)
+
+        self.logger.info(f"日付 {date} のレコードを {len(records)} 件取得しました。次の開始位置: {next_record}")
+
+        return records, next_record
+
+    def fetch_page(self, date: str, start_record: int, page_size: int):
+        """
+        日付のページを取得し、日付の最終ページかどうかを返します。
+
+        [GSC] page_lookahead が有効な場合は1行多く取得して次のページの有無を判定するため
+        （ページの行数は最大 MAX_ROW_LIMIT - 1）、行数がちょうどページの行数の倍数の日付でも末尾の空ページを取得しません。
+
+        Args:
+            date (str): データ取得対象の日付（YYYY-MM-DD）
+            start_record (int): 取得開始位置
+            page_size (int): 1ページの行数
 
         Returns:
-            tuple: (取得したレコードリスト, 次のレコード位置)
+            tuple: (取得したレコードの RecordBatch, 次のレコード位置, 日付の最終ページかどうか)
         """
+        if not self.page_lookahead:
+            records, next_record = self.fetch_records(date, start_record, page_size)
+            return records, next_record, len(records) < page_size
+
+        page_size = min(page_size, MAX_ROW_LIMIT - 1)
+        rows = self._fetch_rows(date, start_record, page_size + 1)
+        is_last = len(rows) <= page_size
+        records = RecordBatch.from_rows(rows[:page_size], self.query_dictionary, self.url_dictionary)
+        next_record = start_record + len(records)
+
+        self.logger.info(f"日付 {date} のレコードを {len(records)} 件取得しました。"
+                         f"{'最終ページです。' if is_last else f'次の開始位置: {next_record}'}")
+
+        return records, next_record, is_last
+
+    def _fetch_rows(self, date: str, start_record: int, limit: int, dimension_filter_groups=None) -> list:
+        """日付の行（API レスポンスの rows）を取得します。"""
         property_name = self.config.gsc_settings['url']  # 'site_url' を 'url' に変更
 
         request = {
@@ -70,54 +200,162 @@ class GSCConnector:
             'rowLimit': limit,
             'startRow': start_record
         }
+        if dimension_filter_groups:
+            request['dimensionFilterGroups'] = dimension_filter_groups
 
         try:
-            response = self.service.searchanalytics().query(
-                siteUrl=property_name,
-                body=request
-            ).execute()
-
-            records = response.get('rows', [])
-            next_record = start_record + len(records)
-
-            self.logger.info(f"日付 {date} のレコードを {len(records)} 件取得しました。次の開始位置: {next_record}")
-
-            return records, next_record
+            return self._query(property_name, request).get('rows', [])
 
         except HttpError as e:
             self.logger.error(f"GSC API HTTP エラー: {e}", exc_info=True)
             raise
+        except (QuotaExceededError, CacheMissError):
+            raise
         except Exception as e:
             self.logger.error(f"GSC データの取得中にエラーが発生しました: {e}", exc_info=True)
             raise
 
-    def insert_to_bigquery(self, records, date: str):
+    def query(self, request: dict) -> dict:
+        """プロパティに対して Search Analytics API を呼び出します（クォータ・キャッシュは fetch_records と共通）。"""
+        return self._query(self.config.gsc_settings['url'], request)
+
+    def fetch_range(self, dates, limit: int):
+        """
+        連続する複数の日付を、date ディメンションを加えた1回のリクエストで取得します。
+
+        Args:
+            dates (list): 取得対象の日付（YYYY-MM-DD、昇順で連続）
+            limit (int): 1回のリクエストで取得するレコード数の上限
+
+        Returns:
+            dict: 日付 → RecordBatch（行のない日付は空のバッチ）。
+                行数が limit に達した（期間内のすべての行を取得できたか判断できない）場合は None
+        """
+        response = self.query({
+            'startDate': dates[0],
+            'endDate': dates[-1],
+            'dimensions': ['date', 'query', 'page'],
+            'rowLimit': limit,
+            'startRow': 0
+        })
+        rows = response.get('rows', [])
+        if len(rows) >= limit:
+            self.logger.info(f"期間 {dates[0]}〜{dates[-1]} の行数が {limit} 件に達したため、日付ごとに取得します。")
+            return None
+
+        rows_by_date = {date: [] for date in dates}
+        for row in rows:
+            rows_by_date[row['keys'][0]].append(dict(row, keys=row['keys'][1:]))
+        self.logger.info(f"期間 {dates[0]}〜{dates[-1]} のレコードを {len(rows)} 件取得しました。")
+        return {
+            date: RecordBatch.from_rows(date_rows, self.query_dictionary, self.url_dictionary)
+            for date, date_rows in rows_by_date.items()
+        }
+
+    def needs_split(self, date: str, estimate=None) -> bool:
+        """日付の行数が上限（[GSC] split_row_cap）に達しており、分割して取得する必要があるかを返します。"""
+        return self.splitter is not None and self.splitter.needs_split(date, estimate)
+
+    def fetch_split(self, date: str):
+        """
+        行数の上限に達する日付を、ページのURLプレフィックスで分割して並行に取得します。
+
+        Args:
+            date (str): データ取得対象の日付（YYYY-MM-DD）
+
+        Yields:
+            RecordBatch: 取得したページ（順序は shard の取得が完了した順）
+        """
+        return self.splitter.fetch(date)
+
+    def _query(self, property_name: str, request: dict) -> dict:
+        """
+        Search Analytics API を呼び出します。キャッシュが有効な場合はキャッシュを優先します。
+
+        Args:
+            property_name (str): GSC プロパティ（サイトURL）
+            request (dict): searchanalytics().query のリクエストボディ
+
+        Returns:
+            dict: API レスポンス
+        """
+        if self.cache is not None:
+            cached = self.cache.get(property_name, request)
+            if cached is not None:
+                self.logger.debug(f"GSC レスポンスをキャッシュから取得しました: {request}")
+                return cached
+            if self.cache.offline:
+                raise CacheMissError(f"No cached GSC response for {property_name}: {request}")
+
+        # クォータを確保（秒・分単位の上限に達している場合は待機）
+        self.quota.acquire()
+        response = self._get_service().searchanalytics().query(
+            siteUrl=property_name,
+            body=request
+        ).execute()
+
+        if self.cache is not None:
+            self.cache.put(property_name, request, response)
+        return response
+
+    def insert_to_bigquery(self, records, date: str, page_key=None):
         """
         取得したGSCデータをBigQueryに挿入します。
 
         Args:
-            records (list): GSCから取得したレコードのリスト
+            records (RecordBatch): GSCから取得したレコード
             date (str): データ取得対象の日付（YYYY-MM-DD）
+            page_key (str, optional): 日付内のページの識別子（ストリーミング挿入の insertId に使用）
+
+        Returns:
+            bool: 行データが BigQuery に反映済みかどうか（ロードジョブ・日付単位の集計では flush_date まで保留）
         """
-        # データの集計
-        aggregated_records = aggregate_records(records)
+        rows_to_insert = self.build_rows(records, date)
 
-        if not aggregated_records:
+        if not rows_to_insert:
+            if self.aggregate_scope == 'date':
+                return False
             self.logger.info("集計後のレコードがありません。")
-            return
+            return True
+
+        return self.insert_rows(rows_to_insert, date, page_key)
+
+    def build_rows(self, records, date: str):
+        """
+        GSCレコードを集計し、BigQuery挿入用の行データに整形します。
+
+        Args:
+            records (RecordBatch): GSCから取得したレコード
+            date (str): データ取得対象の日付（YYYY-MM-DD）
+
+        Returns:
+            list: BigQuery挿入用の行データのリスト（日付単位の集計では常に空で、行データは flush_date で挿入）
+        """
+        if self.aggregate_scope == 'date':
+            self.buffer_records(records, date)
+            return []
+
+        # データの集計
+        return self._to_rows(aggregate_records(records, include_state=self.store_position_state,
+                                                pool=self.aggregate_pool), date)
+
+    def buffer_records(self, records, date: str) -> None:
+        """
+        レコードを日付の集計器に蓄積します（行データは flush_date でまとめて挿入）。
 
-        # BigQuery クライアントを初期化
-        client = bigquery.Client(
-            credentials=self._get_bigquery_credentials(),
-            project=self.config.get_config_value('BIGQUERY', 'PROJECT_ID')
-        )
+        分割取得の shard は startRow で再開できないため、日付の全 shard を取得し終えてから1度だけ書き込みます。
+        集計器はメモリ上限を超えるとディスクへ退避するため、行数の多い日付でもメモリに収まります。
 
-        # 挿入先のテーブルIDを取得
-        table_id = f"{self.config.get_config_value('BIGQUERY', 'PROJECT_ID')}." \
-                   f"{self.config.get_config_value('BIGQUERY', 'DATASET_ID')}." \
-                   f"{self.config.get_config_value('BIGQUERY', 'TABLE_ID')}"
+        Args:
+            records (RecordBatch): GSCから取得したレコード
+            date (str): データ取得対象の日付（YYYY-MM-DD）
+        """
+        self._get_date_aggregator(date).add(records)
 
-        # データの整形
+    def _to_rows(self, aggregated_records, date: str):
+        """集計後のレコードを BigQuery 挿入用の行データに整形します。"""
+        # 挿入時刻はバッチ単位で1度だけ計算
+        insert_time_japan = format_datetime_jst(get_current_jst_datetime())
         rows_to_insert = []
         for record in aggregated_records:
             row_data = {
@@ -127,13 +365,34 @@ class GSCConnector:
                 "impressions": record['impressions'],
                 "clicks": record['clicks'],
                 "avg_position": record['avg_position'],  # フィールド名を統一
-                "insert_time_japan": format_datetime_jst(get_current_jst_datetime())  # DATETIME 型
+                "insert_time_japan": insert_time_japan  # DATETIME 型
             }
+            if self.store_position_state:
+                row_data["position_sum"] = record['position_sum']
+                row_data["position_count"] = record['position_count']
+                row_data["weighted_position_sum"] = record['weighted_position_sum']
             rows_to_insert.append(row_data)
 
-        # リトライロジック付きで挿入
+        if self.store_row_fingerprint:
+            fingerprints = row_fingerprints(date, ((row["url"], row["query"]) for row in rows_to_insert))
+            for row_data, fingerprint in zip(rows_to_insert, fingerprints):
+                row_data["row_fingerprint"] = fingerprint
+        return rows_to_insert
+
+    def insert_rows(self, rows_to_insert, date: str, page_key=None):
+        """
+        整形済みの行データをBigQueryに挿入します。
+
+        Args:
+            rows_to_insert (list): build_rows で整形した行データのリスト
+            date (str): データ取得対象の日付（YYYY-MM-DD）
+            page_key (str, optional): 日付内のページの識別子（同じページの再送・再取得で同じ insertId にするため）
+
+        Returns:
+            bool: 行データが BigQuery に反映済みかどうか（ロードジョブでは flush_date まで保留）
+        """
         try:
-            insert_rows_with_retry(client, table_id, rows_to_insert, self.logger)
+            return self.sink.write(rows_to_insert, date, page_key)
         except Exception as e:
             self.logger.error(f"BigQueryへの挿入が失敗しました: {e}", exc_info=True)
             # エラー通知を送信
@@ -147,6 +406,64 @@ class GSCConnector:
             )
             raise
 
+    def _get_date_aggregator(self, date: str) -> DateAggregator:
+        """日付の集計器を返します（初回は生成）。"""
+        with self._aggregators_lock:
+            aggregator = self._date_aggregators.get(date)
+            if aggregator is None:
+                aggregator = DateAggregator(
+                    memory_limit_bytes=self.config.gsc_settings['aggregate_memory_mb'] * 1024 ** 2,
+                    spill_dir=self.config.gsc_settings['aggregate_spill_dir'],
+                    include_state=self.store_position_state,
+                )
+                self._date_aggregators[date] = aggregator
+            return aggregator
+
+    def _pop_date_aggregator(self, date: str):
+        with self._aggregators_lock:
+            return self._date_aggregators.pop(date, None)
+
+    def flush_date(self, date: str) -> bool:
+        """
+        日付の保留中の行データを BigQuery に反映します（ロードジョブ・日付単位の集計使用時）。
+
+        Returns:
+            bool: 反映を実行した場合は True
+        """
+        aggregator = self._pop_date_aggregator(date)
+        if aggregator is not None:
+            try:
+                # 集計器の行は日付内で一意のため、ページの識別子なし（フィンガープリントのみの insertId）で挿入
+                for aggregated_records in aggregator.finish():
+                    if aggregated_records:
+                        self.insert_rows(self._to_rows(aggregated_records, date), date)
+            finally:
+                aggregator.close()
+
+        try:
+            return self.sink.flush(date)
+        except Exception as e:
+            self.logger.error(f"BigQueryへのロードが失敗しました: {e}", exc_info=True)
+            send_error_notification(
+                error=e,
+                error_type="BigQuery Load Error",
+                context={"date": date}
+            )
+            raise
+
+    def discard_date(self, date: str) -> None:
+        """日付の未反映の行データを破棄します（エラー発生時）。"""
+        aggregator = self._pop_date_aggregator(date)
+        if aggregator is not None:
+            aggregator.close()
+        self.sink.discard(date)
+
+    def close(self) -> None:
+        """未使用の予約クォータを返却し、並列集計のプロセスプールを終了します。"""
+        self.quota.close()
+        if self.aggregate_pool is not None and not self._shared:
+            self.aggregate_pool.close()
+
     def fetch_and_insert_gsc_data(self, start_date=None, end_date=None):
         """
         指定された期間のGSCデータを取得し、BigQueryに挿入します。
@@ -162,7 +479,7 @@ class GSCConnector:
         try:
             records, _ = self.fetch_records(start_date, 0, batch_size)
             if records:
-                self.insert_to_bigquery(records, start_date)
+                self.insert_to_bigquery(records, start_date, "r0")
         except Exception as e:
             self._handle_error(e)
 
@@ -171,20 +488,6 @@ class GSCConnector:
         error_message = "GSC API error" if isinstance(exception, HttpError) else f"Unexpected error: {exception}"
         self.logger.error(error_message, exc_info=True)
 
-    def _get_bigquery_credentials(self):
-        """BigQuery 用の認証情報を取得します。"""
-        credentials_path = self.config.credentials_path
-        
-        if credentials_path:
-            # ファイルから読み込む（Secret Managerから取得した一時ファイルまたはローカルファイル）
-            return service_account.Credentials.from_service_account_file(str(credentials_path))
-        else:
-            # Cloud Run環境など、ファイルパスが指定されていない場合はデフォルトの認証情報を使用
-            from google.auth import default
-            credentials, _ = default()
-            self.logger.info("Using default Google credentials for BigQuery (e.g., Cloud Run service account)")
-            return credentials
-
     def _bq_schema(self):
         """Define and return the BigQuery table schema."""
         return [
@@ -194,5 +497,10 @@ class GSCConnector:
             bigquery.SchemaField('impressions', 'INTEGER'),
             bigquery.SchemaField('clicks', 'INTEGER'),
             bigquery.SchemaField('avg_position', 'FLOAT'),  # フィールド名を統一
-            bigquery.SchemaField('insert_time_japan', 'DATETIME')  # DATETIME 型
+            bigquery.SchemaField('insert_time_japan', 'DATETIME'),  # DATETIME 型
+            bigquery.SchemaField('row_fingerprint', 'STRING'),  # store_row_fingerprint = true の場合のみ
+            # store_position_state = true の場合のみ（マージ可能な集計状態）
+            bigquery.SchemaField('position_sum', 'FLOAT'),
+            bigquery.SchemaField('position_count', 'INTEGER'),
+            bigquery.SchemaField('weighted_position_sum', 'FLOAT'),
         ]
\ No newline at end of file
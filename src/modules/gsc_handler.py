@@ -1,32 +1,27 @@
 # src/modules/gsc_handler.py
 
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
 from datetime import datetime, timedelta
 from google.cloud import bigquery
 from google.api_core.exceptions import BadRequest
-from google.oauth2 import service_account
 
 from modules.gsc_fetcher import GSCConnector
+from modules.gsc_pipeline import GSCPipeline
+from modules.progress_store import ProgressSnapshot, get_start_records
 from utils.environment import config
+from utils.bigquery_client import get_bigquery_client
+from utils.quota_scheduler import QuotaExceededError
+from utils.response_cache import CacheMissError
 from utils.date_utils import get_current_jst_datetime, format_datetime_jst
+from utils.url_utils import normalize_url_stats
+from utils.request_planner import estimate_rows, plan_date_ranges
 from utils.webhook_notifier import send_error_notification, send_success_notification
 
 from utils.logging_config import get_logger
 logger = get_logger(__name__)
 
-def _get_bigquery_credentials(config):
-    """BigQuery用の認証情報を取得（Cloud Run環境対応）"""
-    credentials_path = config.credentials_path
-    
-    if credentials_path:
-        # ファイルから読み込む（Secret Managerから取得した一時ファイルまたはローカルファイル）
-        return service_account.Credentials.from_service_account_file(str(credentials_path))
-    else:
-        # Cloud Run環境など、ファイルパスが指定されていない場合はデフォルトの認証情報を使用
-        from google.auth import default
-        credentials, _ = default()
-        logger.info("Using default Google credentials for BigQuery (e.g., Cloud Run service account)")
-        return credentials
-
 def cleanup_progress_table(config, retention_minutes: int = 90) -> None:
     """進捗テーブルの古い不要行を削除します。
 
@@ -34,12 +29,11 @@ def cleanup_progress_table(config, retention_minutes: int = 90) -> None:
     - `record_position = 0` の行を削除
     - 各 `data_date` で最新(`updated_at`最大)以外の履歴行を削除
     """
-    credentials = _get_bigquery_credentials(config)
     project_id = config.get_config_value('BIGQUERY', 'PROJECT_ID')
     dataset_id = config.get_config_value('BIGQUERY', 'DATASET_ID')
     progress_table_id = config.get_config_value('BIGQUERY', 'PROGRESS_TABLE_ID')
 
-    client = bigquery.Client(credentials=credentials, project=project_id)
+    client = get_bigquery_client(config)
     table_id = f"{project_id}.{dataset_id}.{progress_table_id}"
 
     # しきい値（JST）
@@ -91,6 +85,283 @@ def cleanup_progress_table(config, retention_minutes: int = 90) -> None:
     except Exception as e:
         logger.error(f"Progress table cleanup failed: {e}", exc_info=True)
         
+def _process_date(gsc_connector, progress, current_date, start_record=0, force_restart=False, estimate=None):
+    """1日分のデータを取得・挿入し、(状態, レコード数) を返します。
+
+    状態は "fetched"（取得完了）、"skipped"（完了済み）、"incomplete"（クォータ到達またはエラー）のいずれかです。
+    start_record を指定すると、前回の実行で確定した位置から取得を再開します。
+    force_restart=True の場合は完了済みでもスキップせずに取得します。
+    estimate は過去の行数からの推定行数で、行数の上限による分割の要否の判定に使用します。
+    """
+    # 完了済みの日付をスキップ（実行開始時に読み込んだ進捗スナップショットで判定）
+    if not force_restart and progress.is_completed(current_date):
+        logger.info(f"Date {current_date} is already completed. Skipping.")
+        return "skipped", 0
+
+    # 日付ごとのレコード数を初期化
+    date_total_records = 0
+    while True:
+        try:
+            if start_record == 0 and date_total_records == 0 and gsc_connector.needs_split(str(current_date), estimate):
+                # 行数の上限に達する日付は分割して取得（行データ・進捗は日付の完了時にまとめて反映）
+                return "fetched", _process_split_date(gsc_connector, progress, current_date)
+
+            fetch_limit = gsc_connector.config.gsc_settings['batch_size']
+            logger.info(f"Fetching records from {current_date}, start_record={start_record}, limit={fetch_limit}")
+            records, next_record, is_last = gsc_connector.fetch_page(str(current_date), start_record, fetch_limit)
+            logger.info(f"Fetched {len(records)} records.")
+
+            if records:
+                landed = gsc_connector.insert_to_bigquery(records, str(current_date), f"r{start_record}")
+                if is_last:
+                    # 日付の最終ページ: 保留中の行データ（ロードジョブ使用時）を反映
+                    gsc_connector.flush_date(str(current_date))
+                    landed = True
+                logger.info(f"{'Inserted' if landed else 'Staged'} {len(records)} records into BigQuery.")
+                date_total_records += len(records)  # 日付ごとのレコード数を累積
+
+                # 進捗保存（アップサート）: 行データの反映が確定したページのみ
+                if landed:
+                    progress.save({
+                        "date": current_date,
+                        "record": next_record,
+                        "is_date_completed": is_last
+                    })
+                    logger.info(f"Progress saved for date {current_date}.")
+
+                if is_last:
+                    # 日付完了、次の日付へ
+                    logger.info(f"All records for date {current_date} have been processed.")
+                    return "fetched", date_total_records
+                # 同じ日の続きから
+                start_record = next_record
+                logger.info(f"Continuing on the same date: {current_date}, new start_record={start_record}")
+            else:
+                # データなし、次の日付へ（0件でも完了としてマーク）
+                logger.info(f"No records fetched for date {current_date}. Marking as completed and moving to next date.")
+                gsc_connector.flush_date(str(current_date))
+                # 完了時の record_position は日付の行数（以降の実行で行数の推定に使用）
+                progress.save({
+                    "date": current_date,
+                    "record": start_record,
+                    "is_date_completed": True
+                })
+                logger.info(f"Progress saved for date {current_date} ({start_record} records in total).")
+                # 0件でも取得として記録（前ページまでの累積件数を返す）
+                return "fetched", date_total_records
+
+        except QuotaExceededError as e:
+            logger.warning(f"Stopping at date {current_date}, record {start_record}: {e}")
+            gsc_connector.discard_date(str(current_date))
+            break
+        except CacheMissError as e:
+            logger.warning(f"Skipping date {current_date} in offline mode: {e}")
+            gsc_connector.discard_date(str(current_date))
+            break
+        except Exception as e:
+            gsc_connector.discard_date(str(current_date))
+            logger.error(f"Error at date {current_date}, record {start_record}: {e}", exc_info=True)
+            # エラー通知を送信
+            send_error_notification(
+                error=e,
+                error_type="GSC Data Processing Error",
+                context={
+                    "date": str(current_date),
+                    "start_record": start_record,
+                    "processed_count": gsc_connector.quota.consumed
+                }
+            )
+            break
+
+    return "incomplete", date_total_records
+
+def _process_split_date(gsc_connector, progress, current_date):
+    """行数の上限に達する日付を分割して取得・挿入し、レコード数を返します。
+
+    shard は startRow で再開できないため、日付の全 shard を集計器に蓄積してから flush_date で1度だけ挿入します。
+    途中で失敗した場合は何も書き込まれず、次回の実行で日付全体を取り直しても行は重複しません。
+    """
+    date_total_records = 0
+    for records in gsc_connector.fetch_split(str(current_date)):
+        gsc_connector.buffer_records(records, str(current_date))
+        date_total_records += len(records)
+    gsc_connector.flush_date(str(current_date))
+    logger.info(f"Inserted {date_total_records} records of split date {current_date} into BigQuery.")
+    progress.save({
+        "date": current_date,
+        "record": date_total_records,
+        "is_date_completed": True
+    })
+    logger.info(f"Progress saved for date {current_date}.")
+    return date_total_records
+
+def _get_restart_dates(gsc_settings, date_list):
+    """設定で強制再取得が指定された日付の集合を返します（record 0 から取り直す）。"""
+    if gsc_settings['force_restart']:
+        return set(date_list)
+    return {date for date in date_list if date in gsc_settings['restart_dates']}
+
+# プロパティごとの取得計画（対象日付・進捗スナップショット・強制再取得の日付・開始位置・推定行数）
+PropertyPlan = namedtuple("PropertyPlan", "connector date_list progress restart_dates start_records estimates")
+
+def ensure_property_tables(property_config) -> None:
+    """プロパティの書き込み先テーブルと進捗テーブルを、共有設定のテーブルと同じスキーマで作成します（存在しない場合）。"""
+    project_id = property_config.get_config_value('BIGQUERY', 'PROJECT_ID')
+    dataset_id = property_config.get_config_value('BIGQUERY', 'DATASET_ID')
+    client = get_bigquery_client(property_config)
+    for key in ('TABLE_ID', 'PROGRESS_TABLE_ID'):
+        base_table = f"{project_id}.{dataset_id}.{config.get_config_value('BIGQUERY', key)}"
+        table = f"{project_id}.{dataset_id}.{property_config.get_config_value('BIGQUERY', key)}"
+        client.query(f"CREATE TABLE IF NOT EXISTS `{table}` LIKE `{base_table}`").result()
+
+def _create_connectors():
+    """取得対象のプロパティごとの GSCConnector を返します。
+
+    [GSC] properties が指定されている場合は、プロパティごとにクォータ・書き込み先・進捗テーブルを分け、
+    GSC API クライアント・BigQuery クライアント・文字列辞書・集計プールは全プロパティで共有します。
+    """
+    properties = config.gsc_properties()
+    if not properties:
+        return [GSCConnector(config)]
+
+    connectors = []
+    for property_config in properties:
+        ensure_property_tables(property_config)
+        connectors.append(GSCConnector(property_config, shared=connectors[0] if connectors else None))
+        logger.info(f"GSC property '{property_config.name}' を初期化しました: {property_config.gsc_settings['url']}")
+    return connectors
+
+def _plan_property(gsc_connector, date_list, initial_run):
+    """プロパティの進捗を読み込み、取得対象の日付・開始位置と日付ごとの推定行数を決定します。"""
+    # 対象期間（と行数の推定に使用する過去 volume_history_weeks 週）の進捗を1回のクエリで読み込み、
+    # 以降の完了判定はこのスナップショットで行う
+    gsc_settings = gsc_connector.config.gsc_settings
+    history_days = gsc_settings['volume_history_weeks'] * 7
+    history_dates = [min(date_list) - timedelta(days=i) for i in range(1, history_days + 1)] if date_list else []
+    progress = ProgressSnapshot.load(gsc_connector.config, date_list + history_dates)
+    restart_dates = _get_restart_dates(gsc_settings, date_list)
+
+    if initial_run:
+        # 未完了の日付をフィルタリング（強制再取得の日付は残す）
+        date_list = [date for date in date_list if not progress.is_completed(date) or date in restart_dates]
+        logger.info(f"Fetching data for dates: {date_list}")
+
+    # 途中で中断した日付は、最後に確定した record_position から再開
+    start_records = get_start_records(progress, date_list, restart_dates, gsc_connector.resumable)
+
+    # 完了済みの日付は記録された行数、それ以外は過去の同じ曜日の行数の中央値で推定
+    estimates = estimate_rows(progress.completed_counts(), date_list)
+    known = sum(estimate is not None for estimate in estimates.values())
+    logger.info(f"Estimated row counts for {known} of {len(date_list)} dates from progress history.")
+    return PropertyPlan(gsc_connector, date_list, progress, restart_dates, start_records, estimates)
+
+def _process_date_ranges(plan):
+    """
+    行数の少ない連続した日付を期間にまとめ、date ディメンション付きの1回のリクエストで取得・挿入します。
+
+    期間の行数が1ページに収まらなかった日付、途中で失敗した日付は結果に含めず、通常の日付単位の取得に回します。
+
+    Returns:
+        dict: 期間で取得した日付 → (状態, レコード数)
+    """
+    gsc_settings = plan.connector.config.gsc_settings
+    batch_size = gsc_settings['batch_size']
+    candidates = [
+        current_date for current_date in plan.date_list
+        if plan.start_records[current_date] == 0
+        and (current_date in plan.restart_dates or not plan.progress.is_completed(current_date))
+    ]
+    ranges = [
+        date_range
+        for date_range in plan_date_ranges(candidates, plan.estimates, batch_size, gsc_settings['range_max_days'])
+        if len(date_range) > 1
+    ]
+
+    outcomes = {}
+    gsc_connector = plan.connector
+    for date_range in ranges:
+        try:
+            batches = gsc_connector.fetch_range([str(current_date) for current_date in date_range], batch_size)
+        except (QuotaExceededError, CacheMissError) as e:
+            logger.warning(f"Stopping range requests at {date_range[0]}: {e}")
+            break
+        except Exception as e:
+            logger.warning(f"Range request for {date_range[0]} to {date_range[-1]} failed; fetching per date: {e}")
+            continue
+        if batches is None:
+            continue
+
+        for current_date in date_range:
+            records = batches[str(current_date)]
+            try:
+                if records:
+                    gsc_connector.insert_to_bigquery(records, str(current_date), "r0")
+                gsc_connector.flush_date(str(current_date))
+                plan.progress.save({
+                    "date": current_date,
+                    "record": len(records),
+                    "is_date_completed": True
+                })
+            except Exception as e:
+                gsc_connector.discard_date(str(current_date))
+                logger.error(f"Error at date {current_date} of range request; fetching per date: {e}", exc_info=True)
+                continue
+            logger.info(f"Inserted {len(records)} records of {current_date} from range request.")
+            outcomes[current_date] = ("fetched", len(records))
+    return outcomes
+
+def _process_plan_date(plan, current_date):
+    return _process_date(
+        plan.connector, plan.progress, current_date, plan.start_records[current_date], current_date in plan.restart_dates,
+        plan.estimates.get(current_date)
+    )
+
+def _process_properties(plans, max_workers):
+    """複数プロパティの日付を交互に並べてワーカーへ割り当て、プロパティごとの結果のリストを返します。
+
+    ワーカーは先頭から順に日付を取り出すため、日付数の多いプロパティがワーカーを占有せず、
+    各プロパティが同じ速さで進みます。1日あたりのクォータはプロパティごとのスケジューラで管理されるため、
+    上限に達したプロパティの日付だけが未完了になります。
+    """
+    items = [
+        item
+        for group in zip_longest(*[[(plan, current_date) for current_date in plan.date_list] for plan in plans])
+        for item in group if item is not None
+    ]
+    logger.info(f"Processing {len(items)} dates of {len(plans)} properties with {max_workers} workers.")
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gsc-date") as executor:
+            results = list(executor.map(lambda item: _process_plan_date(*item), items))
+    else:
+        results = [_process_plan_date(*item) for item in items]
+
+    outcomes = {id(plan): {} for plan in plans}
+    for (plan, current_date), outcome in zip(items, results):
+        outcomes[id(plan)][current_date] = outcome
+    return [[outcomes[id(plan)][current_date] for current_date in plan.date_list] for plan in plans]
+
+def _process_single_property(plan, max_workers):
+    """1プロパティの日付を処理し、日付ごとの (状態, レコード数) のリストを返します。"""
+    gsc_connector, date_list, progress, restart_dates, start_records, estimates = plan
+    if config.gsc_settings['pipeline_mode']:
+        # パイプラインモード: 取得・集計・挿入・進捗確定をステージごとに並行実行
+        pipeline = GSCPipeline(
+            gsc_connector,
+            check_completed=lambda current_date: (
+                current_date not in restart_dates and progress.is_completed(current_date)
+            ),
+            save_position=progress.save,
+            batch_size=gsc_connector.config.gsc_settings['batch_size'],
+            queue_size=gsc_connector.config.gsc_settings['pipeline_queue_size']
+        )
+        return pipeline.run(date_list, start_records, estimates)
+    if max_workers > 1:
+        # 並列モード: 日付ごとに独立したページングカーソルで取得・挿入
+        logger.info(f"Processing {len(date_list)} dates concurrently with {max_workers} workers.")
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gsc-date") as executor:
+            return list(executor.map(lambda current_date: _process_plan_date(plan, current_date), date_list))
+    return [_process_plan_date(plan, current_date) for current_date in date_list]
+
 def process_gsc_data():
     """GSC データを取得し、BigQuery に保存するメイン処理"""
     logger.info("process_gsc_data が呼び出されました。")
@@ -98,13 +369,12 @@ def process_gsc_data():
     # 初期実行フラグの取得
     initial_run = config.gsc_settings['initial_run']
 
-    # GSCConnector の初期化
-    gsc_connector = GSCConnector(config)
+    # GSCConnector の初期化（複数プロパティの取得時はプロパティごと）
+    connectors = _create_connectors()
     logger.info("GSCConnector を初期化しました。")
 
-    # GSC APIの1日あたりのクォータを設定
-    daily_api_limit = config.gsc_settings['daily_api_limit']
-    processed_count = 0
+    # GSC APIのクォータは GSCConnector のスケジューラで管理（並列実行時も全ワーカーで共有）
+    max_workers = config.gsc_settings['max_workers']
     daily_record_counts = {}  # 日ごとのレコード数を記録する辞書
     skipped_dates = []  # スキップされた日付を記録するリスト
 
@@ -116,94 +386,60 @@ def process_gsc_data():
         start_date = end_date - timedelta(days=config.gsc_settings['initial_fetch_days'] - 1)
         # 取得対象の日付リストを作成
         date_list = [end_date - timedelta(days=i) for i in range(config.gsc_settings['initial_fetch_days'])]
-        
-        # 進捗テーブルから `is_date_completed=true` の日付を取得
-        completed_dates = get_completed_dates(config, date_list)
-        
-        # 未完了の日付をフィルタリング
-        date_list = [date for date in date_list if date not in completed_dates]
-        logger.info(f"Fetching data for dates: {date_list}")
     else:
         logger.info("INITIAL_RUN=false: 最新のデータを取得します。")
         start_date = end_date - timedelta(days=config.gsc_settings['daily_fetch_days'] - 1)
         date_list = [end_date - timedelta(days=i) for i in range((end_date - start_date).days + 1)]
         logger.info(f"Processing GSC data for date range: {start_date} to {end_date}")
 
-    # 各日付に対してデータを取得・処理
-    for current_date in date_list:
-        # 完了済みの日付をスキップ
-        is_completed = check_if_date_completed(config, current_date)
-        if is_completed:
-            logger.info(f"Date {current_date} is already completed. Skipping.")
-            skipped_dates.append(str(current_date))
-            continue
-
-        # 日付ごとのレコード数を初期化
-        date_total_records = 0
-        start_record = 0
-        while processed_count < daily_api_limit:
-            try:
-                fetch_limit = config.gsc_settings['batch_size']
-                logger.info(f"Fetching records from {current_date}, start_record={start_record}, limit={fetch_limit}")
-                records, next_record = gsc_connector.fetch_records(
-                    date=str(current_date),
-                    start_record=start_record,
-                    limit=fetch_limit
-                )
-                logger.info(f"Fetched {len(records)} records.")
+    plans = [_plan_property(gsc_connector, date_list, initial_run) for gsc_connector in connectors]
 
-                if records:
-                    gsc_connector.insert_to_bigquery(records, str(current_date))
-                    logger.info(f"Inserted {len(records)} records into BigQuery.")
-                    processed_count += 1
-                    date_total_records += len(records)  # 日付ごとのレコード数を累積
-
-                    # 進捗保存（アップサート）
-                    save_processing_position(config, {
-                        "date": current_date,
-                        "record": next_record,
-                        "is_date_completed": len(records) < fetch_limit
-                    })
-                    logger.info(f"Progress saved for date {current_date}.")
-
-                    if len(records) < fetch_limit:
-                        # 日付完了、次の日付へ
-                        logger.info(f"All records for date {current_date} have been processed.")
-                        # 日付ごとのレコード数を記録
-                        daily_record_counts[str(current_date)] = date_total_records
-                        break
-                    else:
-                        # 同じ日の続きから
-                        start_record = next_record
-                        logger.info(f"Continuing on the same date: {current_date}, new start_record={start_record}")
-                else:
-                    # データなし、次の日付へ（0件でも完了としてマーク）
-                    logger.info(f"No records fetched for date {current_date}. Marking as completed and moving to next date.")
-                    save_processing_position(config, {
-                        "date": current_date,
-                        "record": 0,
-                        "is_date_completed": True
-                    })
-                    logger.info(f"Progress saved for date {current_date} (0 records).")
-                    # 0件でも取得として記録
-                    daily_record_counts[str(current_date)] = 0
-                    break
+    # 行数の少ない連続した日付は、期間をまとめた1回のリクエストで先に取得
+    range_outcomes = [
+        _process_date_ranges(plan) if plan.connector.config.gsc_settings['range_requests'] else {} for plan in plans
+    ]
+    remaining_plans = [
+        plan._replace(date_list=[current_date for current_date in plan.date_list if current_date not in fetched])
+        for plan, fetched in zip(plans, range_outcomes)
+    ]
 
-            except Exception as e:
-                logger.error(f"Error at date {current_date}, record {start_record}: {e}", exc_info=True)
-                # エラー通知を送信
-                send_error_notification(
-                    error=e,
-                    error_type="GSC Data Processing Error",
-                    context={
-                        "date": str(current_date),
-                        "start_record": start_record,
-                        "processed_count": processed_count
-                    }
-                )
-                break
-
-    logger.info(f"Processed {processed_count} API calls in total")
+    # 各日付に対してデータを取得・処理
+    if len(plans) == 1:
+        remaining_outcomes = [_process_single_property(remaining_plans[0], max_workers)]
+    else:
+        if config.gsc_settings['pipeline_mode']:
+            logger.warning("pipeline_mode is not used when fetching multiple properties; dates are scheduled per worker.")
+        remaining_outcomes = _process_properties(remaining_plans, max_workers)
+
+    property_outcomes = []
+    for plan, fetched, outcomes in zip(plans, range_outcomes, remaining_outcomes):
+        outcomes = iter(outcomes)
+        property_outcomes.append([
+            fetched[current_date] if current_date in fetched else next(outcomes) for current_date in plan.date_list
+        ])
+
+    for plan, outcomes in zip(plans, property_outcomes):
+        # 複数プロパティの場合は通知の日付にプロパティ名を付ける
+        label = f"{plan.connector.config.name} " if len(plans) > 1 else ""
+        for current_date, (status, date_total_records) in zip(plan.date_list, outcomes):
+            if status == "skipped":
+                skipped_dates.append(f"{label}{current_date}")
+            elif status == "fetched":
+                # 日付ごとのレコード数を記録
+                daily_record_counts[f"{label}{current_date}"] = date_total_records
+
+    # 未使用の予約クォータを台帳へ返却し、書き込みの統計を出力
+    for gsc_connector in connectors:
+        gsc_connector.close()
+        property_name = getattr(gsc_connector.config, 'name', None)
+        logger.info(f"BigQuery write stats{f' ({property_name})' if property_name else ''}: "
+                    f"{gsc_connector.sink.stats.summary()}")
+    url_stats = normalize_url_stats()
+    logger.info(f"normalize_url cache: {url_stats['hits']} hits, {url_stats['misses']} misses "
+                f"(hit rate {url_stats['hit_rate']:.1%}, size {url_stats['size']}/{url_stats['max_size']})")
+    logger.info(f"String dictionaries: {connectors[0].query_dictionary.summary()}; "
+                f"{connectors[0].url_dictionary.summary()}")
+    logger.info(f"Processed {sum(gsc_connector.quota.consumed for gsc_connector in connectors)} API calls in total")
 
     # 初回実行後にフラグを更新
     if initial_run:
@@ -233,101 +469,6 @@ def process_gsc_data():
     except Exception as e:
         logger.error(f"成功通知の送信に失敗しました: {e}", exc_info=True)
 
-def get_completed_dates(config, date_list):
-    """進捗テーブルから `is_date_completed=true` の日付を取得します。
-
-    Args:
-        config: Config クラスのインスタンス
-        date_list (list): チェック対象の日付リスト
-
-    Returns:
-        list: 完了済みの日付リスト
-    """
-
-    credentials = _get_bigquery_credentials(config)
-    client = bigquery.Client(credentials=credentials, project=config.get_config_value('BIGQUERY', 'PROJECT_ID'))
-    project_id = config.get_config_value('BIGQUERY', 'PROJECT_ID')      # 'bigquery-jukust'
-    dataset_id = config.get_config_value('BIGQUERY', 'DATASET_ID')      # 'past_gsc_202411'
-    progress_table_id = config.get_config_value('BIGQUERY', 'PROGRESS_TABLE_ID')  # 'T_progress_tracking'
-    
-    table_id = f"{project_id}.{dataset_id}.{progress_table_id}"        # 'bigquery-jukust.past_gsc_202411.T_progress_tracking'
-
-    query = f"""
-        WITH ranked AS (
-            SELECT
-                data_date,
-                is_date_completed,
-                updated_at,
-                ROW_NUMBER() OVER (
-                    PARTITION BY data_date
-                    ORDER BY is_date_completed DESC, updated_at DESC
-                ) AS rn
-            FROM `{table_id}`
-            WHERE (record_position > 0 OR is_date_completed = TRUE)
-              AND data_date IN UNNEST(@dates)
-        )
-        SELECT data_date
-        FROM ranked
-        WHERE rn = 1 AND is_date_completed = TRUE
-    """
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ArrayQueryParameter("dates", "DATE", date_list)
-        ]
-    )
-
-    try:
-        query_job = client.query(query, job_config=job_config)
-        results = list(query_job.result())
-        completed_dates = [row.data_date for row in results]
-        logger.info(f"Completed dates: {completed_dates}")
-        return completed_dates
-    except Exception as e:
-        logger.error(f"Error fetching completed dates: {e}", exc_info=True)
-        return []
-
-def check_if_date_completed(config, date):
-    """指定された日付が進捗テーブルで完了しているかを確認します。"""
-    credentials = _get_bigquery_credentials(config)
-    project_id = config.get_config_value('BIGQUERY', 'PROJECT_ID')      # 'bigquery-jukust'
-    dataset_id = config.get_config_value('BIGQUERY', 'DATASET_ID')      # 'past_gsc_202411'
-    progress_table_id = config.get_config_value('BIGQUERY', 'PROGRESS_TABLE_ID')  # 'T_progress_tracking'
-    
-    client = bigquery.Client(credentials=credentials, project=project_id)
-    table_id = f"{project_id}.{dataset_id}.{progress_table_id}"        # 'bigquery-jukust.past_gsc_202411.T_progress_tracking'
-
-
-    query = f"""
-        WITH ranked AS (
-            SELECT
-                data_date,
-                is_date_completed,
-                updated_at,
-                ROW_NUMBER() OVER (
-                    PARTITION BY data_date
-                    ORDER BY is_date_completed DESC, updated_at DESC
-                ) AS rn
-            FROM `{table_id}`
-            WHERE (record_position > 0 OR is_date_completed = TRUE) AND data_date = @data_date
-        )
-        SELECT COUNTIF(is_date_completed = TRUE AND rn = 1) AS count
-        FROM ranked
-    """
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("data_date", "DATE", date)
-        ]
-    )
-
-    try:
-        query_job = client.query(query, job_config=job_config)
-        result = query_job.result().to_dataframe()
-        count = result['count'][0]
-        return count > 0
-    except Exception as e:
-        logger.error(f"Error checking if date {date} is completed: {e}", exc_info=True)
-        return False
-
 def update_initial_run_flag(config, flag: bool):
     """
     settings.iniのINITIAL_RUNフラグを更新します。
@@ -351,76 +492,3 @@ def update_initial_run_flag(config, flag: bool):
         parser.write(configfile)
 
     logger.info(f"settings.ini の INITIAL_RUN を {flag} に更新しました。")
-
-def save_processing_position(config, position):
-    """処理位置を保存（アップサート操作）"""
-    credentials = _get_bigquery_credentials(config)
-    project_id = config.get_config_value('BIGQUERY', 'PROJECT_ID')      # 'bigquery-jukust'
-    dataset_id = config.get_config_value('BIGQUERY', 'DATASET_ID')      # 'past_gsc_202411'
-    progress_table_id = config.get_config_value('BIGQUERY', 'PROGRESS_TABLE_ID')  # 'T_progress_tracking'
-
-    client = bigquery.Client(credentials=credentials, project=project_id)
-    table_id = f"{project_id}.{dataset_id}.{progress_table_id}"        # 'bigquery-jukust.past_gsc_202411.T_progress_tracking'
-
-    logger.debug(f"Constructed Table ID: {table_id}")  # デバッグログの追加
-
-    updated_at_jst = format_datetime_jst(get_current_jst_datetime())
-
-    data_date = str(position["date"])
-    record_position = position["record"]
-    is_date_completed = position["is_date_completed"]
-
-    # UPDATE/MERGE はストリーミングバッファに阻害されるため、追記INSERTに変更
-    insert_query = f"""
-        INSERT INTO `{table_id}` (data_date, record_position, is_date_completed, updated_at)
-        VALUES (@data_date, @record_position, @is_date_completed, @updated_at)
-    """
-
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("data_date", "DATE", data_date),
-            bigquery.ScalarQueryParameter("record_position", "INT64", record_position),
-            bigquery.ScalarQueryParameter("is_date_completed", "BOOL", is_date_completed),
-            bigquery.ScalarQueryParameter("updated_at", "DATETIME", updated_at_jst)
-        ]
-    )
-
-    try:
-        query_job = client.query(insert_query, job_config=job_config)
-        query_job.result()  # 完了まで待機
-        logger.info(f"Progress updated for date {data_date}.")
-    except Exception as e:
-        logger.error(f"Failed to save processing position for {data_date}: {e}", exc_info=True)
-        raise
-
-def get_last_processed_position(config):
-    """最後に処理したポジションを取得"""
-    project_id = config.get_config_value('BIGQUERY', 'PROJECT_ID')      # 'bigquery-jukust'
-    dataset_id = config.get_config_value('BIGQUERY', 'DATASET_ID')      # 'past_gsc_202411'
-    progress_table_id = config.get_config_value('BIGQUERY', 'PROGRESS_TABLE_ID')  # 'T_progress_tracking'
-    
-    table_id = f"{project_id}.{dataset_id}.{progress_table_id}"        # 'bigquery-jukust.past_gsc_202411.T_progress_tracking'
-
-    credentials = _get_bigquery_credentials(config)
-    client = bigquery.Client(credentials=credentials, project=project_id)
-
-    query = f"""
-        SELECT data_date, record_position, is_date_completed
-        FROM `{table_id}`
-        WHERE record_position > 0
-        ORDER BY updated_at DESC
-        LIMIT 1
-    """
-    try:
-        query_job = client.query(query)
-        results = list(query_job.result())
-        if results:
-            return {
-                "date": results[0].data_date,  # data_dateはすでにdatetime.date型
-                "record": results[0].record_position,
-                "is_date_completed": results[0].is_date_completed
-            }
-        return None
-    except Exception as e:
-        logger.error(f"Error fetching last processed position: {e}", exc_info=True)
-        return None
\ No newline at end of file
@@ -0,0 +1,253 @@
+# src/modules/gsc_pipeline.py
+
+import queue
+import threading
+
+from utils.quota_scheduler import QuotaExceededError
+from utils.response_cache import CacheMissError
+from utils.webhook_notifier import send_error_notification
+
+from utils.logging_config import get_logger
+logger = get_logger(__name__)
+
+# 各ステージに終了を伝える番兵
+_STOP = object()
+
+class GSCPipeline:
+    """取得 → 集計 → 書き込み → 進捗確定 の各ステージを有界キューで接続したパイプライン
+
+    各ステージは専用スレッドで動作するため、ページ N の BigQuery 挿入中にページ N+1 の取得が進みます。
+    キューが満杯になると上流ステージが待機する（バックプレッシャー）ため、
+    メモリ上に保持されるページ数は queue_size × キュー数 で頭打ちになります。
+    進捗は書き込みが完了したページについてのみ、取得順に確定されます。
+    """
+
+    def __init__(self, gsc_connector, check_completed, save_position, batch_size: int,
+                 queue_size: int = 4):
+        """
+        コンストラクタ
+
+        Args:
+            gsc_connector (GSCConnector): GSC の取得・BigQuery 挿入に使用するコネクタ
+            check_completed (callable): 日付を受け取り、完了済みかを返す関数
+            save_position (callable): 進捗（date/record/is_date_completed）を保存する関数
+            batch_size (int): 1ページあたりの取得件数
+            queue_size (int): 各ステージ間キューの最大ページ数
+        """
+        self.gsc_connector = gsc_connector
+        self.check_completed = check_completed
+        self.save_position = save_position
+        self.batch_size = batch_size
+        self.queue_size = max(1, queue_size)
+        self._lock = threading.Lock()
+        self._failed_dates = set()
+        self._results = {}
+
+    def run(self, date_list, start_records=None, estimates=None):
+        """
+        パイプラインを実行し、日付ごとの (状態, レコード数) を date_list の順で返します。
+
+        Args:
+            date_list (list): 処理対象の日付リスト
+            start_records (dict, optional): 日付ごとの取得開始位置（省略時はすべて 0）
+            estimates (dict, optional): 日付ごとの推定行数（行数の上限による分割の要否の判定に使用）
+
+        Returns:
+            list: (状態, レコード数) のリスト。状態は "fetched" / "skipped" / "incomplete"
+        """
+        fetch_queue = queue.Queue(maxsize=self.queue_size)
+        aggregate_queue = queue.Queue(maxsize=self.queue_size)
+        commit_queue = queue.Queue(maxsize=self.queue_size)
+
+        stages = [
+            threading.Thread(target=self._fetch_stage, args=(date_list, start_records or {}, estimates or {}, fetch_queue),
+                             name="gsc-fetcher"),
+            threading.Thread(target=self._relay_stage, args=(fetch_queue, aggregate_queue, self._aggregate),
+                             name="gsc-aggregator"),
+            threading.Thread(target=self._relay_stage, args=(aggregate_queue, commit_queue, self._write),
+                             name="gsc-writer"),
+            threading.Thread(target=self._commit_stage, args=(commit_queue,), name="gsc-committer"),
+        ]
+        logger.info(f"Starting GSC pipeline for {len(date_list)} dates (queue_size={self.queue_size}).")
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+
+        # クォータ到達などで途中終了した日付の未反映の行データを破棄
+        for current_date in date_list:
+            if self._results.get(current_date, ("incomplete", 0))[0] == "incomplete":
+                self.gsc_connector.discard_date(str(current_date))
+
+        return [self._results.get(current_date, ("incomplete", 0)) for current_date in date_list]
+
+    def _fetch_stage(self, date_list, start_records, estimates, out_queue):
+        """日付ごとにページを取得し、下流キューへ送ります。"""
+        try:
+            for current_date in date_list:
+                if self.check_completed(current_date):
+                    logger.info(f"Date {current_date} is already completed. Skipping.")
+                    self._results[current_date] = ("skipped", 0)
+                    continue
+
+                self._results[current_date] = ("incomplete", 0)
+                start_record = start_records.get(current_date, 0)
+                try:
+                    estimate = estimates.get(current_date)
+                    if start_record == 0 and self.gsc_connector.needs_split(str(current_date), estimate):
+                        self._fetch_split(current_date, out_queue)
+                        continue
+                except QuotaExceededError as e:
+                    logger.warning(f"Stopping at date {current_date}, record {start_record}: {e}")
+                    return
+                except CacheMissError as e:
+                    logger.warning(f"Skipping date {current_date} in offline mode: {e}")
+                    continue
+                except Exception as e:
+                    self._fail(current_date, start_record, e)
+                    continue
+
+                while not self._is_failed(current_date):
+                    try:
+                        logger.info(f"Fetching records from {current_date}, start_record={start_record}, limit={self.batch_size}")
+                        records, next_record, is_last = self.gsc_connector.fetch_page(
+                            str(current_date), start_record, self.batch_size
+                        )
+                    except QuotaExceededError as e:
+                        # クォータ到達: 以降の日付も取得できないため取得ステージを終了
+                        logger.warning(f"Stopping at date {current_date}, record {start_record}: {e}")
+                        return
+                    except CacheMissError as e:
+                        logger.warning(f"Skipping date {current_date} in offline mode: {e}")
+                        break
+                    except Exception as e:
+                        self._fail(current_date, start_record, e)
+                        break
+
+                    out_queue.put({
+                        "date": current_date,
+                        "start_record": start_record,
+                        "page_key": f"r{start_record}",
+                        "next_record": next_record,
+                        "record_count": len(records),
+                        "records": records,
+                        "is_last": is_last,
+                    })
+                    if is_last:
+                        break
+                    start_record = next_record
+        finally:
+            out_queue.put(_STOP)
+
+    def _fetch_split(self, current_date, out_queue):
+        """行数の上限に達する日付を分割して取得し、下流キューへ送ります。
+
+        shard は完了順に届き startRow で再開できないため、行データは日付の集計器に蓄積（buffered）し、
+        日付の最後の項目の flush_date でまとめて挿入します（途中で失敗しても行データは書き込まれません）。
+        """
+        fetched = 0
+        for records in self.gsc_connector.fetch_split(str(current_date)):
+            if self._is_failed(current_date):
+                return
+            fetched += len(records)
+            out_queue.put({
+                "date": current_date,
+                "start_record": 0,
+                "next_record": fetched,
+                "record_count": len(records),
+                "records": records,
+                "is_last": False,
+                "buffered": True,
+            })
+        out_queue.put({
+            "date": current_date,
+            "start_record": 0,
+            "next_record": fetched,
+            "record_count": 0,
+            "records": [],
+            "is_last": True,
+        })
+
+    def _relay_stage(self, in_queue, out_queue, handler):
+        """上流キューのページに handler を適用し、成功したページを下流キューへ送ります。"""
+        while True:
+            item = in_queue.get()
+            if item is _STOP:
+                out_queue.put(_STOP)
+                return
+            if self._is_failed(item["date"]):
+                continue
+            try:
+                handler(item)
+            except Exception as e:
+                self._fail(item["date"], item["start_record"], e)
+                continue
+            out_queue.put(item)
+
+    def _aggregate(self, item):
+        """ページのレコードを集計し、挿入用の行データに置き換えます。"""
+        records = item.pop("records")
+        if item.get("buffered"):
+            # 分割取得の shard は日付の集計器に蓄積し、flush_date で挿入する
+            self.gsc_connector.buffer_records(records, str(item["date"]))
+            item["rows"] = []
+            return
+        item["rows"] = self.gsc_connector.build_rows(records, str(item["date"])) if records else []
+
+    def _write(self, item):
+        """集計済みの行データを BigQuery に挿入します。日付の最終ページでは保留中の行データも反映します。"""
+        rows = item.pop("rows")
+        landed = self.gsc_connector.insert_rows(rows, str(item["date"]), item["page_key"]) if rows else False
+        if item["is_last"]:
+            self.gsc_connector.flush_date(str(item["date"]))
+            landed = True
+        item["landed"] = landed
+        if rows:
+            logger.info(f"{'Inserted' if landed else 'Staged'} {item['record_count']} records into BigQuery.")
+
+    def _commit_stage(self, in_queue):
+        """挿入が完了したページの進捗を取得順に保存します（反映が保留中のページは件数のみ加算）。"""
+        while True:
+            item = in_queue.get()
+            if item is _STOP:
+                return
+            current_date = item["date"]
+            # 書き込みまで完了したページは、後続のページが失敗していても進捗を確定する
+            # （確定しないと再実行で同じページが再挿入される）
+            try:
+                if item["landed"]:
+                    self.save_position({
+                        "date": current_date,
+                        "record": item["next_record"],
+                        "is_date_completed": item["is_last"]
+                    })
+            except Exception as e:
+                self._fail(current_date, item["start_record"], e)
+                continue
+
+            _, date_total_records = self._results[current_date]
+            date_total_records += item["record_count"]
+            status = "fetched" if item["is_last"] else "incomplete"
+            self._results[current_date] = (status, date_total_records)
+            if item["is_last"]:
+                logger.info(f"All records for date {current_date} have been processed.")
+
+    def _is_failed(self, current_date):
+        with self._lock:
+            return current_date in self._failed_dates
+
+    def _fail(self, current_date, start_record, error):
+        """日付を失敗扱いにし、以降のページを破棄させてエラー通知を送信します。"""
+        with self._lock:
+            self._failed_dates.add(current_date)
+        self.gsc_connector.discard_date(str(current_date))
+        logger.error(f"Error at date {current_date}, record {start_record}: {error}", exc_info=error)
+        send_error_notification(
+            error=error,
+            error_type="GSC Data Processing Error",
+            context={
+                "date": str(current_date),
+                "start_record": start_record,
+                "processed_count": self.gsc_connector.quota.consumed
+            }
+        )
@@ -0,0 +1,214 @@
+# src/modules/progress_store.py
+
+import threading
+
+from google.cloud import bigquery
+
+from utils.bigquery_client import get_bigquery_client
+from utils.date_utils import get_current_jst_datetime, format_datetime_jst
+
+from utils.logging_config import get_logger
+logger = get_logger(__name__)
+
+class ProgressSnapshot:
+    """実行開始時に読み込んだ進捗テーブルの状態をメモリ上で保持するクラス
+
+    日付ごとの完了判定は BigQuery に問い合わせずこのスナップショットで行い、
+    ページの進捗を保存するたびにローカルの状態も更新します。複数スレッドから共有できます。
+    """
+
+    def __init__(self, config, positions):
+        """
+        Args:
+            config: Config クラスのインスタンス
+            positions (dict): get_processing_positions の戻り値
+        """
+        self.config = config
+        self._positions = dict(positions)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, config, date_list):
+        """対象期間の進捗を1回のクエリで読み込みます。"""
+        positions = get_processing_positions(config, date_list)
+        logger.info(f"Loaded progress snapshot for {len(positions)} of {len(date_list)} dates.")
+        return cls(config, positions)
+
+    def position(self, date):
+        """日付の最新の処理位置（{"record", "is_date_completed"}）を返します。未着手の場合は None。"""
+        with self._lock:
+            position = self._positions.get(date)
+            return dict(position) if position else None
+
+    def completed_counts(self) -> dict:
+        """完了済みの日付ごとの行数（完了時の record_position）を返します。
+
+        record_position が 0 の日付は、行数が 0 の日付と末尾の空ページで完了した日付を区別できないため除外します。
+        """
+        with self._lock:
+            return {
+                date: position["record"]
+                for date, position in self._positions.items()
+                if position["is_date_completed"] and position["record"] > 0
+            }
+
+    def is_completed(self, date) -> bool:
+        """日付が完了済みかどうかを返します。"""
+        with self._lock:
+            position = self._positions.get(date)
+            return bool(position and position["is_date_completed"])
+
+    def save(self, position) -> None:
+        """進捗を進捗テーブルに保存し、成功した場合はスナップショットも更新します。"""
+        save_processing_position(self.config, position)
+        with self._lock:
+            # 進捗テーブルと同じく最新の保存内容を採用（完了済みの日付を取り直した場合は未完了に戻る）
+            self._positions[position["date"]] = {
+                "record": position["record"],
+                "is_date_completed": position["is_date_completed"]
+            }
+
+def get_start_records(progress, date_list, restart_dates, resumable=True):
+    """日付ごとの取得開始位置を返します。
+
+    未完了の日付は進捗テーブルに保存された最新の record_position から、
+    強制再取得の日付と未着手の日付は 0 から開始します。
+    resumable が False（パーティション置換・日付単位の集計）の場合は、日付全体をまとめて書き込むため常に 0 から開始します。
+    """
+    start_records = {}
+    for current_date in date_list:
+        position = progress.position(current_date)
+        if current_date in restart_dates or not resumable:
+            logger.info(f"Date {current_date} is forced to restart from record 0.")
+            start_records[current_date] = 0
+        elif position and not position["is_date_completed"] and position["record"] > 0:
+            logger.info(f"Resuming date {current_date} from record {position['record']}.")
+            start_records[current_date] = position["record"]
+        else:
+            start_records[current_date] = 0
+    return start_records
+
+def save_processing_position(config, position):
+    """処理位置を保存（アップサート操作）"""
+    project_id = config.get_config_value('BIGQUERY', 'PROJECT_ID')      # 'bigquery-jukust'
+    dataset_id = config.get_config_value('BIGQUERY', 'DATASET_ID')      # 'past_gsc_202411'
+    progress_table_id = config.get_config_value('BIGQUERY', 'PROGRESS_TABLE_ID')  # 'T_progress_tracking'
+
+    client = get_bigquery_client(config)
+    table_id = f"{project_id}.{dataset_id}.{progress_table_id}"        # 'bigquery-jukust.past_gsc_202411.T_progress_tracking'
+
+    logger.debug(f"Constructed Table ID: {table_id}")  # デバッグログの追加
+
+    updated_at_jst = format_datetime_jst(get_current_jst_datetime())
+
+    data_date = str(position["date"])
+    record_position = position["record"]
+    is_date_completed = position["is_date_completed"]
+
+    # UPDATE/MERGE はストリーミングバッファに阻害されるため、追記INSERTに変更
+    insert_query = f"""
+        INSERT INTO `{table_id}` (data_date, record_position, is_date_completed, updated_at)
+        VALUES (@data_date, @record_position, @is_date_completed, @updated_at)
+    """
+
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("data_date", "DATE", data_date),
+            bigquery.ScalarQueryParameter("record_position", "INT64", record_position),
+            bigquery.ScalarQueryParameter("is_date_completed", "BOOL", is_date_completed),
+            bigquery.ScalarQueryParameter("updated_at", "DATETIME", updated_at_jst)
+        ]
+    )
+
+    try:
+        query_job = client.query(insert_query, job_config=job_config)
+        query_job.result()  # 完了まで待機
+        logger.info(f"Progress updated for date {data_date}.")
+    except Exception as e:
+        logger.error(f"Failed to save processing position for {data_date}: {e}", exc_info=True)
+        raise
+
+def get_last_processed_position(config):
+    """最後に処理したポジションを取得"""
+    project_id = config.get_config_value('BIGQUERY', 'PROJECT_ID')      # 'bigquery-jukust'
+    dataset_id = config.get_config_value('BIGQUERY', 'DATASET_ID')      # 'past_gsc_202411'
+    progress_table_id = config.get_config_value('BIGQUERY', 'PROGRESS_TABLE_ID')  # 'T_progress_tracking'
+    
+    table_id = f"{project_id}.{dataset_id}.{progress_table_id}"        # 'bigquery-jukust.past_gsc_202411.T_progress_tracking'
+
+    client = get_bigquery_client(config)
+
+    query = f"""
+        SELECT data_date, record_position, is_date_completed
+        FROM `{table_id}`
+        WHERE record_position > 0
+        ORDER BY updated_at DESC
+        LIMIT 1
+    """
+    try:
+        query_job = client.query(query)
+        results = list(query_job.result())
+        if results:
+            return {
+                "date": results[0].data_date,  # data_dateはすでにdatetime.date型
+                "record": results[0].record_position,
+                "is_date_completed": results[0].is_date_completed
+            }
+        return None
+    except Exception as e:
+        logger.error(f"Error fetching last processed position: {e}", exc_info=True)
+        return None
+
+def get_processing_positions(config, date_list):
+    """指定された日付ごとに、進捗テーブルの最新の処理位置を取得します。
+
+    Args:
+        config: Config クラスのインスタンス
+        date_list (list): 対象の日付リスト
+
+    Returns:
+        dict: 日付をキー、{"record", "is_date_completed"} を値とする辞書（取得失敗時は空）
+    """
+    if not date_list:
+        return {}
+
+    project_id = config.get_config_value('BIGQUERY', 'PROJECT_ID')
+    dataset_id = config.get_config_value('BIGQUERY', 'DATASET_ID')
+    progress_table_id = config.get_config_value('BIGQUERY', 'PROGRESS_TABLE_ID')
+
+    client = get_bigquery_client(config)
+    table_id = f"{project_id}.{dataset_id}.{progress_table_id}"
+
+    # 処理位置と完了判定はどちらも最新の行を採用（完了後に強制再取得して中断した日付は未完了として扱う）
+    query = f"""
+        SELECT data_date, latest.record_position, latest.is_date_completed
+        FROM (
+            SELECT
+                data_date,
+                ARRAY_AGG(
+                    STRUCT(record_position, is_date_completed)
+                    ORDER BY updated_at DESC, record_position DESC, is_date_completed DESC LIMIT 1
+                )[OFFSET(0)] AS latest
+            FROM `{table_id}`
+            WHERE data_date IN UNNEST(@dates)
+            GROUP BY data_date
+        )
+    """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ArrayQueryParameter("dates", "DATE", date_list)
+        ]
+    )
+
+    try:
+        results = client.query(query, job_config=job_config).result()
+        return {
+            row.data_date: {
+                "record": row.record_position,
+                "is_date_completed": row.is_date_completed
+            }
+            for row in results
+        }
+    except Exception as e:
+        logger.error(f"Error fetching processing positions: {e}", exc_info=True)
+        return {}
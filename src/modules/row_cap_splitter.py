@@ -0,0 +1,142 @@
+# src/modules/row_cap_splitter.py
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from utils.page_shards import ROOT_SHARD, split_shard, filter_groups
+from utils.request_planner import split_decision
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class RowCapSplitter:
+    """行数の上限（row_cap）に達する日付を、ページのURLプレフィックスで分割して取得するクラス
+
+    Search Analytics API は1日・1検索タイプあたり取得できる行数に上限があり、startRow によるページングでは
+    上限を超えた行が通知なく欠落します。上限に達する日付は page ディメンションのフィルタで互いに重ならない
+    shard に分割し、shard ごとに並行して取得します。上限に達した shard はさらに分割します（再帰）。
+    """
+
+    def __init__(self, gsc_connector, row_cap: int, page_size: int, workers: int = 4, fanout: int = 8,
+                 max_depth: int = 6, probe_ratio: float = 0.5):
+        """
+        Args:
+            gsc_connector (GSCConnector): 取得に使用するコネクタ
+            row_cap (int): 1リクエスト（フィルタの組み合わせ）あたりに取得できる行数の上限
+            page_size (int): 1回の API 呼び出しで取得する行数
+            workers (int): shard を並行して取得するスレッド数
+            fanout (int): 1回の分割で作成する子の最大数
+            max_depth (int): 分割の最大の深さ
+            probe_ratio (float): 推定行数が row_cap × probe_ratio 未満の日付は上限の確認を省略する
+        """
+        self.gsc_connector = gsc_connector
+        self.row_cap = row_cap
+        self.page_size = page_size
+        self.workers = max(1, workers)
+        self.fanout = fanout
+        self.max_depth = max_depth
+        self.probe_ratio = probe_ratio
+
+    def _is_capped(self, date: str, shard) -> bool:
+        """shard の行数が上限に達しているか（上限の位置の1行が存在するか）を返します。"""
+        records, _ = self.gsc_connector.fetch_records(date, self.row_cap - 1, 1, filter_groups(shard))
+        return len(records) > 0
+
+    def needs_split(self, date: str, estimate=None) -> bool:
+        """
+        日付の行数が上限に達しており、分割して取得する必要があるかを返します。
+
+        Args:
+            date (str): データ取得対象の日付（YYYY-MM-DD）
+            estimate: 過去の行数からの推定行数（不明の場合は None）。
+                推定が上限以上の場合は確認せずに分割し、上限から十分に小さい場合は確認を省略します。
+        """
+        decision = split_decision(estimate, self.row_cap, self.probe_ratio)
+        if decision == "probe":
+            return self._is_capped(date, ROOT_SHARD)
+        return decision == "split"
+
+    def _list_pages(self, date: str, shard) -> list:
+        """shard 配下のページのURLを取得します（page ディメンションのみ）。"""
+        pages = []
+        start_record = 0
+        while True:
+            response = self.gsc_connector.query({
+                'startDate': date,
+                'endDate': date,
+                'dimensions': ['page'],
+                'rowLimit': self.page_size,
+                'startRow': start_record,
+                **({'dimensionFilterGroups': filter_groups(shard)} if shard.filters else {}),
+            })
+            rows = response.get('rows', [])
+            pages.extend(row['keys'][0] for row in rows)
+            if len(rows) < self.page_size or len(pages) >= self.row_cap:
+                return pages
+            start_record += len(rows)
+
+    def _split(self, date: str, shard, depth: int) -> list:
+        children = split_shard(shard, self._list_pages(date, shard) if shard.kind == "prefix" else [], self.fanout)
+        logger.info(f"Split {shard.kind} shard '{shard.prefix}' of {date} into {len(children)} shards (depth {depth}).")
+        return children
+
+    def _fetch_shard(self, date: str, shard, depth: int):
+        """
+        shard を取得します。
+
+        Returns:
+            tuple: ("split", (子の shard, 深さ) のリスト) または ("records", RecordBatch のリスト)
+        """
+        batches = []
+        start_record = 0
+        while True:
+            records, next_record = self.gsc_connector.fetch_records(date, start_record, self.page_size,
+                                                                    filter_groups(shard))
+            if start_record == 0 and len(records) == self.page_size and depth < self.max_depth \
+                    and shard.kind in ("prefix", "page") and self._is_capped(date, shard):
+                # 1ページ目が満杯で上限にも達している場合は取得済みの行を破棄して分割
+                children = self._split(date, shard, depth + 1)
+                if children:
+                    return "split", [(child, depth + 1) for child in children]
+            if len(records):
+                batches.append(records)
+            if len(records) < self.page_size:
+                return "records", batches
+            if next_record >= self.row_cap:
+                logger.warning(f"Shard '{shard.prefix}' ({shard.kind}) of {date} reached the row cap "
+                               f"({self.row_cap}) and cannot be split further; remaining rows are truncated.")
+                return "records", batches
+            start_record = next_record
+
+    def fetch(self, date: str):
+        """
+        上限に達した日付を分割し、shard を並行して取得します。
+
+        Args:
+            date (str): データ取得対象の日付（YYYY-MM-DD）
+
+        Yields:
+            RecordBatch: 取得したページ（shard の取得が完了した順）
+        """
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="gsc-shard")
+        pending = set()
+        try:
+            # ページ一覧が取得できない場合は分割せずに取得（上限を超えた行は欠落）
+            shards = [(shard, 1) for shard in self._split(date, ROOT_SHARD, 1)] or [(ROOT_SHARD, self.max_depth)]
+            pending = {executor.submit(self._fetch_shard, date, shard, depth) for shard, depth in shards}
+            shard_count = len(pending)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, payload = future.result()
+                    if kind == "split":
+                        pending |= {executor.submit(self._fetch_shard, date, child, depth) for child, depth in payload}
+                        shard_count += len(payload)
+                    else:
+                        yield from payload
+            logger.info(f"Fetched {date} in {shard_count} shards.")
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
@@ -0,0 +1,205 @@
+# src/modules/star_schema.py
+
+import threading
+import time
+
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+
+from utils.date_utils import get_current_jst_datetime, format_datetime_jst
+from utils.retry import insert_rows_with_retry
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# ファクト行に含めない列（ディメンションIDに置き換える文字列列と、フラットテーブル用の列）
+_FLAT_ONLY_COLUMNS = ("url", "query", "row_fingerprint")
+
+
+class DimensionStore:
+    """URL・クエリのディメンションテーブル（dim_url / dim_query）と整数IDの対応を管理するクラス
+
+    既存のID対応は最初の参照時に1度だけ読み込んでローカルにキャッシュし、
+    未登録の値には最大ID + 1 から連番のIDを割り当てて追記します。
+    IDは一度割り当てると変わりません（同時に実行されるジョブは1つである前提）。
+    追記（flush）は1つずつ実行するため、flush から戻った時点で呼び出し元が割り当てたIDは反映済みです。
+    作成直後のテーブルへのストリーミング挿入は NotFound で失敗することがあるため、
+    このインスタンスがテーブルを作成した場合は FRESH_TABLE_SECONDS の間ロードジョブで追記します。
+    """
+
+    # 作成直後のテーブルにロードジョブで追記する期間（秒）
+    FRESH_TABLE_SECONDS = 300
+
+    def __init__(self, client, table_id: str, value_column: str, id_column: str):
+        """
+        Args:
+            client (bigquery.Client): BigQuery クライアント
+            table_id (str): ディメンションテーブルID（project.dataset.table）
+            value_column (str): 値の列名（例: "url"）
+            id_column (str): IDの列名（例: "url_id"）
+        """
+        self.client = client
+        self.table_id = table_id
+        self.value_column = value_column
+        self.id_column = id_column
+        self._ids = None
+        self._next_id = 1
+        self._pending = []
+        self._created_at = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _load(self) -> None:
+        """ディメンションテーブルを作成（存在しない場合）し、既存のID対応を読み込みます。"""
+        try:
+            self.client.get_table(self.table_id)
+        except NotFound:
+            self.client.query(f"""
+                CREATE TABLE IF NOT EXISTS `{self.table_id}` (
+                    {self.id_column} INT64,
+                    {self.value_column} STRING,
+                    created_at DATETIME
+                )
+                CLUSTER BY {self.id_column}
+            """).result()
+            self._created_at = time.monotonic()
+        rows = self.client.query(
+            f"SELECT {self.id_column} AS id, {self.value_column} AS value FROM `{self.table_id}`"
+        ).result()
+        self._ids = {row.value: row.id for row in rows}
+        self._next_id = max(self._ids.values(), default=0) + 1
+        logger.info(f"Loaded {len(self._ids)} entries from {self.table_id}.")
+
+    def ids_for(self, values) -> list:
+        """
+        値のリストに対応するIDを返します。未登録の値には新しいIDを割り当てます。
+
+        Args:
+            values (list): 値（URL・クエリ）のリスト
+
+        Returns:
+            list: values と同じ順序のIDのリスト
+        """
+        with self._lock:
+            if self._ids is None:
+                self._load()
+            ids = self._ids
+            result = []
+            for value in values:
+                value_id = ids.get(value)
+                if value_id is None:
+                    value_id = ids[value] = self._next_id
+                    self._next_id += 1
+                    self._pending.append((value_id, value))
+                result.append(value_id)
+            return result
+
+    def flush(self) -> None:
+        """
+        新しく割り当てたIDをディメンションテーブルに追記します。
+
+        他のスレッドの flush が呼び出し元のIDを追記中の場合は、その完了を待ってから戻ります。
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+            created_at = format_datetime_jst(get_current_jst_datetime())
+            rows = [{self.id_column: value_id, self.value_column: value, "created_at": created_at}
+                    for value_id, value in pending]
+            try:
+                if self._is_fresh():
+                    self._append_with_load_job(rows)
+                else:
+                    # insertId にIDを使用し、再送時の重複を防ぐ
+                    insert_rows_with_retry(self.client, self.table_id, rows, logger,
+                                           row_ids=[str(value_id) for value_id, _ in pending])
+            except Exception:
+                with self._lock:
+                    self._pending = pending + self._pending
+                raise
+            logger.info(f"Added {len(rows)} entries to {self.table_id}.")
+
+    def _is_fresh(self) -> bool:
+        """このインスタンスが作成したテーブルで、作成から FRESH_TABLE_SECONDS 以内かどうか"""
+        return self._created_at is not None and time.monotonic() - self._created_at < self.FRESH_TABLE_SECONDS
+
+    def _append_with_load_job(self, rows) -> None:
+        """行データをロードジョブで追記します（作成直後のテーブル用）。"""
+        job_config = bigquery.LoadJobConfig(write_disposition=bigquery.WriteDisposition.WRITE_APPEND)
+        self.client.load_table_from_json(rows, self.table_id, job_config=job_config).result()
+
+
+class StarSchemaSink:
+    """行データをディメンションID参照のファクト行に変換して書き込むシンク（output_mode = star / both）
+
+    ファクト行の書き込み（ストリーミング・ロードジョブ・パーティション置換）は fact_sink に委譲します。
+    ファクト行が参照するIDは、ファクト行の書き込み前にディメンションテーブルへ追記されます。
+    """
+
+    def __init__(self, client, fact_sink, url_dimension: DimensionStore, query_dimension: DimensionStore):
+        self.client = client
+        self.fact_sink = fact_sink
+        self.url_dimension = url_dimension
+        self.query_dimension = query_dimension
+        self._table_ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def resumable(self) -> bool:
+        return self.fact_sink.resumable
+
+    @property
+    def stats(self):
+        return self.fact_sink.stats
+
+    def _ensure_fact_table(self) -> None:
+        """ファクトテーブルを作成します（存在しない場合）。"""
+        with self._lock:
+            if self._table_ready:
+                return
+            self.client.query(f"""
+                CREATE TABLE IF NOT EXISTS `{self.fact_sink.table_id}` (
+                    data_date DATE,
+                    url_id INT64,
+                    query_id INT64,
+                    impressions INT64,
+                    clicks INT64,
+                    avg_position FLOAT64,
+                    insert_time_japan DATETIME,
+                    position_sum FLOAT64,
+                    position_count INT64,
+                    weighted_position_sum FLOAT64
+                )
+                PARTITION BY data_date
+                CLUSTER BY url_id, query_id
+            """).result()
+            self._table_ready = True
+
+    def to_fact_rows(self, rows) -> list:
+        """行データの url / query をディメンションIDに置き換えます。"""
+        url_ids = self.url_dimension.ids_for([row["url"] for row in rows])
+        query_ids = self.query_dimension.ids_for([row["query"] for row in rows])
+        self.url_dimension.flush()
+        self.query_dimension.flush()
+
+        fact_rows = []
+        for row, url_id, query_id in zip(rows, url_ids, query_ids):
+            fact_row = {"data_date": row["data_date"], "url_id": url_id, "query_id": query_id}
+            fact_row.update((name, value) for name, value in row.items()
+                            if name not in _FLAT_ONLY_COLUMNS and name != "data_date")
+            fact_rows.append(fact_row)
+        return fact_rows
+
+    def write(self, rows, date: str, page_key=None) -> bool:
+        self._ensure_fact_table()
+        return self.fact_sink.write(self.to_fact_rows(rows), date, page_key)
+
+    def flush(self, date: str) -> bool:
+        # 行データのない日付でもパーティションを置き換えられるよう、ファクトテーブルを作成しておく
+        self._ensure_fact_table()
+        return self.fact_sink.flush(date)
+
+    def discard(self, date: str) -> None:
+        self.fact_sink.discard(date)
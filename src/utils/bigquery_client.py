@@ -0,0 +1,91 @@
+# src/utils/bigquery_client.py
+
+import logging
+import threading
+from typing import Optional, Sequence
+
+import requests
+from google.auth import default
+from google.auth.transport.requests import AuthorizedSession
+from google.cloud import bigquery
+from google.oauth2 import service_account
+
+logger = logging.getLogger(__name__)
+
+# プロセス全体で共有する認証情報とクライアント
+_lock = threading.Lock()
+_credentials = {}
+_clients = {}
+
+DEFAULT_POOL_SIZE = 10
+
+# BigQuery クライアントの認証情報のスコープ（bigquery.Client の既定と同じ）
+BIGQUERY_SCOPES = ("https://www.googleapis.com/auth/cloud-platform",)
+
+
+def get_credentials(config, scopes: Optional[Sequence[str]] = None):
+    """
+    Google API 用の認証情報を取得します（スコープごとに1度だけ生成してキャッシュ）。
+
+    Args:
+        config: Config クラスのインスタンス
+        scopes (Sequence[str], optional): 要求するスコープ
+
+    Returns:
+        google.auth.credentials.Credentials: 認証情報
+    """
+    credentials_path = config.credentials_path
+    key = (credentials_path, tuple(scopes or ()))
+    with _lock:
+        credentials = _credentials.get(key)
+        if credentials is None:
+            if credentials_path:
+                # ファイルから読み込む（Secret Managerから取得した一時ファイルまたはローカルファイル）
+                credentials = service_account.Credentials.from_service_account_file(
+                    str(credentials_path), scopes=scopes
+                )
+                logger.info(f"Using service account file: {credentials_path}")
+            else:
+                # Cloud Run環境など、ファイルパスが指定されていない場合はデフォルトの認証情報を使用
+                credentials, _ = default(scopes=scopes)
+                logger.info("Using default Google credentials (e.g., Cloud Run service account)")
+            _credentials[key] = credentials
+        return credentials
+
+
+def get_bigquery_client(config, project: Optional[str] = None) -> bigquery.Client:
+    """
+    プロセス全体で共有する BigQuery クライアントを返します（初回呼び出し時に生成）。
+
+    HTTP セッションのコネクションプールは [BIGQUERY] connection_pool_size で設定でき、
+    並列ワーカーからの呼び出しでも keep-alive 接続が再利用されます。
+
+    Args:
+        config: Config クラスのインスタンス
+        project (str, optional): プロジェクトID（省略時は [BIGQUERY] PROJECT_ID）
+
+    Returns:
+        bigquery.Client: 共有クライアント
+    """
+    project = project or config.get_config_value('BIGQUERY', 'PROJECT_ID')
+    key = (config.credentials_path, project)
+    with _lock:
+        client = _clients.get(key)
+    if client is not None:
+        return client
+
+    # _http を渡すと bigquery.Client はスコープを補完しないため、サービスアカウントの鍵ファイルでも
+    # トークンを取得できるよう、スコープを指定した認証情報で AuthorizedSession を生成する
+    credentials = get_credentials(config, scopes=BIGQUERY_SCOPES)
+    pool_size = int(config.get_config_value('BIGQUERY', 'CONNECTION_POOL_SIZE', str(DEFAULT_POOL_SIZE)))
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            session = AuthorizedSession(credentials)
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            client = bigquery.Client(credentials=credentials, project=project, _http=session)
+            _clients[key] = client
+            logger.info(f"BigQuery client initialized (project={project}, pool_size={pool_size})")
+        return client
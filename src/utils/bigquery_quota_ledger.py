@@ -0,0 +1,135 @@
+# src/utils/bigquery_quota_ledger.py
+
+import logging
+import random
+import time
+
+from google.api_core.exceptions import BadRequest
+from google.cloud import bigquery
+
+from .bigquery_client import get_bigquery_client
+from .date_utils import get_current_jst_datetime, format_datetime_jst
+
+logger = logging.getLogger(__name__)
+
+
+class BigQueryQuotaLedger:
+    """日ごとのクォータ消費量をBigQueryテーブルに記録する台帳
+
+    Cloud Run のようにローカルディスクが実行ごとに破棄される環境向けです。
+    予約・返却はマルチステートメントのトランザクション内で消費量の確認と更新を行い、
+    日付・サイトごとに1行へまとめて書き戻します（旧形式の追記行は合計値で引き継ぐ）。
+    同じ日の行を同時に更新するトランザクションは BigQuery 側で競合として中断されるため、
+    中断された場合は待機してから再試行します。
+    """
+
+    # 競合で中断されたトランザクションの最大再試行回数と待機秒数の基準値
+    MAX_RETRIES = 5
+    RETRY_BASE_SECONDS = 1.0
+
+    def __init__(self, config):
+        self.config = config
+        project_id = config.get_config_value('BIGQUERY', 'PROJECT_ID')
+        dataset_id = config.get_config_value('BIGQUERY', 'DATASET_ID')
+        ledger_table_id = config.get_config_value('GSC_QUOTA', 'LEDGER_TABLE_ID', 'T_gsc_quota_ledger')
+        self.table_id = f"{project_id}.{dataset_id}.{ledger_table_id}"
+        self.site_url = config.gsc_settings['url']
+        self.client = get_bigquery_client(config)
+
+        self.client.query(f"""
+            CREATE TABLE IF NOT EXISTS `{self.table_id}` (
+                usage_date DATE,
+                site_url STRING,
+                calls INT64,
+                updated_at DATETIME
+            )
+        """).result()
+
+    def _parameters(self, day_key: str, **extra) -> list:
+        parameters = [
+            bigquery.ScalarQueryParameter("usage_date", "DATE", day_key),
+            bigquery.ScalarQueryParameter("site_url", "STRING", self.site_url),
+            bigquery.ScalarQueryParameter("updated_at", "DATETIME",
+                                          format_datetime_jst(get_current_jst_datetime())),
+        ]
+        parameters.extend(bigquery.ScalarQueryParameter(name, "INT64", value) for name, value in extra.items())
+        return parameters
+
+    def used(self, day_key: str) -> int:
+        """指定日の消費済み回数を返します。"""
+        query = f"""
+            SELECT IFNULL(SUM(calls), 0) AS used
+            FROM `{self.table_id}`
+            WHERE usage_date = @usage_date AND site_url = @site_url
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("usage_date", "DATE", day_key),
+                bigquery.ScalarQueryParameter("site_url", "STRING", self.site_url),
+            ]
+        )
+        rows = list(self.client.query(query, job_config=job_config).result())
+        return int(rows[0].used) if rows else 0
+
+    def _update(self, new_calls_expr: str, result_expr: str, day_key: str, **parameters) -> int:
+        """
+        トランザクション内で指定日の消費量 used を読み込み、new_calls_expr の値で1行に書き戻します。
+
+        Args:
+            new_calls_expr: 更新後の消費量を表す式（used と @パラメータを参照可能）
+            result_expr: 戻り値とする式（used と new_calls を参照可能）
+            day_key: 日付キー（YYYY-MM-DD）
+            **parameters: INT64 のクエリパラメータ
+
+        Returns:
+            int: result_expr の値
+        """
+        script = f"""
+            DECLARE used INT64;
+            DECLARE new_calls INT64;
+            BEGIN TRANSACTION;
+            SET used = (
+                SELECT IFNULL(SUM(calls), 0) FROM `{self.table_id}`
+                WHERE usage_date = @usage_date AND site_url = @site_url
+            );
+            SET new_calls = {new_calls_expr};
+            IF new_calls != used THEN
+                DELETE FROM `{self.table_id}` WHERE usage_date = @usage_date AND site_url = @site_url;
+                INSERT INTO `{self.table_id}` (usage_date, site_url, calls, updated_at)
+                VALUES (@usage_date, @site_url, new_calls, @updated_at);
+            END IF;
+            COMMIT TRANSACTION;
+            SELECT {result_expr} AS result;
+        """
+        job_config = bigquery.QueryJobConfig(query_parameters=self._parameters(day_key, **parameters))
+        for attempt in range(self.MAX_RETRIES + 1):
+            try:
+                rows = list(self.client.query(script, job_config=job_config).result())
+                return int(rows[0].result) if rows else 0
+            except BadRequest as e:
+                if attempt >= self.MAX_RETRIES or not self._is_concurrent_update(e):
+                    raise
+                wait = self.RETRY_BASE_SECONDS * (2 ** attempt) * (1 + random.random())
+                logger.info(f"Quota ledger transaction aborted by a concurrent update, retrying in {wait:.1f}s")
+                time.sleep(wait)
+
+    @staticmethod
+    def _is_concurrent_update(error: Exception) -> bool:
+        """同じ行を更新する別トランザクションとの競合で中断されたかどうかを判定します。"""
+        message = str(error).lower()
+        return "concurrent update" in message or "could not serialize access" in message
+
+    def reserve(self, day_key: str, requested: int, limit: int) -> int:
+        """指定日のクォータを最大 requested 回分予約し、実際に予約できた回数を返します。"""
+        return self._update(
+            "used + GREATEST(0, LEAST(@requested, @limit - used))",
+            "new_calls - used",
+            day_key, requested=requested, limit=limit,
+        )
+
+    def release(self, day_key: str, amount: int) -> None:
+        """予約したものの使用しなかった回数を返却します。"""
+        try:
+            self._update("GREATEST(0, used - @amount)", "used - new_calls", day_key, amount=amount)
+        except Exception as e:
+            logger.warning(f"Failed to release {amount} reserved GSC API calls for {day_key}: {e}")
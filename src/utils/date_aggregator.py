@@ -0,0 +1,159 @@
+# src/utils/date_aggregator.py
+
+import json
+import logging
+import shutil
+import sys
+import tempfile
+import zlib
+from pathlib import Path
+
+from .url_utils import normalize_url, make_aggregated_record
+
+logger = logging.getLogger(__name__)
+
+# 1キーあたりの概算オーバーヘッド（キーのタプル・集計値のリスト・辞書のスロット）
+_ENTRY_OVERHEAD = 250
+
+
+class DateAggregator:
+    """1日分のページを跨いで (query, 正規化URL) ごとに集計するクラス
+
+    ページごとのレコードを add で逐次マージし、finish で1キーにつき1行を出力します。
+    集計結果は aggregate_records にすべてのレコードをまとめて渡した場合と同じです
+    （avg_position は元レコードの position の単純平均）。
+    メモリ上の集計の概算サイズが memory_limit_bytes を超えると、キーのハッシュで分割した
+    パーティションファイルへ書き出し（スピル）、finish 時にパーティション単位で再集計します。
+    """
+
+    def __init__(self, memory_limit_bytes: int = 256 * 1024 ** 2, spill_dir=None, partitions: int = 16,
+                 include_state: bool = False):
+        """
+        Args:
+            memory_limit_bytes: メモリ上に保持する集計の概算上限（バイト）
+            spill_dir: スピルファイルの作成先（None の場合はシステムの一時ディレクトリ）
+            partitions: スピル時のパーティション数
+            include_state: マージ可能な集計状態（position_sum 等）を出力に含めるか
+        """
+        self.memory_limit_bytes = memory_limit_bytes
+        self.spill_dir = spill_dir
+        self.partitions = max(1, partitions)
+        self.include_state = include_state
+        self.spills = 0
+        self._entries = {}
+        self._bytes = 0
+        self._run_dir = None
+
+    def add(self, records) -> None:
+        """
+        GSCから取得したレコードを集計にマージします。
+
+        Args:
+            records (list or RecordBatch): GSCから取得したレコードのリスト（keys = [query, page]）、または RecordBatch
+        """
+        entries = self._entries
+        for query, url, clicks, impressions, position in self._iter_values(records):
+            key = (query, url)
+            entry = entries.get(key)
+            if entry is None:
+                entry = entries[key] = [0, 0, 0.0, 0, 0.0]
+                self._bytes += sys.getsizeof(query) + sys.getsizeof(url) + _ENTRY_OVERHEAD
+            entry[0] += clicks
+            entry[1] += impressions
+            entry[2] += position
+            entry[3] += 1
+            entry[4] += position * impressions
+
+        if self._bytes > self.memory_limit_bytes:
+            self._spill()
+
+    @staticmethod
+    def _iter_values(records):
+        """(query, 正規化URL, clicks, impressions, position) を順に返します。"""
+        if hasattr(records, "normalized_url_ids"):
+            # RecordBatch は文字列辞書が保持する共通の str オブジェクトをキーに使用
+            mapping = records.normalized_url_ids()
+            queries = records.queries
+            urls = records.urls
+            for query_id, url_id, clicks, impressions, position in zip(
+                records.query_ids, records.url_ids, records.clicks, records.impressions, records.positions
+            ):
+                yield queries[query_id], urls[mapping[url_id]], clicks, impressions, position
+            return
+        for record in records:
+            yield (record['keys'][0], normalize_url(record['keys'][1]), record.get('clicks', 0),
+                   record.get('impressions', 0), record.get('position', 0.0))
+
+    def _partition_path(self, index: int) -> Path:
+        return self._run_dir / f"part-{index:03d}.jsonl"
+
+    def _spill(self) -> None:
+        """メモリ上の集計をパーティションファイルに追記し、メモリを解放します。"""
+        if self._run_dir is None:
+            if self.spill_dir is not None:
+                Path(self.spill_dir).mkdir(parents=True, exist_ok=True)
+            self._run_dir = Path(tempfile.mkdtemp(prefix="gsc_agg_", dir=self.spill_dir))
+
+        handles = {}
+        try:
+            for (query, url), entry in self._entries.items():
+                index = zlib.crc32(f"{query}\x1f{url}".encode("utf-8")) % self.partitions
+                handle = handles.get(index)
+                if handle is None:
+                    handle = handles[index] = open(self._partition_path(index), "a", encoding="utf-8")
+                handle.write(json.dumps([query, url, *entry], ensure_ascii=False))
+                handle.write("\n")
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+        self.spills += 1
+        logger.info(f"Spilled {len(self._entries)} aggregated keys ({self._bytes} bytes) to {self._run_dir}.")
+        self._entries = {}
+        self._bytes = 0
+
+    def finish(self):
+        """
+        集計結果を出力します。スピルが発生した場合はパーティションごとに出力します。
+
+        Yields:
+            list: 集計後のレコードリスト（aggregate_records と同じ形式）
+        """
+        if self._run_dir is None:
+            entries, self._entries, self._bytes = self._entries, {}, 0
+            yield self._to_records(entries)
+            return
+
+        if self._entries:
+            self._spill()
+        for index in range(self.partitions):
+            path = self._partition_path(index)
+            if not path.exists():
+                continue
+            entries = {}
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    query, url, *values = json.loads(line)
+                    entry = entries.get((query, url))
+                    if entry is None:
+                        entries[(query, url)] = values
+                    else:
+                        for i, value in enumerate(values):
+                            entry[i] += value
+            path.unlink()
+            yield self._to_records(entries)
+        self.close()
+
+    def _to_records(self, entries) -> list:
+        return [
+            make_aggregated_record(query, url, *entry, self.include_state)
+            for (query, url), entry in entries.items()
+        ]
+
+    def close(self) -> None:
+        """集計を破棄し、スピルファイルを削除します。"""
+        self._entries = {}
+        self._bytes = 0
+        if self._run_dir is not None:
+            shutil.rmtree(self._run_dir, ignore_errors=True)
+            self._run_dir = None
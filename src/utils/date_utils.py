@@ -12,6 +12,16 @@ def get_current_jst_datetime():
     jst = pytz.timezone('Asia/Tokyo')
     return datetime.now(jst).replace(microsecond=0)
 
+def get_current_pacific_datetime():
+    """
+    現在の米国太平洋時間を取得します（GSC API の1日あたりのクォータは太平洋時間の0時にリセットされます）。
+
+    Returns:
+        datetime: 現在の太平洋時間（夏時間を考慮）のdatetimeオブジェクト。
+    """
+    pacific = pytz.timezone('America/Los_Angeles')
+    return datetime.now(pacific).replace(microsecond=0)
+
 def format_datetime_jst(jst_datetime, fmt="%Y-%m-%d %H:%M:%S"):
     """
     JSTのdatetimeオブジェクトを指定されたフォーマットで文字列に変換します。
@@ -0,0 +1,75 @@
+# src/utils/discovery.py
+
+import copy
+import json
+import logging
+import threading
+from pathlib import Path
+
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+logger = logging.getLogger(__name__)
+
+# リポジトリに同梱したディスカバリドキュメント（<サービス名>.<バージョン>.json、更新は scripts/update_discovery_documents.py）
+DISCOVERY_DIR = Path(__file__).resolve().parent.parent.parent / "config" / "discovery"
+
+# プロセス内で解析済みのディスカバリドキュメント（(サービス名, バージョン) → dict）
+_documents = {}
+_lock = threading.Lock()
+
+
+def load_discovery_document(service_name: str, version: str) -> dict:
+    """
+    ディスカバリドキュメントを読み込みます（プロセスごとに1回だけ解析し、以降はキャッシュを返します）。
+
+    同梱のドキュメント（config/discovery）を優先し、存在しない場合は google-api-python-client に
+    同梱されたドキュメントを使用します。いずれもネットワークにはアクセスしません。
+
+    Args:
+        service_name (str): サービス名（例: "searchconsole"）
+        version (str): API のバージョン（例: "v1"）
+
+    Returns:
+        dict: 解析済みのディスカバリドキュメント（プロセス内で共有するため、変更しないこと）
+
+    Raises:
+        FileNotFoundError: ドキュメントが見つからない場合
+    """
+    key = (service_name, version)
+    with _lock:
+        document = _documents.get(key)
+        if document is None:
+            path = DISCOVERY_DIR / f"{service_name}.{version}.json"
+            if path.exists():
+                content = path.read_text(encoding="utf-8")
+                source = str(path)
+            else:
+                content = get_static_doc(service_name, version)
+                source = "google-api-python-client"
+            if content is None:
+                raise FileNotFoundError(f"Discovery document not found: {service_name}.{version}")
+            document = json.loads(content)
+            _documents[key] = document
+            logger.info(f"Loaded discovery document {service_name}.{version} "
+                        f"(revision {document.get('revision')}) from {source}")
+        return document
+
+
+def build_service(service_name: str, version: str, credentials=None):
+    """
+    キャッシュしたディスカバリドキュメントから API クライアントを構築します（googleapiclient の build の代替）。
+
+    クライアントはリソース（searchanalytics() 等）の初回参照時にドキュメントの dict を補正しながら参照するため、
+    クライアントごとにドキュメントの複製を渡し、共有のキャッシュを変更させないようにします。
+
+    Args:
+        service_name (str): サービス名
+        version (str): API のバージョン
+        credentials: 認証情報
+
+    Returns:
+        googleapiclient.discovery.Resource: API クライアント
+    """
+    document = copy.deepcopy(load_discovery_document(service_name, version))
+    return build_from_document(document, credentials=credentials)
@@ -8,6 +8,9 @@ from typing import Optional, Any
 import configparser
 import logging
 
+from .gsc_settings import load_gsc_settings
+from .property_config import load_properties
+
 # Secret Managerのインポート（オプション）
 try:
     from .secret_manager import SecretManagerUtils
@@ -224,20 +227,7 @@ class Config:
     def _load_gsc_settings(self):
         """GSC関連の設定を初期化時に1度だけ読み込む"""
         try:
-            settings = {
-                'url': self.config['GSC']['SITE_URL'],
-                'start_date': self.config['GSC'].get('START_DATE', '2024-11-01'),
-                'batch_size': int(self.config['GSC']['BATCH_SIZE']),
-                'metrics': self.config['GSC']['METRICS'].split(','),
-                'dimensions': self.config['GSC']['DIMENSIONS'].split(','),
-                'retry_count': int(self.config['GSC']['RETRY_COUNT']),
-                'retry_delay': int(self.config['GSC']['RETRY_DELAY']),
-                'daily_api_limit': int(self.config['GSC']['DAILY_API_LIMIT']),
-                'initial_run': self.config['GSC_INITIAL'].getboolean('INITIAL_RUN', fallback=True),
-                'initial_fetch_days': int(self.config['GSC_DAILY']['INITIAL_FETCH_DAYS']),
-                'daily_fetch_days': int(self.config['GSC_DAILY']['DAILY_FETCH_DAYS']),
-                'project_id': self.config['BIGQUERY']['PROJECT_ID'],
-            }
+            settings = load_gsc_settings(self.config, self.base_path)
             self.logger.info(f"GSC settings loaded: {settings}")  # 初回のみログ出力
             return settings
         except KeyError as e:
@@ -252,6 +242,18 @@ class Config:
         """初期化済みの GSC 設定を返す"""
         return self._gsc_settings
 
+    def gsc_properties(self):
+        """
+        [GSC] properties に列挙されたプロパティごとの設定を返します。
+
+        各プロパティの設定は [GSC_PROPERTY_<名前>] セクションに記述します（site_url と table_id は必須）。
+        properties が空の場合は空のリストを返します（[GSC] site_url の1プロパティのみを取得）。
+
+        Returns:
+            list: PropertyConfig のリスト
+        """
+        return load_properties(self, self.config)
+
     def _load_config(self):
         """設定ファイルの読み込み（Secret Manager優先、ファイルはフォールバック）"""
         config = configparser.ConfigParser()
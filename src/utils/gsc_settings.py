@@ -0,0 +1,65 @@
+# src/utils/gsc_settings.py
+
+import configparser
+from datetime import datetime
+
+
+def load_gsc_settings(parser, base_path, overrides=None) -> dict:
+    """
+    settings.ini の [GSC] セクション（と関連するセクション）から GSC 設定を生成します。
+
+    Args:
+        parser (configparser.ConfigParser): settings.ini を読み込んだパーサ
+        base_path (Path): プロジェクトのルートディレクトリ（aggregate_spill_dir の基準）
+        overrides (Mapping, optional): [GSC] の同名のキーを上書きする値（[GSC_PROPERTY_<名前>] セクション）
+
+    Returns:
+        dict: GSC 設定
+
+    Raises:
+        KeyError: 必須のキーがない場合
+        ValueError: 値の形式が正しくない場合
+    """
+    gsc = parser['GSC']
+    if overrides:
+        # 上書き後の値も [GSC] と同じ型変換を通すため、マージしたセクションを作り直す（値は展開済み）
+        merged = configparser.ConfigParser(interpolation=None)
+        merged.read_dict({'GSC': {**dict(parser['GSC']), **dict(overrides)}})
+        gsc = merged['GSC']
+
+    return {
+        'url': gsc['SITE_URL'],
+        'start_date': gsc.get('START_DATE', '2024-11-01'),
+        'batch_size': int(gsc['BATCH_SIZE']),
+        'metrics': gsc['METRICS'].split(','),
+        'dimensions': gsc['DIMENSIONS'].split(','),
+        'retry_count': int(gsc['RETRY_COUNT']),
+        'retry_delay': int(gsc['RETRY_DELAY']),
+        'daily_api_limit': int(gsc['DAILY_API_LIMIT']),
+        'max_workers': max(1, int(gsc.get('MAX_WORKERS', '1'))),
+        'pipeline_mode': gsc.getboolean('PIPELINE_MODE', fallback=False),
+        'pipeline_queue_size': int(gsc.get('PIPELINE_QUEUE_SIZE', '4')),
+        'force_restart': gsc.getboolean('FORCE_RESTART', fallback=False),
+        'aggregate_scope': gsc.get('AGGREGATE_SCOPE', 'page').lower(),
+        'aggregate_memory_mb': int(gsc.get('AGGREGATE_MEMORY_MB', '256')),
+        'aggregate_spill_dir': base_path / gsc.get('AGGREGATE_SPILL_DIR', 'data/aggregate_spill'),
+        'aggregate_processes': int(gsc.get('AGGREGATE_PROCESSES', '0')),
+        'aggregate_parallel_min_records': int(gsc.get('AGGREGATE_PARALLEL_MIN_RECORDS', '20000')),
+        'range_requests': gsc.getboolean('RANGE_REQUESTS', fallback=False),
+        'range_max_days': max(1, int(gsc.get('RANGE_MAX_DAYS', '7'))),
+        'volume_history_weeks': max(0, int(gsc.get('VOLUME_HISTORY_WEEKS', '8'))),
+        'page_lookahead': gsc.getboolean('PAGE_LOOKAHEAD', fallback=False),
+        'split_row_cap': int(gsc.get('SPLIT_ROW_CAP', '0')),
+        'split_workers': max(1, int(gsc.get('SPLIT_WORKERS', '4'))),
+        'split_fanout': max(2, int(gsc.get('SPLIT_FANOUT', '8'))),
+        'split_max_depth': int(gsc.get('SPLIT_MAX_DEPTH', '6')),
+        'split_probe_ratio': float(gsc.get('SPLIT_PROBE_RATIO', '0.5')),
+        'restart_dates': [
+            datetime.strptime(value.strip(), '%Y-%m-%d').date()
+            for value in gsc.get('RESTART_DATES', '').split(',') if value.strip()
+        ],
+        'initial_run': parser['GSC_INITIAL'].getboolean('INITIAL_RUN', fallback=True),
+        'initial_fetch_days': int(parser['GSC_DAILY']['INITIAL_FETCH_DAYS']),
+        'daily_fetch_days': int(parser['GSC_DAILY']['DAILY_FETCH_DAYS']),
+        'project_id': parser['BIGQUERY']['PROJECT_ID'],
+    }
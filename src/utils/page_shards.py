@@ -0,0 +1,138 @@
+# src/utils/page_shards.py
+
+import re
+from collections import Counter, namedtuple
+
+# デバイスで分割する場合の値（Search Analytics API の device ディメンション）
+DEVICES = ("DESKTOP", "MOBILE", "TABLET")
+
+# 1つの正規表現フィルタの最大長（API の上限 4096 文字に余裕を持たせる）
+MAX_REGEX_LENGTH = 4000
+
+# 分割単位（shard）
+#   filters: 適用するフィルタ（dimensionFilterGroups の1グループ内で AND 結合）
+#   prefix: 子の分割に使用するURLのプレフィックス（ルートは ""）
+#   kind: "prefix"（プレフィックス配下）/ "page"（単一URL）/ "device"（単一URL × デバイス）/ "rest"（残り）
+Shard = namedtuple("Shard", "filters prefix kind")
+
+ROOT_SHARD = Shard((), "", "prefix")
+
+
+def child_key(url: str, prefix: str) -> str:
+    """
+    prefix 配下のURLについて、パスを1階層進めた子のプレフィックスを返します。
+
+    ルート（prefix = ""）の場合はホスト直下の1階層目（例: https://example.com/info/）を返します。
+    それ以上階層がない場合はURLそのものを返します。
+
+    Args:
+        url (str): ページのURL
+        prefix (str): 親のプレフィックス
+
+    Returns:
+        str: 子のプレフィックス（末尾 "/"）またはURL
+    """
+    if prefix:
+        start = len(prefix)
+    else:
+        host_end = url.find("/", url.find("//") + 2)
+        if host_end < 0:
+            return url
+        start = host_end + 1
+    end = url.find("/", start)
+    return url if end < 0 else url[:end + 1]
+
+
+def _pattern(key: str, exact: bool) -> str:
+    return re.escape(key) + ("$" if exact else "")
+
+
+def _regex(children) -> str:
+    return "^(?:" + "|".join(_pattern(key, exact) for key, exact, _ in children) + ")"
+
+
+def _pack(children, fanout: int):
+    """子を重み（ページ数）が均等になるよう最大 fanout 個のグループに分け、正規表現の長さの上限で分割します。"""
+    groups = [[] for _ in range(min(fanout, len(children)))]
+    weights = [0] * len(groups)
+    for child in sorted(children, key=lambda child: (-child[2], child[0])):
+        index = weights.index(min(weights))
+        groups[index].append(child)
+        weights[index] += child[2]
+
+    packed = []
+    for group in groups:
+        current = []
+        for child in sorted(group):
+            if current and len(_regex(current + [child])) > MAX_REGEX_LENGTH:
+                packed.append(current)
+                current = []
+            current.append(child)
+        packed.append(current)
+    return packed
+
+
+def split_shard(shard: Shard, pages, fanout: int = 8) -> list:
+    """
+    行数の上限に達した shard を、配下のページのURLプレフィックスで互いに重ならない子に分割します。
+
+    子は page ディメンションの正規表現フィルタ（includingRegex）で表し、
+    一覧に含まれないページの行を取りこぼさないよう、すべての子を除外する "rest" の shard を加えます。
+    単一URLの shard はデバイスで分割します（同じ query × page の行がデバイスごとに分かれて返されます）。
+
+    Args:
+        shard (Shard): 分割する shard
+        pages (list): shard 配下のページのURL（page ディメンションのみのリクエストで取得）
+        fanout (int): 1回の分割で作成する子の最大数（"rest" を除く）
+
+    Returns:
+        list: 子の shard のリスト（それ以上分割できない場合は空）
+    """
+    if shard.kind == "page":
+        return [
+            Shard(shard.filters + ({"dimension": "device", "operator": "equals", "expression": device},),
+                  shard.prefix, "device")
+            for device in DEVICES
+        ]
+    if shard.kind != "prefix":
+        return []
+
+    counts = Counter()
+    exact = {}
+    for url in pages:
+        key = child_key(url, shard.prefix)
+        counts[key] += 1
+        exact[key] = exact.get(key, True) and key == url
+    if not counts:
+        return []
+    children = [(key, exact[key], counts[key]) for key in counts]
+
+    shards = []
+    for group in _pack(children, max(1, fanout)):
+        if len(group) == 1:
+            key, is_exact, _ = group[0]
+            if is_exact:
+                shards.append(Shard(shard.filters + ({"dimension": "page", "operator": "equals", "expression": key},),
+                                    key, "page"))
+            else:
+                shards.append(Shard(shard.filters + (
+                    {"dimension": "page", "operator": "includingRegex", "expression": _regex(group)},), key, "prefix"))
+        else:
+            shards.append(Shard(shard.filters + (
+                {"dimension": "page", "operator": "includingRegex", "expression": _regex(group)},), shard.prefix, "prefix"))
+
+    excluded = tuple(
+        {"dimension": "page", "operator": "excludingRegex", "expression": child.filters[-1]["expression"]}
+        if child.filters[-1]["operator"] == "includingRegex" else
+        {"dimension": "page", "operator": "notEquals", "expression": child.filters[-1]["expression"]}
+        for child in shards
+    )
+    shards.append(Shard(shard.filters + excluded, shard.prefix, "rest"))
+    return shards
+
+
+def filter_groups(shard: Shard):
+    """shard のフィルタを Search Analytics API の dimensionFilterGroups に変換します（フィルタなしの場合は None）。"""
+    if not shard.filters:
+        return None
+    return [{"groupType": "and", "filters": [dict(f) for f in shard.filters]}]
@@ -0,0 +1,166 @@
+# src/utils/parallel_aggregate.py
+
+import logging
+import multiprocessing
+import threading
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+# シャード分割には numpy を使用（利用できない環境では常に単一プロセスで集計）
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def _aggregate_shard(query_ids: bytes, url_ids: bytes, clicks: bytes, impressions: bytes,
+                     positions: bytes, row_indexes: bytes):
+    """
+    1シャード分の列データを (query_id, 正規化URL ID) ごとに集計します（ワーカープロセスで実行）。
+
+    入出力はいずれも型付き配列のバイト列で、行ごとのオブジェクトはプロセス間で受け渡しません。
+
+    Returns:
+        tuple: (query_id, url_id, clicks, impressions, position_sum, position_count,
+                weighted_position_sum, 初出の行番号) の各列のバイト列
+    """
+    columns = []
+    for typecode, data in (("I", query_ids), ("I", url_ids), ("q", clicks), ("q", impressions),
+                           ("d", positions), ("q", row_indexes)):
+        column = array(typecode)
+        column.frombytes(data)
+        columns.append(column)
+
+    entries = {}
+    for query_id, url_id, click, impression, position, row_index in zip(*columns):
+        key = (query_id, url_id)
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = [0, 0, 0.0, 0, 0.0, row_index]
+        entry[0] += click
+        entry[1] += impression
+        entry[2] += position
+        entry[3] += 1
+        entry[4] += position * impression
+
+    result = [array("I"), array("I"), array("q"), array("q"), array("d"), array("q"), array("d"), array("q")]
+    for (query_id, url_id), entry in entries.items():
+        result[0].append(query_id)
+        result[1].append(url_id)
+        for column, value in zip(result[2:], entry):
+            column.append(value)
+    return tuple(column.tobytes() for column in result)
+
+
+class ParallelAggregator:
+    """(query, 正規化URL) のハッシュで行をシャードに分割し、プロセスプールで並列に集計するクラス
+
+    シャードは列ごとの型付き配列（バイト列）としてワーカーへ渡し、
+    結果は各キーの初出の行順に並べ直すため、単一プロセスでの集計と同じ順序・同じ値になります。
+    プロセスプールはパイプライン・BigQuery クライアントのスレッドが動作中のプロセスから生成されるため、
+    fork ではなく forkserver（利用できない環境では spawn）でワーカーを起動します
+    （fork では他スレッドが保持中のロックがワーカー側で解放されずに残ることがあるため）。
+    """
+
+    def __init__(self, processes: int, min_records: int = 20000):
+        """
+        Args:
+            processes: ワーカープロセス数（シャード数）
+            min_records: 並列集計を行う最小レコード数（これ未満は単一プロセスで集計）
+        """
+        self.processes = processes
+        self.min_records = min_records
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def accepts(self, record_count: int) -> bool:
+        """レコード数が並列集計の対象かどうかを返します。"""
+        return NUMPY_AVAILABLE and record_count >= self.min_records
+
+    @staticmethod
+    def _mp_context():
+        """ワーカープロセスの起動方式（forkserver、利用できない環境では spawn）"""
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            return multiprocessing.get_context("forkserver")
+        return multiprocessing.get_context("spawn")
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=self._mp_context())
+                logger.info(f"Started aggregation process pool ({self.processes} processes).")
+            return self._executor
+
+    def aggregate(self, batch, mapping: dict) -> dict:
+        """
+        RecordBatch を並列に集計します。
+
+        Args:
+            batch (RecordBatch): 集計対象のバッチ
+            mapping (dict): url_id → 正規化後のURLのID（RecordBatch.normalized_url_ids の結果）
+
+        Returns:
+            dict: (query_id, 正規化URL ID) → [clicks, impressions, position_sum, position_count,
+                  weighted_position_sum]（初出の行順）
+        """
+        query_ids = np.frombuffer(batch.query_ids, dtype=np.uint32)
+        lookup = np.zeros(max(mapping) + 1, dtype=np.uint32)
+        lookup[list(mapping)] = list(mapping.values())
+        url_ids = lookup[np.frombuffer(batch.url_ids, dtype=np.uint32)]
+
+        # 文字列のハッシュ（ユニークな文字列ごとに1回）からシャード番号を求める
+        shards = (self._string_hashes(batch.queries, query_ids) * np.uint64(1000003)
+                  ^ self._string_hashes(batch.urls, url_ids)) % np.uint64(self.processes)
+        order = np.argsort(shards, kind="stable")
+        bounds = np.searchsorted(shards[order], np.arange(self.processes + 1))
+
+        columns = (query_ids, url_ids, np.frombuffer(batch.clicks, dtype=np.int64),
+                   np.frombuffer(batch.impressions, dtype=np.int64), np.frombuffer(batch.positions, dtype=np.float64))
+        executor = self._get_executor()
+        futures = []
+        for shard in range(self.processes):
+            rows = order[bounds[shard]:bounds[shard + 1]]
+            if len(rows):
+                futures.append(executor.submit(
+                    _aggregate_shard, *(column[rows].tobytes() for column in columns), rows.astype(np.int64).tobytes()
+                ))
+
+        merged = []
+        for future in futures:
+            parts = [np.frombuffer(data, dtype=dtype) for data, dtype in zip(
+                future.result(),
+                (np.uint32, np.uint32, np.int64, np.int64, np.float64, np.int64, np.float64, np.int64),
+            )]
+            merged.append(parts)
+        if not merged:
+            return {}
+
+        # シャードをまとめ、各キーの初出の行順に並べ直す
+        query_col, url_col, clicks, impressions, position_sum, position_count, weighted, first_rows = (
+            np.concatenate(column) for column in zip(*merged)
+        )
+        entries = {}
+        for i in np.argsort(first_rows, kind="stable").tolist():
+            entries[(int(query_col[i]), int(url_col[i]))] = [
+                int(clicks[i]), int(impressions[i]), float(position_sum[i]), int(position_count[i]), float(weighted[i])
+            ]
+        return entries
+
+    @staticmethod
+    def _string_hashes(strings, ids):
+        """ids が参照する文字列の crc32 を、ids と同じ形の配列で返します。"""
+        unique_ids = np.unique(ids)
+        hashes = np.zeros(int(unique_ids[-1]) + 1, dtype=np.uint64)
+        hashes[unique_ids] = [zlib.crc32(strings[string_id].encode("utf-8")) for string_id in unique_ids.tolist()]
+        return hashes[ids]
+
+    def close(self) -> None:
+        """プロセスプールを終了します。"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -0,0 +1,95 @@
+# src/utils/property_config.py
+
+from .gsc_settings import load_gsc_settings
+
+
+def load_properties(base, parser) -> list:
+    """
+    [GSC] properties に列挙されたプロパティごとの設定を生成します。
+
+    Args:
+        base (Config): 共有の Config
+        parser (configparser.ConfigParser): settings.ini を読み込んだパーサ
+
+    Returns:
+        list: PropertyConfig のリスト（properties が空の場合は空のリスト）
+
+    Raises:
+        KeyError: プロパティの [GSC_PROPERTY_<名前>] セクションがない場合
+    """
+    names = [name.strip() for name in parser['GSC'].get('PROPERTIES', '').split(',') if name.strip()]
+    properties = []
+    for name in names:
+        section_name = f"GSC_PROPERTY_{name.upper()}"
+        if not parser.has_section(section_name):
+            raise KeyError(f"Missing section [{section_name}] for GSC property '{name}'")
+        properties.append(PropertyConfig(base, name, parser[section_name]))
+    return properties
+
+class PropertyConfig:
+    """複数プロパティの取得時に、1プロパティ分の設定を提供する Config のプロキシ
+
+    [GSC_PROPERTY_<名前>] セクションに記述した値で [GSC] / [BIGQUERY] / [GSC_QUOTA] の同名のキーを上書きし、
+    それ以外は共有の Config に委譲します。進捗テーブルとクォータ台帳のファイルは、
+    指定がない場合もプロパティごとに分けます（日付の進捗・1日あたりの上限をプロパティ単位で管理するため）。
+    """
+
+    OVERRIDE_SECTIONS = ('GSC', 'BIGQUERY', 'GSC_QUOTA')
+
+    def __init__(self, base, name: str, section):
+        """
+        Args:
+            base (Config): 共有の Config
+            name (str): プロパティ名（ログ・通知・既定のテーブル名に使用）
+            section (configparser.SectionProxy): [GSC_PROPERTY_<名前>] セクション
+        """
+        self._base = base
+        self.name = name
+        self._section = section
+        try:
+            if 'TABLE_ID' not in section:
+                raise KeyError('TABLE_ID')
+            if 'SITE_URL' not in section:
+                raise KeyError('SITE_URL')
+            # セクションにある [GSC] のキー（batch_size・split_row_cap 等）は共有の設定と同じ型変換で上書き
+            self._gsc_settings = load_gsc_settings(base.config, base.base_path, overrides=section)
+        except KeyError as e:
+            base.logger.error(f"Missing key in GSC property '{name}' configuration: {e}")
+            raise
+        except ValueError as e:
+            base.logger.error(f"Invalid value in GSC property '{name}' configuration: {e}")
+            raise
+        self._defaults = {
+            'PROGRESS_TABLE_ID': f"{base.get_config_value('BIGQUERY', 'PROGRESS_TABLE_ID')}_{name}",
+            'LEDGER_PATH': f"data/gsc_quota_ledger_{name}.json",
+        }
+
+    def __getattr__(self, attr):
+        return getattr(self._base, attr)
+
+    @property
+    def gsc_settings(self):
+        """プロパティのセクションの [GSC] のキーで上書きした GSC 設定を返す"""
+        return self._gsc_settings
+
+    @property
+    def progress_table_id(self):
+        """プロパティの進捗トラッキングテーブルのIDを取得"""
+        return (
+            f"{self.get_config_value('BIGQUERY', 'PROJECT_ID')}."
+            f"{self.get_config_value('BIGQUERY', 'DATASET_ID')}."
+            f"{self.get_config_value('BIGQUERY', 'PROGRESS_TABLE_ID')}"
+        )
+
+    def get_config_value(self, section, key, default=None):
+        """プロパティのセクションの値を優先して設定値を取得"""
+        if section.upper() in self.OVERRIDE_SECTIONS:
+            value = self._section.get(key)
+            if value is not None:
+                return value
+            if key.upper() in self._defaults:
+                return self._defaults[key.upper()]
+        return self._base.get_config_value(section, key, default)
+
+    def __str__(self):
+        return f"PropertyConfig(name={self.name}, site_url={self._gsc_settings['url']})"
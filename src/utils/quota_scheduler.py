@@ -0,0 +1,353 @@
+# src/utils/quota_scheduler.py
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from .date_utils import get_current_pacific_datetime
+
+# ファイルロック（Windows では利用できないため、プロセス内ロックのみで動作）
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class QuotaExceededError(Exception):
+    """1日あたりのAPIクォータを使い切った場合に送出される例外"""
+
+
+class TokenBucket:
+    """一定期間あたりの呼び出し回数を制限するトークンバケット"""
+
+    def __init__(self, capacity: int, period_seconds: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            capacity: 期間あたりの最大呼び出し回数（バケット容量）
+            period_seconds: 期間（秒）
+            clock: 現在時刻（秒）を返す関数
+        """
+        self.capacity = capacity
+        self.rate = capacity / period_seconds
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self) -> float:
+        """トークンが1つ利用可能になるまでの待機秒数を返します（0 なら即時利用可能）。"""
+        self._refill()
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def consume(self) -> None:
+        """トークンを1つ消費します。"""
+        self._tokens -= 1
+
+
+class FileQuotaLedger:
+    """日ごとのクォータ消費量をJSONファイルに記録する台帳
+
+    同一ホスト上の複数プロセスからの予約はファイルロックで直列化されます。
+    """
+
+    # 保持する日数（古い日付のエントリは書き込み時に削除）
+    RETENTION_DAYS = 7
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def _read(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read quota ledger {self.path}, starting empty: {e}")
+            return {}
+
+    def _update(self, func):
+        """ロックを取得した状態で台帳を読み込み、func の結果を書き戻します。"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            with open(self.path.with_suffix('.lock'), 'w') as lock_file:
+                if FCNTL_AVAILABLE:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    ledger = self._read()
+                    result = func(ledger)
+                    for day_key in sorted(ledger)[:-self.RETENTION_DAYS]:
+                        del ledger[day_key]
+                    tmp_path = self.path.with_suffix('.tmp')
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        json.dump(ledger, f)
+                    tmp_path.replace(self.path)
+                    return result
+                finally:
+                    if FCNTL_AVAILABLE:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def used(self, day_key: str) -> int:
+        """指定日の消費済み回数を返します。"""
+        return int(self._read().get(day_key, 0))
+
+    def reserve(self, day_key: str, requested: int, limit: int) -> int:
+        """
+        指定日のクォータを最大 requested 回分予約し、実際に予約できた回数を返します。
+
+        Args:
+            day_key: 日付キー（YYYY-MM-DD）
+            requested: 予約したい回数
+            limit: 1日あたりの上限
+
+        Returns:
+            int: 予約できた回数（上限に達している場合は 0）
+        """
+        def _reserve(ledger):
+            used = int(ledger.get(day_key, 0))
+            granted = max(0, min(requested, limit - used))
+            ledger[day_key] = used + granted
+            return granted
+        return self._update(_reserve)
+
+    def release(self, day_key: str, amount: int) -> None:
+        """予約したものの使用しなかった回数を返却します。"""
+        def _release(ledger):
+            ledger[day_key] = max(0, int(ledger.get(day_key, 0)) - amount)
+        self._update(_release)
+
+
+class QuotaScheduler:
+    """秒・分・日単位のクォータを管理し、GSC API呼び出しを調整するスケジューラ
+
+    秒・分単位の上限に達した場合はトークンが補充されるまで待機し、
+    日単位の上限に達した場合は QuotaExceededError を送出します。
+    日単位の消費量は台帳（ledger）に記録されるため、同じ日の複数回の実行で合算されます。
+    日付は GSC API のクォータのリセットに合わせて太平洋時間で区切ります。
+    複数スレッドから共有して使用できます。台帳からの予約（BigQuery の場合はネットワーク越し）はロックの外で行い、
+    予約の残りが reserve_block の半分以下になった時点で次のブロックを先行して予約するため、
+    他のスレッドは予約の完了を待たずに残りの予約分で呼び出しを続けられます。
+    台帳への予約が失敗した場合（BigQuery の一時的なエラーなど）は上限到達とはみなさず、
+    待機時間を延ばしながら LEDGER_RETRIES 回まで予約をやり直します。
+    """
+
+    # 台帳への予約が連続して失敗した場合の再試行回数と待機秒数（指数バックオフ）
+    LEDGER_RETRIES = 5
+    LEDGER_BACKOFF_SECONDS = 1.0
+    LEDGER_BACKOFF_MAX_SECONDS = 30.0
+
+    def __init__(self, per_second: int, per_minute: int, per_day: int, ledger=None,
+                 reserve_block: int = 50, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep,
+                 day_key_func: Optional[Callable[[], str]] = None):
+        """
+        Args:
+            per_second: 1秒あたりの最大呼び出し回数
+            per_minute: 1分あたりの最大呼び出し回数
+            per_day: 1日あたりの最大呼び出し回数
+            ledger: 日単位の消費量を永続化する台帳（None の場合は実行内のみで管理）
+            reserve_block: 台帳から一度に予約する回数
+            clock: 現在時刻（秒）を返す関数
+            sleep: 待機に使用する関数
+            day_key_func: 日付キー（YYYY-MM-DD）を返す関数（デフォルトは太平洋時間の当日）
+        """
+        self.per_day = per_day
+        self.buckets = [
+            TokenBucket(per_second, 1, clock),
+            TokenBucket(per_minute, 60, clock),
+        ]
+        self.ledger = ledger
+        self.reserve_block = max(1, reserve_block)
+        self.consumed = 0
+        self._sleep = sleep
+        self._day_key_func = day_key_func or (lambda: get_current_pacific_datetime().strftime('%Y-%m-%d'))
+        self._day_key = None
+        self._day_used = 0
+        self._reserved = 0
+        self._reserving = False
+        self._exhausted = False
+        self._ledger_failures = 0
+        self._lock = threading.Condition()
+
+    @classmethod
+    def from_config(cls, config):
+        """settings.ini の [GSC] / [GSC_QUOTA] セクションからスケジューラを生成します。
+
+        ledger を指定しない場合、Cloud Run（実行ごとにファイルシステムが破棄される）では bigquery、
+        それ以外では file の台帳を使用します。
+        """
+        ledger = None
+        ledger_type = (config.get_config_value('GSC_QUOTA', 'LEDGER', '') or '').strip().lower()
+        if not ledger_type:
+            ledger_type = 'bigquery' if _is_cloud_run() else 'file'
+        if ledger_type == 'file':
+            if _is_cloud_run():
+                logger.warning("GSC_QUOTA.ledger = file does not persist across Cloud Run executions; "
+                               "daily usage is only shared by runs on the same host. Use ledger = bigquery.")
+            ledger_path = Path(config.get_config_value('GSC_QUOTA', 'LEDGER_PATH', 'data/gsc_quota_ledger.json'))
+            if not ledger_path.is_absolute():
+                ledger_path = config.base_path / ledger_path
+            ledger = FileQuotaLedger(ledger_path)
+        elif ledger_type == 'bigquery':
+            from .bigquery_quota_ledger import BigQueryQuotaLedger
+            ledger = BigQueryQuotaLedger(config)
+
+        return cls(
+            per_second=int(config.get_config_value('GSC_QUOTA', 'PER_SECOND', '10')),
+            per_minute=int(config.get_config_value('GSC_QUOTA', 'PER_MINUTE', '1200')),
+            per_day=config.gsc_settings['daily_api_limit'],
+            ledger=ledger,
+            reserve_block=int(config.get_config_value('GSC_QUOTA', 'RESERVE_BLOCK', '50')),
+        )
+
+    def acquire(self) -> None:
+        """
+        API呼び出し1回分のクォータを取得します。秒・分単位の上限に達している場合は待機します。
+
+        Raises:
+            QuotaExceededError: 1日あたりの上限に達している場合
+            Exception: 台帳への予約が LEDGER_RETRIES 回連続で失敗した場合（最後の例外）
+        """
+        while True:
+            wait = 0.0
+            released = None
+            try:
+                with self._lock:
+                    day_key, released = self._switch_day()
+                    if self._reserved <= 0:
+                        if self._exhausted:
+                            raise QuotaExceededError(f"Daily GSC API quota ({self.per_day}) exhausted for {day_key}.")
+                        if self._reserving:
+                            # 他のスレッドが台帳から予約中
+                            self._lock.wait()
+                            continue
+                        if self.ledger is None:
+                            self._reserved = max(0, min(self.reserve_block, self.per_day - self._day_used))
+                            self._exhausted = self._reserved <= 0
+                            continue
+                        # 予約がないため、このスレッドが台帳から予約するまで待つ
+                        self._reserving = True
+                        prefetch = False
+                    else:
+                        wait = max(bucket.wait_time() for bucket in self.buckets)
+                        if wait <= 0:
+                            for bucket in self.buckets:
+                                bucket.consume()
+                            self._reserved -= 1
+                            self._day_used += 1
+                            self.consumed += 1
+                            if (self.ledger is None or self._reserving or self._exhausted
+                                    or self._reserved > self.reserve_block // 2):
+                                return
+                            # 残りが少ないため、次のブロックを先行して予約してから戻る
+                            self._reserving = True
+                            prefetch = True
+            finally:
+                # 前日の未使用分の返却はロックの外で行う
+                if released:
+                    self._return_to_ledger(*released)
+            if wait > 0:
+                self._sleep(wait)
+                continue
+            error, failures = self._reserve_from_ledger(day_key)
+            if prefetch:
+                # 先行予約の失敗は、残りの予約分を使い切った時点で再度予約する
+                return
+            if error is not None:
+                if failures >= self.LEDGER_RETRIES:
+                    raise error
+                self._sleep(min(self.LEDGER_BACKOFF_MAX_SECONDS, self.LEDGER_BACKOFF_SECONDS * 2 ** (failures - 1)))
+
+    def _switch_day(self):
+        """
+        日付が変わった場合は新しい日に切り替えます（ロック取得済みで呼び出すこと）。
+
+        Returns:
+            tuple: (日付キー, 前日の未使用の予約分 (日付キー, 回数) または None)。
+                未使用分は呼び出し側がロックの外で台帳に返却します。
+        """
+        day_key = self._day_key_func()
+        released = None
+        if day_key != self._day_key:
+            released = self._take_reserved()
+            self._day_key = day_key
+            self._day_used = 0
+            self._exhausted = False
+            self._ledger_failures = 0
+        return day_key, released
+
+    def _reserve_from_ledger(self, day_key: str):
+        """
+        台帳から reserve_block 回分を予約します（ロックの外で呼び出し、完了を待機中のスレッドに通知する）。
+
+        Returns:
+            tuple: (予約で発生した例外または None, 連続して失敗した回数)
+        """
+        granted = 0
+        error = None
+        try:
+            granted = self.ledger.reserve(day_key, self.reserve_block, self.per_day)
+        except Exception as e:
+            error = e
+        with self._lock:
+            self._reserving = False
+            stale = day_key != self._day_key
+            if error is not None:
+                # 台帳のエラーは上限到達とはみなさず、待機後に再度予約する
+                self._ledger_failures += 1
+            elif not stale:
+                self._ledger_failures = 0
+                if granted > 0:
+                    self._reserved += granted
+                else:
+                    self._exhausted = True
+            failures = self._ledger_failures
+            self._lock.notify_all()
+        if error is not None:
+            logger.warning(f"Failed to reserve GSC API quota from the ledger (attempt {failures}): {error}")
+        if stale and granted > 0:
+            # 予約中に日付が変わった場合は前日分として返却
+            self._return_to_ledger(day_key, granted)
+        return error, failures
+
+    def _take_reserved(self):
+        """未使用の予約分を取り出します（ロック取得済みで呼び出すこと）。台帳に返却する (日付キー, 回数) を返します。"""
+        released = None
+        if self.ledger is not None and self._reserved > 0 and self._day_key:
+            released = (self._day_key, self._reserved)
+        self._reserved = 0
+        return released
+
+    def _return_to_ledger(self, day_key: str, amount: int) -> None:
+        """未使用の予約分を台帳に返却します（ロックの外で呼び出すこと）。返却に失敗しても実行は続けます。"""
+        try:
+            self.ledger.release(day_key, amount)
+        except Exception as e:
+            logger.warning(f"Failed to release {amount} unused GSC API calls for {day_key} to the ledger: {e}")
+
+    def close(self) -> None:
+        """未使用の予約分を台帳に返却します。"""
+        with self._lock:
+            released = self._take_reserved()
+        if released:
+            self._return_to_ledger(*released)
+        logger.info(f"GSC API calls consumed in this run: {self.consumed}")
+
+
+def _is_cloud_run() -> bool:
+    """Cloud Run（Jobs / サービス）上で実行されているかを返します。"""
+    return bool(os.getenv('CLOUD_RUN_JOB') or os.getenv('K_SERVICE'))
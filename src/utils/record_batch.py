@@ -0,0 +1,191 @@
+# src/utils/record_batch.py
+
+from array import array
+
+from .string_dictionary import StringDictionary
+from .url_utils import normalize_url, make_aggregated_record
+
+# 列指向の集計（pandas が利用できない環境では辞書による集計のみを使用）
+try:
+    import numpy as np
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+# この件数以上のバッチは pandas で集計する（少量では整数キーの辞書集計の方が速い）
+PANDAS_MIN_RECORDS = 20000
+
+
+class RecordBatch:
+    """GSC の1ページ分のレコードを列指向で保持するクラス
+
+    clicks / impressions / position は型付き配列に、query と page は文字列辞書（StringDictionary）に格納し、
+    各行は辞書のID（query_ids / url_ids）で参照します。
+    行ごとの dict と keys リストを保持しないため、1ページあたりのメモリ使用量が小さくなります。
+    実行全体で共有する辞書を渡すと、ページ・日付を跨いで同じ文字列が1つの str オブジェクトに集約されます。
+    """
+
+    __slots__ = ("query_dictionary", "url_dictionary", "query_ids", "url_ids", "clicks", "impressions", "positions")
+
+    def __init__(self, query_dictionary: StringDictionary = None, url_dictionary: StringDictionary = None):
+        """
+        Args:
+            query_dictionary: クエリの文字列辞書（省略時はバッチ専用の辞書）
+            url_dictionary: URL（正規化前・正規化後の両方）の文字列辞書（省略時はバッチ専用の辞書）
+        """
+        self.query_dictionary = query_dictionary if query_dictionary is not None else StringDictionary("query")
+        self.url_dictionary = url_dictionary if url_dictionary is not None else StringDictionary("url")
+        self.query_ids = array("I")
+        self.url_ids = array("I")
+        self.clicks = array("q")
+        self.impressions = array("q")
+        self.positions = array("d")
+
+    @classmethod
+    def from_rows(cls, rows, query_dictionary: StringDictionary = None,
+                  url_dictionary: StringDictionary = None) -> "RecordBatch":
+        """
+        Search Analytics API のレスポンスの rows（keys = [query, page]）からバッチを生成します。
+
+        Args:
+            rows (list): API レスポンスの rows
+            query_dictionary: クエリの文字列辞書（省略時はバッチ専用の辞書）
+            url_dictionary: URLの文字列辞書（省略時はバッチ専用の辞書）
+
+        Returns:
+            RecordBatch: 生成したバッチ
+        """
+        batch = cls(query_dictionary, url_dictionary)
+        encode_query = batch.query_dictionary.encode
+        encode_url = batch.url_dictionary.encode
+        for row in rows:
+            batch.query_ids.append(encode_query(row['keys'][0]))
+            batch.url_ids.append(encode_url(row['keys'][1]))
+            batch.clicks.append(int(row.get('clicks', 0)))
+            batch.impressions.append(int(row.get('impressions', 0)))
+            batch.positions.append(row.get('position', 0.0))
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.query_ids)
+
+    @property
+    def queries(self) -> list:
+        """クエリIDから文字列への対応表"""
+        return self.query_dictionary.strings
+
+    @property
+    def urls(self) -> list:
+        """URL IDから文字列への対応表"""
+        return self.url_dictionary.strings
+
+    def normalized_url_ids(self) -> dict:
+        """
+        バッチに含まれる url_id から、正規化後のURLのIDへの対応を返します。
+
+        正規化はバッチ内のユニークなURLに対してのみ行い、正規化後のURLも url_dictionary に登録します。
+
+        Returns:
+            dict: url_id → 正規化後のURLのID
+        """
+        urls = self.url_dictionary.strings
+        encode_url = self.url_dictionary.encode
+        return {url_id: encode_url(normalize_url(urls[url_id])) for url_id in dict.fromkeys(self.url_ids)}
+
+    def aggregate(self, include_state: bool = False, include_ids: bool = False, pool=None) -> list:
+        """
+        (query, 正規化URL) ごとに集計します（aggregate_records と同じ出力）。
+
+        集計キーは文字列辞書のIDの組で、URLの正規化はユニークなURLに対してのみ行います。
+
+        Args:
+            include_state (bool): マージ可能な集計状態を出力に含めるか
+            include_ids (bool): 文字列辞書のID（query_id / url_id、実行内でのみ有効）を出力に含めるか
+            pool (ParallelAggregator): 指定された場合、件数が閾値以上であればプロセスプールで並列に集計
+
+        Returns:
+            list: 集計後のレコードリスト
+        """
+        mapping = self.normalized_url_ids()
+        if pool is not None and pool.accepts(len(self)):
+            entries = pool.aggregate(self, mapping)
+        elif PANDAS_AVAILABLE and len(self) >= PANDAS_MIN_RECORDS:
+            entries = self._aggregate_pandas(mapping)
+        else:
+            entries = {}
+            for query_id, url_id, clicks, impressions, position in zip(
+                self.query_ids, self.url_ids, self.clicks, self.impressions, self.positions
+            ):
+                key = (query_id, mapping[url_id])
+                entry = entries.get(key)
+                if entry is None:
+                    entry = entries[key] = [0, 0, 0.0, 0, 0.0]
+                entry[0] += clicks
+                entry[1] += impressions
+                entry[2] += position
+                entry[3] += 1
+                entry[4] += position * impressions
+
+        queries = self.query_dictionary.strings
+        urls = self.url_dictionary.strings
+        records = []
+        for (query_id, url_id), entry in entries.items():
+            record = make_aggregated_record(queries[query_id], urls[url_id], *entry, include_state)
+            if include_ids:
+                record["query_id"] = query_id
+                record["url_id"] = url_id
+            records.append(record)
+        return records
+
+    def _aggregate_pandas(self, mapping: dict) -> dict:
+        """型付き配列から整数キーを作り、pandas の factorize でグループ化して集計します。
+
+        Python の経路と結果を一致させるため、グループは初出順に並べ、浮動小数点の合計は
+        np.add.at で行の順に逐次加算します（groupby の sum は補正付きの加算で下位の桁が変わるため使用しない）。
+        """
+        if not mapping:
+            return {}
+        # 正規化後のURLのIDは辞書全体のID空間に属するため、キーの乗数には辞書のサイズを使用
+        url_space = len(self.url_dictionary) + 1
+        lookup = np.zeros(max(mapping) + 1, dtype=np.int64)
+        lookup[list(mapping)] = list(mapping.values())
+        query_ids = np.frombuffer(self.query_ids, dtype=np.uint32).astype(np.int64)
+        normalized_ids = lookup[np.frombuffer(self.url_ids, dtype=np.uint32)]
+        positions = np.frombuffer(self.positions, dtype=np.float64)
+        impressions = np.frombuffer(self.impressions, dtype=np.int64)
+        codes, keys = pd.factorize(query_ids * url_space + normalized_ids, sort=False)
+
+        def group_sum(values, dtype):
+            sums = np.zeros(len(keys), dtype=dtype)
+            np.add.at(sums, codes, values)
+            return sums
+
+        # numpy の数値型は JSON にシリアライズできないため、tolist() で Python の型に戻す
+        columns = [
+            group_sum(np.frombuffer(self.clicks, dtype=np.int64), np.int64).tolist(),
+            group_sum(impressions, np.int64).tolist(),
+            group_sum(positions, np.float64).tolist(),
+            np.bincount(codes, minlength=len(keys)).tolist(),
+            group_sum(positions * impressions, np.float64).tolist(),
+        ]
+        return {
+            (key // url_space, key % url_space): values
+            for key, *values in zip(keys.tolist(), *columns)
+        }
+
+    def to_records(self) -> list:
+        """API レスポンスと同じ形式（keys = [query, page]）の dict のリストに戻します。"""
+        queries = self.query_dictionary.strings
+        urls = self.url_dictionary.strings
+        return [
+            {
+                "keys": [queries[query_id], urls[url_id]],
+                "clicks": clicks,
+                "impressions": impressions,
+                "position": position,
+            }
+            for query_id, url_id, clicks, impressions, position in zip(
+                self.query_ids, self.url_ids, self.clicks, self.impressions, self.positions
+            )
+        ]
@@ -0,0 +1,107 @@
+# src/utils/request_planner.py
+
+from collections import defaultdict
+from datetime import timedelta
+from statistics import median
+
+
+def weekday_medians(history: dict) -> dict:
+    """
+    過去の日付ごとの行数から、曜日ごとの行数の中央値を返します。
+
+    Args:
+        history (dict): 日付 → 完了時の行数
+
+    Returns:
+        dict: 曜日（0 = 月曜）→ 行数の中央値
+    """
+    counts = defaultdict(list)
+    for date, count in history.items():
+        counts[date.weekday()].append(count)
+    return {weekday: median(values) for weekday, values in counts.items()}
+
+
+def estimate_rows(known_counts: dict, dates) -> dict:
+    """
+    日付ごとの行数の推定値を返します。
+
+    完了済みの日付は記録された行数を、それ以外は完了済みの日付のうち同じ曜日の行数の中央値
+    （同じ曜日の日付がない場合はすべての完了済みの日付の中央値）を使用します。
+    完了済みの日付がない場合、推定値は None（不明）です。
+
+    Args:
+        known_counts (dict): 日付 → 完了時の行数（対象期間より前の日付を含む）
+        dates (list): 推定対象の日付
+
+    Returns:
+        dict: 日付 → 推定行数（不明の場合は None）
+    """
+    by_weekday = weekday_medians(known_counts)
+    typical = median(known_counts.values()) if known_counts else None
+    return {
+        date: known_counts[date] if date in known_counts else by_weekday.get(date.weekday(), typical)
+        for date in dates
+    }
+
+
+def plan_date_ranges(dates, estimates: dict, max_rows: int, max_days: int) -> list:
+    """
+    連続する日付を、推定行数の合計が max_rows 以下になるよう期間にまとめます。
+
+    まとめた期間は date ディメンションを加えた1回のリクエストで取得できます。
+    推定行数が不明の日付は他の日付とまとめず、1日単位の期間になります。
+
+    Args:
+        dates (list): 対象の日付（date、順不同）
+        estimates (dict): 日付 → 推定行数（不明の場合は None）
+        max_rows (int): 1期間の推定行数の上限（1ページの取得件数）
+        max_days (int): 1期間の最大日数
+
+    Returns:
+        list: 期間（昇順の日付のリスト）のリスト
+    """
+    ranges = []
+    current = []
+    current_rows = 0
+    for date in sorted(dates):
+        rows = estimates.get(date)
+        fits = (
+            current
+            and rows is not None
+            and date - current[-1] == timedelta(days=1)
+            and len(current) < max_days
+            and current_rows + rows <= max_rows
+        )
+        if fits:
+            current.append(date)
+            current_rows += rows
+            continue
+        if current:
+            ranges.append(current)
+        current = [date]
+        current_rows = rows if rows is not None else max_rows
+    if current:
+        ranges.append(current)
+    return ranges
+
+
+def split_decision(estimate, row_cap: int, probe_ratio: float = 0.5) -> str:
+    """
+    推定行数から、行数の上限（row_cap）による分割が必要かを判定します。
+
+    Args:
+        estimate: 推定行数（不明の場合は None）
+        row_cap (int): 行数の上限
+        probe_ratio (float): 推定行数が row_cap × probe_ratio 以上の場合は上限位置の1行を確認する
+
+    Returns:
+        str: "split"（推定が上限以上のため確認せずに分割）/ "probe"（推定が不明または上限に近いため確認）/
+             "none"（分割しない）
+    """
+    if estimate is None:
+        return "probe"
+    if estimate >= row_cap:
+        return "split"
+    if estimate >= row_cap * probe_ratio:
+        return "probe"
+    return "none"
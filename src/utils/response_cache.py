@@ -0,0 +1,195 @@
+# src/utils/response_cache.py
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# キャッシュファイルのヘッダ（マジック + フォーマットバージョン + 取得時刻の UNIX 時間（little-endian double））
+# バージョン 1 のファイルは取得時刻を持たないため、ファイルの更新時刻を取得時刻とみなして読み込む
+_MAGIC = b"GSCZ"
+_VERSION = 2
+_FETCHED_AT = struct.Struct("<d")
+_HEADER_SIZES = {1: len(_MAGIC) + 1, 2: len(_MAGIC) + 1 + _FETCHED_AT.size}
+
+CACHE_MODES = ("off", "readwrite", "offline")
+
+
+class CacheMissError(Exception):
+    """オフラインモードでキャッシュに存在しないリクエストを参照した場合に送出される例外"""
+
+
+class GSCResponseCache:
+    """Search Analytics API の生レスポンスをローカルディスクに保存するキャッシュ
+
+    キーはサイトURLとリクエストボディ（日付・ディメンション・startRow 等）の SHA-256 で、
+    同一内容のリクエストは同一ファイルに対応します（コンテンツアドレス方式）。
+    各ファイルは固定ヘッダ（取得時刻を含む）+ zlib 圧縮したJSONで構成され、読み込み時は mmap でマップして展開します。
+    取得時刻から max_age_days を超えたファイルは参照せずに削除し、総サイズの上限を超える場合は
+    最終アクセス（ファイルの更新時刻）の古い順に削除します。
+    """
+
+    # 書き込みがこの回数に達するごとに退避処理を実行
+    EVICT_INTERVAL = 50
+
+    def __init__(self, cache_dir, mode: str = "readwrite", max_bytes: int = 2 * 1024 ** 3,
+                 max_age_days: float = 30, compress_level: int = 6):
+        """
+        Args:
+            cache_dir: キャッシュディレクトリ
+            mode: "readwrite"（参照・保存）または "offline"（参照のみ、ミス時は CacheMissError）
+            max_bytes: キャッシュ全体の最大サイズ（バイト）
+            max_age_days: キャッシュの最大保持日数
+            compress_level: zlib の圧縮レベル
+        """
+        if mode not in CACHE_MODES[1:]:
+            raise ValueError(f"Invalid cache mode: {mode}")
+        self.cache_dir = Path(cache_dir)
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 86400
+        self.compress_level = compress_level
+        self.hits = 0
+        self.misses = 0
+        self._writes_since_evict = 0
+        self._lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.evict()
+
+    @classmethod
+    def from_config(cls, config) -> Optional["GSCResponseCache"]:
+        """settings.ini の [GSC_CACHE] セクションからキャッシュを生成します（無効の場合は None）。"""
+        mode = config.get_config_value('GSC_CACHE', 'MODE', 'off').lower()
+        if mode == "off":
+            return None
+        cache_dir = Path(config.get_config_value('GSC_CACHE', 'CACHE_DIR', 'data/gsc_cache'))
+        if not cache_dir.is_absolute():
+            cache_dir = config.base_path / cache_dir
+        return cls(
+            cache_dir,
+            mode=mode,
+            max_bytes=int(float(config.get_config_value('GSC_CACHE', 'MAX_SIZE_MB', '2048')) * 1024 ** 2),
+            max_age_days=float(config.get_config_value('GSC_CACHE', 'MAX_AGE_DAYS', '30')),
+        )
+
+    @property
+    def offline(self) -> bool:
+        """GSC API を呼び出さずキャッシュのみを参照するモードかどうか"""
+        return self.mode == "offline"
+
+    @staticmethod
+    def make_key(site_url: str, body: dict) -> str:
+        """サイトURLとリクエストボディからキャッシュキーを生成します。"""
+        canonical = json.dumps({"siteUrl": site_url, "body": body}, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.gscz"
+
+    @staticmethod
+    def _parse_header(header: bytes, mtime: float):
+        """ヘッダからヘッダ長と取得時刻を返します（バージョン 1 のファイルは更新時刻を取得時刻とする）。"""
+        if header[:len(_MAGIC)] != _MAGIC or len(header) <= len(_MAGIC) or header[len(_MAGIC)] not in _HEADER_SIZES:
+            raise ValueError("unknown cache file format")
+        version = header[len(_MAGIC)]
+        if version == 1:
+            return _HEADER_SIZES[1], mtime
+        if len(header) < _HEADER_SIZES[version]:
+            raise ValueError("truncated cache file header")
+        return _HEADER_SIZES[version], _FETCHED_AT.unpack_from(header, len(_MAGIC) + 1)[0]
+
+    def _fetched_at(self, path: Path, mtime: float) -> float:
+        """ファイルのヘッダから取得時刻を読み込みます。"""
+        with open(path, "rb") as f:
+            return self._parse_header(f.read(_HEADER_SIZES[_VERSION]), mtime)[1]
+
+    def get(self, site_url: str, body: dict) -> Optional[dict]:
+        """
+        キャッシュ済みのレスポンスを返します。
+
+        Returns:
+            Optional[dict]: キャッシュ済みのレスポンス（存在しない・取得から max_age_days を超えた場合は None）
+        """
+        path = self._path(self.make_key(site_url, body))
+        try:
+            mtime = path.stat().st_mtime
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                header_size, fetched_at = self._parse_header(mapped[:_HEADER_SIZES[_VERSION]], mtime)
+                if time.time() - fetched_at > self.max_age_seconds:
+                    self.misses += 1
+                    return None
+                with memoryview(mapped) as view:
+                    payload = zlib.decompress(view[header_size:])
+            response = json.loads(payload)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, zlib.error) as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {e}")
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+
+        # 最終アクセス時刻を更新（サイズ超過時の退避はアクセスの古い順。有効期限はヘッダの取得時刻で判定）
+        os.utime(path)
+        self.hits += 1
+        return response
+
+    def put(self, site_url: str, body: dict, response: dict) -> None:
+        """レスポンスをキャッシュに保存します。"""
+        if self.offline:
+            return
+        path = self._path(self.make_key(site_url, body))
+        payload = zlib.compress(json.dumps(response, separators=(",", ":")).encode("utf-8"), self.compress_level)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(_MAGIC + bytes([_VERSION]))
+            f.write(_FETCHED_AT.pack(time.time()))
+            f.write(payload)
+        tmp_path.replace(path)
+
+        with self._lock:
+            self._writes_since_evict += 1
+            should_evict = self._writes_since_evict >= self.EVICT_INTERVAL
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> None:
+        """取得から期限を過ぎたファイルを削除し、総サイズが上限を超える場合は最終アクセスの古い順に削除します。"""
+        with self._lock:
+            self._writes_since_evict = 0
+            now = time.time()
+            entries = []
+            for path in self.cache_dir.glob("*/*.gscz"):
+                try:
+                    stat = path.stat()
+                    expired = now - self._fetched_at(path, stat.st_mtime) > self.max_age_seconds
+                except FileNotFoundError:
+                    continue
+                except (OSError, ValueError):
+                    expired = True
+                if expired:
+                    path.unlink(missing_ok=True)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total_bytes = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total_bytes <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total_bytes -= size
+                removed += 1
+            if removed:
+                logger.info(f"Evicted {removed} GSC cache entries (size now {total_bytes} bytes).")
@@ -1,47 +1,193 @@
 # src/utils.py
 
+import json
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
+from google.api_core.exceptions import BadRequest, NotFound
 from google.auth.exceptions import RefreshError
 from google.cloud import bigquery
 import logging
 
+# insert_rows_json 1リクエストあたりの上限（BigQuery の上限 10MB / 50,000行 に余裕を持たせた値）
+DEFAULT_CHUNK_ROWS = 5000
+DEFAULT_CHUNK_BYTES = 5 * 1024 * 1024
+
+class PermanentInsertError(Exception):
+    """リトライしても成功しない挿入エラー（スキーマ不一致・不正な値・テーブル不存在など）"""
+
+
+# 行単位エラーのうち、再送しても成功しない reason
+PERMANENT_ROW_REASONS = {"invalid", "invalidQuery", "notFound", "accessDenied", "billingNotEnabled"}
+
+# リクエスト全体の失敗のうち、再送しても成功しない例外
+PERMANENT_EXCEPTIONS = (BadRequest, NotFound)
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """
+    指数バックオフ（フルジッター）の待機秒数を返します。
+
+    Args:
+        attempt (int): 試行回数（1始まり）
+        base_delay (float): 初回の待機時間の上限（秒）
+        max_delay (float): 待機時間の上限（秒）
+
+    Returns:
+        float: 0 〜 min(max_delay, base_delay * 2^(attempt-1)) の一様乱数
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+def _failed_row_indexes(errors: list) -> list:
+    """
+    insert_rows_json の errors から再送が必要な行のインデックスを返します。
+
+    reason が "stopped" の行は他の行のエラーにより巻き添えで拒否されたもので、再送対象に含めます。
+
+    Raises:
+        PermanentInsertError: 再送しても成功しないエラーが含まれる場合
+    """
+    indexes = []
+    for entry in errors:
+        reasons = {error.get("reason") for error in entry.get("errors", [])}
+        permanent = reasons & PERMANENT_ROW_REASONS
+        if permanent:
+            raise PermanentInsertError(f"Row {entry.get('index')} rejected ({', '.join(sorted(permanent))}): {entry}")
+        indexes.append(entry["index"])
+    return sorted(set(indexes))
+
 def insert_rows_with_retry(client: bigquery.Client, table_id: str, rows_to_insert: list, logger: logging.Logger,
-                           max_retries: int = 5, retry_delay: int = 10) -> None:
+                           max_retries: int = 5, retry_delay: float = 1, max_delay: float = 32,
+                           row_ids: list = None) -> None:
     """
     BigQueryへのデータ挿入をリトライロジック付きで実行します。
 
+    一部の行のみが拒否された場合は、拒否された行だけを再送します。
+    待機時間は指数バックオフ（ジッター付き、max_delay で頭打ち）で、
+    スキーマ不一致などリトライしても成功しないエラーは待機せずに PermanentInsertError を送出します。
+
     Args:
         client (bigquery.Client): BigQuery クライアント
         table_id (str): 挿入先のテーブルID
         rows_to_insert (list): 挿入する行データのリスト
         logger (logging.Logger): ロガー
         max_retries (int): 最大リトライ回数
-        retry_delay (int): リトライ間の待機時間（秒）
+        retry_delay (float): バックオフの基準となる待機時間（秒）
+        max_delay (float): 待機時間の上限（秒）
+        row_ids (list, optional): 各行の insertId（再送時の重複排除に使用。省略時はランダムに生成）
 
     Raises:
+        PermanentInsertError: リトライしても成功しないエラーの場合
         Exception: 最大リトライ回数に達した場合
     """
+    pending = rows_to_insert
+    pending_ids = row_ids
     for attempt in range(1, max_retries + 1):
         try:
-            errors = client.insert_rows_json(table_id, rows_to_insert)
+            if pending_ids is None:
+                errors = client.insert_rows_json(table_id, pending)
+            else:
+                errors = client.insert_rows_json(table_id, pending, row_ids=pending_ids)
             if not errors:
-                logger.info(f"Successfully inserted {len(rows_to_insert)} rows into {table_id}.")
+                logger.info(f"Successfully inserted {len(pending)} rows into {table_id}.")
                 return
-            else:
-                logger.error(f"BigQuery insertion errors (Attempt {attempt}): {errors}")
-                if attempt < max_retries:
-                    logger.info(f"Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
+            failed = _failed_row_indexes(errors)
+            logger.error(f"BigQuery insertion errors (Attempt {attempt}): "
+                         f"{len(failed)} of {len(pending)} rows rejected: {errors[:5]}")
+            pending = [pending[index] for index in failed]
+            if pending_ids is not None:
+                pending_ids = [pending_ids[index] for index in failed]
+        except PermanentInsertError as e:
+            logger.critical(f"Non-retryable BigQuery insertion error for {table_id}: {e}")
+            raise
+        except PERMANENT_EXCEPTIONS as e:
+            logger.critical(f"Non-retryable BigQuery insertion error for {table_id}: {e}")
+            raise PermanentInsertError(str(e)) from e
         except RefreshError as e:
             logger.error(f"Authentication error occurred (Attempt {attempt}): {e}")
-            if attempt < max_retries:
-                logger.info(f"Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
         except Exception as e:
             logger.error(f"Unexpected error during BigQuery insertion (Attempt {attempt}): {e}")
-            if attempt < max_retries:
-                logger.info(f"Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
+
+        if attempt < max_retries:
+            delay = backoff_delay(attempt, retry_delay, max_delay)
+            logger.info(f"Retrying {len(pending)} rows in {delay:.1f} seconds...")
+            time.sleep(delay)
+
+    logger.critical(f"Failed to insert rows into {table_id} after {max_retries} attempts.")
+    raise Exception("BigQuery insertion failed after maximum retries.")
+
+def split_rows_into_chunks(rows_to_insert: list, max_rows: int = DEFAULT_CHUNK_ROWS,
+                           max_bytes: int = DEFAULT_CHUNK_BYTES) -> list:
+    """
+    行データを、行数とシリアライズ後のバイト数の上限を超えないチャンクに分割します。
+
+    Args:
+        rows_to_insert (list): 挿入する行データのリスト
+        max_rows (int): 1チャンクあたりの最大行数
+        max_bytes (int): 1チャンクあたりの最大バイト数（JSON シリアライズ後）
+
+    Returns:
+        list: (行データのリスト, バイト数) のタプルのリスト
+    """
+    chunks = []
+    chunk, chunk_bytes = [], 0
+    for row in rows_to_insert:
+        row_bytes = len(json.dumps(row, ensure_ascii=False).encode("utf-8")) + 1
+        if chunk and (len(chunk) >= max_rows or chunk_bytes + row_bytes > max_bytes):
+            chunks.append((chunk, chunk_bytes))
+            chunk, chunk_bytes = [], 0
+        chunk.append(row)
+        chunk_bytes += row_bytes
+    if chunk:
+        chunks.append((chunk, chunk_bytes))
+    return chunks
+
+def insert_rows_chunked(client: bigquery.Client, table_id: str, rows_to_insert: list, logger: logging.Logger,
+                        max_rows: int = DEFAULT_CHUNK_ROWS, max_bytes: int = DEFAULT_CHUNK_BYTES,
+                        max_workers: int = 4, row_ids: list = None) -> int:
+    """
+    行データをサイズ上限内のチャンクに分割し、並列に挿入します。
+    リトライはチャンク単位で行われるため、失敗したチャンクのみが再送されます。
+
+    Args:
+        client (bigquery.Client): BigQuery クライアント（スレッド間で共有）
+        table_id (str): 挿入先のテーブルID
+        rows_to_insert (list): 挿入する行データのリスト
+        logger (logging.Logger): ロガー
+        max_rows (int): 1チャンクあたりの最大行数
+        max_bytes (int): 1チャンクあたりの最大バイト数
+        max_workers (int): 同時に送信するチャンク数
+        row_ids (list, optional): 各行の insertId（rows_to_insert と同じ順序）
+
+    Returns:
+        int: 送信したデータの合計バイト数
+
+    Raises:
+        Exception: いずれかのチャンクが最大リトライ回数に達しても挿入できなかった場合
+    """
+    chunks = split_rows_into_chunks(rows_to_insert, max_rows, max_bytes)
+    # チャンクは元の順序で連続しているため、先頭からの位置で insertId を切り出す
+    offsets = [0]
+    for chunk, _ in chunks:
+        offsets.append(offsets[-1] + len(chunk))
+
+    def _insert_chunk(index, chunk, chunk_bytes):
+        started = time.monotonic()
+        chunk_ids = row_ids[offsets[index]:offsets[index + 1]] if row_ids is not None else None
+        insert_rows_with_retry(client, table_id, chunk, logger, row_ids=chunk_ids)
+        logger.info(f"Chunk {index + 1}/{len(chunks)}: {len(chunk)} rows, {chunk_bytes} bytes "
+                    f"in {time.monotonic() - started:.2f}s")
+
+    if len(chunks) == 1 or max_workers <= 1:
+        for index, (chunk, chunk_bytes) in enumerate(chunks):
+            _insert_chunk(index, chunk, chunk_bytes)
     else:
-        logger.critical(f"Failed to insert rows into {table_id} after {max_retries} attempts.")
-        raise Exception("BigQuery insertion failed after maximum retries.")
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks)), thread_name_prefix="bq-insert") as executor:
+            futures = [executor.submit(_insert_chunk, index, chunk, chunk_bytes)
+                       for index, (chunk, chunk_bytes) in enumerate(chunks)]
+            errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            logger.critical(f"{len(errors)} of {len(chunks)} chunks failed to insert into {table_id}.")
+            raise errors[0]
+
+    return sum(chunk_bytes for _, chunk_bytes in chunks)
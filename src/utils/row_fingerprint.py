@@ -0,0 +1,51 @@
+# src/utils/row_fingerprint.py
+
+import hashlib
+
+# フィールドの区切り文字（URL・クエリに含まれない制御文字）
+_SEPARATOR = "\x1f"
+
+# 16バイト（32桁の16進数）に切り詰めた SHA-256。BigQuery 側でも
+# TO_HEX(SUBSTR(SHA256(...), 1, 16)) で同じ値を計算できるため、既存行の埋め戻しに使用できます。
+FINGERPRINT_SQL = (
+    "TO_HEX(SUBSTR(SHA256(CONCAT(CAST(data_date AS STRING), '\\x1f', "
+    "IFNULL(url, ''), '\\x1f', IFNULL(query, ''))), 1, 16))"
+)
+
+
+def row_fingerprint(date: str, url: str, query: str) -> str:
+    """
+    (日付, 正規化済みURL, クエリ) から行のフィンガープリントを生成します。
+
+    Args:
+        date (str): データ日付（YYYY-MM-DD）
+        url (str): 正規化済みのURL
+        query (str): 検索クエリ
+
+    Returns:
+        str: 32桁の16進文字列（同じ入力には常に同じ値）
+    """
+    key = f"{date}{_SEPARATOR}{url or ''}{_SEPARATOR}{query or ''}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def row_fingerprints(date: str, pairs) -> list:
+    """
+    同じ日付の (URL, クエリ) の組に対するフィンガープリントをまとめて生成します。
+
+    日付部分のハッシュ状態を一度だけ計算し、各行ではそのコピーに URL とクエリを追加します。
+
+    Args:
+        date (str): データ日付（YYYY-MM-DD）
+        pairs (iterable): (正規化済みURL, クエリ) のタプル
+
+    Returns:
+        list: row_fingerprint と同じ値のリスト
+    """
+    prefix = hashlib.sha256(f"{date}{_SEPARATOR}".encode("utf-8"))
+    fingerprints = []
+    for url, query in pairs:
+        hasher = prefix.copy()
+        hasher.update(f"{url or ''}{_SEPARATOR}{query or ''}".encode("utf-8"))
+        fingerprints.append(hasher.hexdigest()[:32])
+    return fingerprints
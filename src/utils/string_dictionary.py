@@ -0,0 +1,79 @@
+# src/utils/string_dictionary.py
+
+import sys
+import threading
+
+
+class StringDictionary:
+    """実行中に現れる文字列（クエリ・URL）を整数IDに対応付ける辞書エンコーダ
+
+    同じ文字列は常に同じID・同じ str オブジェクトに対応するため、長期間のバックフィルで
+    同じURL・クエリが繰り返し現れても、メモリ上には1つの文字列として保持されます。
+    IDは実行（プロセス）内でのみ有効です。複数スレッドから共有して使用できます。
+    """
+
+    def __init__(self, name: str = ""):
+        """
+        Args:
+            name: 統計のログ出力に使用する名前（例: "query", "url"）
+        """
+        self.name = name
+        self.strings = []
+        self._index = {}
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.bytes_saved = 0
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def encode(self, value: str) -> int:
+        """
+        文字列のIDを返します（初出の場合は新しいIDを割り当て）。
+
+        Args:
+            value (str): 文字列
+
+        Returns:
+            int: 0 から始まる連番のID
+        """
+        self.lookups += 1
+        string_id = self._index.get(value)
+        if string_id is not None:
+            # 既存の文字列を再利用したことで不要になった str オブジェクトの概算サイズ
+            self.bytes_saved += sys.getsizeof(value)
+            return string_id
+        with self._lock:
+            string_id = self._index.get(value)
+            if string_id is None:
+                string_id = len(self.strings)
+                self.strings.append(value)
+                self._index[value] = string_id
+            return string_id
+
+    def decode(self, string_id: int) -> str:
+        """IDに対応する文字列を返します。"""
+        return self.strings[string_id]
+
+    def intern(self, value: str) -> str:
+        """同じ内容の文字列について、辞書が保持する共通の str オブジェクトを返します。"""
+        return self.strings[self.encode(value)]
+
+    def stats(self) -> dict:
+        """
+        辞書の統計を返します（スレッド間の競合により lookups / bytes_saved は概算）。
+
+        Returns:
+            dict: distinct / lookups / bytes_saved / bytes
+        """
+        return {
+            "distinct": len(self.strings),
+            "lookups": self.lookups,
+            "bytes_saved": self.bytes_saved,
+            "bytes": sum(sys.getsizeof(value) for value in self.strings),
+        }
+
+    def summary(self) -> str:
+        stats = self.stats()
+        return (f"{self.name}: {stats['distinct']} distinct of {stats['lookups']} lookups, "
+                f"{stats['bytes'] / 1024 ** 2:.2f} MB held, ~{stats['bytes_saved'] / 1024 ** 2:.2f} MB saved")
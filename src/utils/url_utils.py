@@ -1,33 +1,113 @@
 # src/utils/url_utils.py
 from urllib.parse import urlparse, urlunparse
 from collections import defaultdict
+from functools import lru_cache
 
+# normalize_url の結果を保持する件数（LRU で古いものから破棄）
+NORMALIZE_URL_CACHE_SIZE = 65536
+
+# 文字列走査による高速化の対象とするスキーム
+_FAST_PATH_PREFIXES = ("https://", "http://")
+# urlparse / urlunparse で表記が変わり得る文字（params の ';'、IPv6 の '[]'）
+_FAST_PATH_UNSAFE = frozenset(";[]")
+
+def _normalize_url_slow(url):
+    """urlparse / urlunparse による正規化"""
+    parsed_url = urlparse(url)
+    # クエリとフラグメントを除去
+    return urlunparse(parsed_url._replace(query="", fragment=""))
+
+def _normalize_url_fast(url):
+    """
+    文字列走査で '?' / '#' 以降を除去します。
+
+    小文字の http(s) スキーム・空でないホスト名を持ち、表示可能な ASCII 文字のみで構成された
+    一般的なURLに限り、_normalize_url_slow と同じ結果を返します。それ以外は None を返します。
+    """
+    if not url.startswith(_FAST_PATH_PREFIXES):
+        return None
+    end = len(url)
+    for separator in "?#":
+        index = url.find(separator)
+        if index != -1 and index < end:
+            end = index
+    stripped = url[:end]
+    netloc_start = stripped.index("//") + 2
+    if netloc_start >= len(stripped) or stripped[netloc_start] == "/":
+        return None
+    for char in stripped:
+        if not "!" <= char <= "~" or char in _FAST_PATH_UNSAFE:
+            return None
+    return stripped
+
+@lru_cache(maxsize=NORMALIZE_URL_CACHE_SIZE)
 def normalize_url(url):
     """
     URLからクエリパラメータとフラグメント識別子を除去します。
 
+    同じページURLが多数のクエリで繰り返し現れるため、結果は LRU キャッシュで保持します
+    （統計は normalize_url_stats で取得）。一般的な http(s) のURLは文字列走査で処理し、
+    それ以外は urlparse / urlunparse で正規化します。
+
     Args:
         url (str): 正規化前のURL
 
     Returns:
         str: クエリパラメータとフラグメント識別子を除去したURL
     """
-    parsed_url = urlparse(url)
-    # クエリとフラグメントを除去
-    normalized_url = urlunparse(parsed_url._replace(query="", fragment=""))
-    return normalized_url
+    if isinstance(url, str):
+        normalized_url = _normalize_url_fast(url)
+        if normalized_url is not None:
+            return normalized_url
+    return _normalize_url_slow(url)
+
+def normalize_url_stats():
+    """
+    normalize_url のキャッシュ統計を返します。
+
+    Returns:
+        dict: hits / misses / hit_rate / size / max_size
+    """
+    info = normalize_url.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+    }
 
-def aggregate_records(records):
+def aggregate_records(records, include_state=False, include_ids=False, pool=None):
     """
     レコードをURLでグルーピングし、クリック数、インプレッション数、平均順位を集計します。
 
+    RecordBatch の場合は列指向で集計します（件数が record_batch.PANDAS_MIN_RECORDS 以上で pandas が利用可能な場合は pandas）。
+    レコード（dict）のリストは辞書ベースの実装で集計します。どちらの場合も出力（キーの出現順・値の型）は同じです。
+
+    include_state が True の場合は、別のページ・実行・シャードの集計結果と正確に
+    マージできるよう、次の集計状態も出力します（merge_aggregated_records を参照）。
+        position_sum: position の合計
+        position_count: 集計したレコード数
+        weighted_position_sum: position × impressions の合計
+
     Args:
-        records (list): GSCから取得したレコードのリスト
+        records (list or RecordBatch): GSCから取得したレコードのリスト、または RecordBatch
+        include_state (bool): マージ可能な集計状態を出力に含めるか
+        include_ids (bool): 文字列辞書のID（query_id / url_id）を出力に含めるか（RecordBatch の場合のみ）
+        pool (ParallelAggregator): プロセスプールによる並列集計（RecordBatch の場合のみ）
 
     Returns:
         list: 集計後のレコードリスト
     """
-    aggregated_data = defaultdict(lambda: {"clicks": 0, "impressions": 0, "positions": []})
+    if hasattr(records, "aggregate"):
+        # RecordBatch（列指向のバッチ）は自身の実装で集計
+        return records.aggregate(include_state, include_ids, pool)
+    return aggregate_records_python(records, include_state)
+
+def aggregate_records_python(records, include_state=False):
+    """aggregate_records の辞書ベースの実装"""
+    aggregated_data = defaultdict(lambda: [0, 0, 0.0, 0, 0.0])
 
     for record in records:
         query = record['keys'][0]
@@ -38,21 +118,58 @@ def aggregate_records(records):
 
         normalized_url = normalize_url(url)
 
-        key = (query, normalized_url)
-        aggregated_data[key]["clicks"] += clicks
-        aggregated_data[key]["impressions"] += impressions
-        aggregated_data[key]["positions"].append(position)
-
-    # 平均順位を計算
-    final_records = []
-    for (query, url), data in aggregated_data.items():
-        avg_position = sum(data["positions"]) / len(data["positions"]) if data["positions"] else 0.0
-        final_records.append({
-            "query": query,
-            "url": url,
-            "clicks": data["clicks"],
-            "impressions": data["impressions"],
-            "avg_position": avg_position  # フィールド名を統一
-        })
-
-    return final_records
+        data = aggregated_data[(query, normalized_url)]
+        data[0] += clicks
+        data[1] += impressions
+        data[2] += position
+        data[3] += 1
+        data[4] += position * impressions
+
+    return [
+        make_aggregated_record(query, url, *data, include_state)
+        for (query, url), data in aggregated_data.items()
+    ]
+
+def make_aggregated_record(query, url, clicks, impressions, position_sum, position_count,
+                          weighted_position_sum, include_state):
+    """集計状態から出力レコードを生成します。"""
+    record = {
+        "query": query,
+        "url": url,
+        "clicks": clicks,
+        "impressions": impressions,
+        "avg_position": position_sum / position_count if position_count else 0.0  # フィールド名を統一
+    }
+    if include_state:
+        record["position_sum"] = float(position_sum)
+        record["position_count"] = position_count
+        record["weighted_position_sum"] = float(weighted_position_sum)
+    return record
+
+def merge_aggregated_records(*record_lists):
+    """
+    include_state=True で集計したレコードを (query, url) ごとにマージします。
+
+    ページ・実行・シャードごとの部分集計を結合しても、全レコードをまとめて集計した場合と同じ結果になります。
+
+    Args:
+        *record_lists: aggregate_records(..., include_state=True) の出力
+
+    Returns:
+        list: マージ後のレコードリスト（集計状態を含む）
+    """
+    merged = {}
+    for records in record_lists:
+        for record in records:
+            key = (record["query"], record["url"])
+            data = merged.get(key)
+            if data is None:
+                merged[key] = [record["clicks"], record["impressions"], record["position_sum"],
+                               record["position_count"], record["weighted_position_sum"]]
+            else:
+                data[0] += record["clicks"]
+                data[1] += record["impressions"]
+                data[2] += record["position_sum"]
+                data[3] += record["position_count"]
+                data[4] += record["weighted_position_sum"]
+    return [make_aggregated_record(query, url, *data, True) for (query, url), data in merged.items()]
@@ -10,9 +10,9 @@ import requests
 from typing import Optional, Dict, List
 from datetime import datetime
 from google.auth import default
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from utils.date_utils import get_current_jst_datetime, format_datetime_jst
+from utils.discovery import build_service
 
 logger = logging.getLogger(__name__)
 
@@ -42,7 +42,7 @@ class WebhookNotifier:
         if self.space_id:
             try:
                 credentials, _ = default(scopes=["https://www.googleapis.com/auth/chat.bot"])
-                self.chat_service = build('chat', 'v1', credentials=credentials)
+                self.chat_service = build_service('chat', 'v1', credentials=credentials)
                 logger.info("Google Chat API client initialized for mentions")
             except Exception as e:
                 logger.warning(f"Google Chat APIの初期化に失敗しました。Webhook方式にフォールバックします: {e}")
@@ -1 +1,7 @@
- 
+# src/modules のモジュールは "from utils.x import ..." で読み込むため、src をインポートパスに追加する
+import sys
+from pathlib import Path
+
+_SRC_DIR = str(Path(__file__).resolve().parent.parent / "src")
+if _SRC_DIR not in sys.path:
+    sys.path.insert(0, _SRC_DIR)
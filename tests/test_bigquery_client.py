@@ -0,0 +1,39 @@
+# tests/test_bigquery_client.py
+import unittest
+from unittest import mock
+
+from google.auth.credentials import AnonymousCredentials
+
+from src.utils import bigquery_client
+
+
+class FakeConfig:
+    credentials_path = "config/service_account.json"
+
+    def get_config_value(self, section, key, default=None):
+        return {"PROJECT_ID": "bigquery-jukust"}.get(key, default)
+
+
+class TestGetBigQueryClient(unittest.TestCase):
+
+    def setUp(self):
+        bigquery_client._clients.clear()
+        self.addCleanup(bigquery_client._clients.clear)
+
+    def test_session_credentials_are_scoped(self):
+        with mock.patch.object(bigquery_client, "get_credentials", return_value=AnonymousCredentials()) as get:
+            client = bigquery_client.get_bigquery_client(FakeConfig())
+            self.assertIs(bigquery_client.get_bigquery_client(FakeConfig()), client)
+        get.assert_called_once_with(mock.ANY, scopes=bigquery_client.BIGQUERY_SCOPES)
+        self.assertEqual(client.project, "bigquery-jukust")
+
+    def test_service_account_file_is_loaded_with_scopes(self):
+        bigquery_client._credentials.clear()
+        self.addCleanup(bigquery_client._credentials.clear)
+        with mock.patch.object(bigquery_client.service_account.Credentials, "from_service_account_file") as load:
+            bigquery_client.get_credentials(FakeConfig(), scopes=bigquery_client.BIGQUERY_SCOPES)
+        load.assert_called_once_with("config/service_account.json", scopes=bigquery_client.BIGQUERY_SCOPES)
+
+
+if __name__ == '__main__':
+    unittest.main()
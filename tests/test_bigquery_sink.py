@@ -0,0 +1,178 @@
+# tests/test_bigquery_sink.py
+import gzip
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from google.cloud import bigquery
+
+from modules.bigquery_sink import LoadJobSink, MultiSink, PartitionReplaceSink, StreamingSink
+from utils.row_fingerprint import row_fingerprint
+
+TABLE_ID = "project.dataset.T_searchdata_site_impression"
+
+
+def make_rows(date, keys):
+    return [{"data_date": date, "url": url, "query": query, "clicks": 1, "impressions": 10}
+            for url, query in keys]
+
+
+class TestStreamingSink(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.client.insert_rows_json.return_value = []
+
+    def sent_row_ids(self):
+        return [row_id for call in self.client.insert_rows_json.call_args_list for row_id in call.kwargs["row_ids"]]
+
+    def test_same_key_on_several_pages_gets_distinct_row_ids(self):
+        # ページ単位の集計では同じ (url, query) が日付内の複数のページに現れる
+        sink = StreamingSink(self.client, TABLE_ID, workers=1)
+        keys = [("https://www.juku.st/info/1", "塾"), ("https://www.juku.st/info/2", "塾")]
+        sink.write(make_rows("2024-11-01", keys), "2024-11-01", "r0")
+        sink.write(make_rows("2024-11-01", keys), "2024-11-01", "r25000")
+        row_ids = self.sent_row_ids()
+        self.assertEqual(len(row_ids), 4)
+        self.assertEqual(len(set(row_ids)), 4)
+
+    def test_same_page_written_twice_gets_same_row_ids(self):
+        # 再実行で同じページを再取得した場合も insertId が一致し、BigQuery 側で重複が排除される
+        sink = StreamingSink(self.client, TABLE_ID, workers=1)
+        keys = [("https://www.juku.st/info/1", "塾"), ("https://www.juku.st/info/2", "塾")]
+        sink.write(make_rows("2024-11-01", keys), "2024-11-01", "r25000")
+        first = self.sent_row_ids()
+        sink.write(make_rows("2024-11-01", keys), "2024-11-01", "r25000")
+        second = self.sent_row_ids()[len(first):]
+        self.assertEqual(first, second)
+        self.assertEqual(len(set(first)), 2)
+
+    def test_date_rows_use_stable_fingerprints(self):
+        # 日付の集計器から flush する行（page_key なし）は日付内で一意のため、フィンガープリントのみを使用
+        sink = StreamingSink(self.client, TABLE_ID, workers=1)
+        rows = make_rows("2024-11-01", [("https://www.juku.st/info/1", "塾")])
+        sink.write(rows, "2024-11-01")
+        sink.write(rows, "2024-11-01")
+        first, second = self.sent_row_ids()
+        self.assertEqual(first, second)
+        self.assertEqual(first, row_fingerprint("2024-11-01", "https://www.juku.st/info/1", "塾"))
+
+
+class TestLoadJobSink(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.loaded = []
+        self.client.load_table_from_file.side_effect = self.capture_load
+        self.staging = tempfile.TemporaryDirectory()
+        self.addCleanup(self.staging.cleanup)
+
+    def capture_load(self, file_obj, destination, job_config):
+        # ステージングファイルはロード後に削除されるため、ロード時点の内容を保持する
+        with gzip.open(file_obj, "rt", encoding="utf-8") as f:
+            self.loaded.append((destination, [json.loads(line) for line in f]))
+        return mock.Mock()
+
+    def test_rows_are_staged_until_flush(self):
+        sink = LoadJobSink(self.client, TABLE_ID, self.staging.name)
+        rows = make_rows("2024-11-01", [("https://www.juku.st/info/1", "塾"), ("https://www.juku.st/info/2", "塾")])
+        self.assertFalse(sink.write(rows[:1], "2024-11-01"))
+        self.assertFalse(sink.write(rows[1:], "2024-11-01"))
+        self.client.load_table_from_file.assert_not_called()
+
+        self.assertTrue(sink.flush("2024-11-01"))
+        self.assertEqual(self.loaded, [(TABLE_ID, rows)])
+        job_config = self.client.load_table_from_file.call_args.kwargs["job_config"]
+        self.assertEqual(job_config.write_disposition, bigquery.WriteDisposition.WRITE_APPEND)
+        self.assertEqual(list(Path(self.staging.name).iterdir()), [])
+        self.assertEqual(sink.stats.rows, 2)
+
+    def test_flush_without_rows_does_nothing(self):
+        sink = LoadJobSink(self.client, TABLE_ID, self.staging.name)
+        self.assertFalse(sink.flush("2024-11-01"))
+        self.client.load_table_from_file.assert_not_called()
+        self.client.query.assert_not_called()
+
+    def test_batch_rows_loads_within_a_date(self):
+        sink = LoadJobSink(self.client, TABLE_ID, self.staging.name, batch_rows=2)
+        keys = [("https://www.juku.st/info/1", "塾"), ("https://www.juku.st/info/2", "塾"),
+                ("https://www.juku.st/info/3", "塾")]
+        self.assertFalse(sink.write(make_rows("2024-11-01", keys[:1]), "2024-11-01"))
+        self.assertTrue(sink.write(make_rows("2024-11-01", keys[1:]), "2024-11-01"))
+        self.assertEqual(len(self.loaded[0][1]), 3)
+
+    def test_discard_drops_only_that_date(self):
+        sink = LoadJobSink(self.client, TABLE_ID, self.staging.name)
+        sink.write(make_rows("2024-11-01", [("https://www.juku.st/info/1", "塾")]), "2024-11-01")
+        sink.write(make_rows("2024-11-02", [("https://www.juku.st/info/1", "塾")]), "2024-11-02")
+        sink.discard("2024-11-01")
+        self.assertFalse(sink.flush("2024-11-01"))
+        self.assertTrue(sink.flush("2024-11-02"))
+        self.assertEqual([row["data_date"] for _, rows in self.loaded for row in rows], ["2024-11-02"])
+
+    def test_load_sink_is_resumable(self):
+        self.assertTrue(LoadJobSink(self.client, TABLE_ID, self.staging.name).resumable)
+        self.assertFalse(PartitionReplaceSink(self.client, TABLE_ID, self.staging.name).resumable)
+
+
+class TestPartitionReplaceSink(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.staging = tempfile.TemporaryDirectory()
+        self.addCleanup(self.staging.cleanup)
+        self.sink = PartitionReplaceSink(self.client, TABLE_ID, self.staging.name)
+
+    def test_flush_replaces_partition(self):
+        self.sink.write(make_rows("2024-11-01", [("https://www.juku.st/info/1", "塾")]), "2024-11-01")
+        self.assertTrue(self.sink.flush("2024-11-01"))
+        args, kwargs = self.client.load_table_from_file.call_args
+        self.assertEqual(args[1], f"{TABLE_ID}$20241101")
+        self.assertEqual(kwargs["job_config"].write_disposition, bigquery.WriteDisposition.WRITE_TRUNCATE)
+        self.client.query.assert_not_called()
+
+    def test_empty_date_truncates_partition(self):
+        # 再取得した日付が 0 件の場合も、以前の実行の行を残さない
+        self.assertTrue(self.sink.flush("2024-11-01"))
+        self.client.load_table_from_file.assert_not_called()
+        query, = self.client.query.call_args.args
+        self.assertIn(f"DELETE FROM `{TABLE_ID}` WHERE data_date = @data_date", query)
+        parameter, = self.client.query.call_args.kwargs["job_config"].query_parameters
+        self.assertEqual(str(parameter.value), "2024-11-01")
+
+
+class TestMultiSink(unittest.TestCase):
+
+    def setUp(self):
+        self.streaming = mock.Mock(resumable=True)
+        self.streaming.write.return_value = True
+        self.streaming.flush.return_value = False
+        self.staged = mock.Mock(resumable=True)
+        self.staged.write.return_value = False
+        self.staged.flush.return_value = True
+        self.sink = MultiSink([self.streaming, self.staged])
+
+    def test_write_lands_only_when_every_sink_landed(self):
+        rows = make_rows("2024-11-01", [("https://www.juku.st/info/1", "塾")])
+        self.assertFalse(self.sink.write(rows, "2024-11-01"))
+        self.assertFalse(self.sink.write(rows, "2024-11-01", "r0"))
+        self.streaming.write.assert_called_with(rows, "2024-11-01", "r0")
+        self.staged.write.assert_called_with(rows, "2024-11-01", "r0")
+
+    def test_flush_and_discard_reach_every_sink(self):
+        self.assertTrue(self.sink.flush("2024-11-01"))
+        self.sink.discard("2024-11-02")
+        for sink in (self.streaming, self.staged):
+            sink.flush.assert_called_once_with("2024-11-01")
+            sink.discard.assert_called_once_with("2024-11-02")
+
+    def test_resumable_only_when_every_sink_is(self):
+        self.assertTrue(self.sink.resumable)
+        self.staged.resumable = False
+        self.assertFalse(self.sink.resumable)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+# tests/test_date_aggregator.py
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.utils.date_aggregator import DateAggregator
+from src.utils.url_utils import aggregate_records
+
+
+def make_records(count, seed=0):
+    rnd = random.Random(seed)
+    return [
+        {
+            "keys": [f"query{rnd.randint(0, 20)}", f"https://www.juku.st/info/entry/{rnd.randint(0, 10)}?p={rnd.randint(0, 3)}"],
+            "clicks": rnd.randint(0, 5),
+            "impressions": rnd.randint(1, 50),
+            "position": rnd.random() * 20,
+        }
+        for _ in range(count)
+    ]
+
+
+def normalized(records):
+    return sorted((r["query"], r["url"], r["clicks"], r["impressions"], round(r["avg_position"], 9)) for r in records)
+
+
+class TestDateAggregator(unittest.TestCase):
+
+    def setUp(self):
+        self.records = make_records(500)
+        self.pages = [self.records[i:i + 100] for i in range(0, len(self.records), 100)]
+
+    def test_matches_whole_date_aggregation(self):
+        aggregator = DateAggregator()
+        for page in self.pages:
+            aggregator.add(page)
+        output = [record for batch in aggregator.finish() for record in batch]
+        self.assertEqual(normalized(output), normalized(aggregate_records(self.records)))
+        self.assertEqual(aggregator.spills, 0)
+
+    def test_spills_and_emits_one_row_per_key(self):
+        with tempfile.TemporaryDirectory() as spill_dir:
+            aggregator = DateAggregator(memory_limit_bytes=1, spill_dir=spill_dir, partitions=4)
+            for page in self.pages:
+                aggregator.add(page)
+            output = [record for batch in aggregator.finish() for record in batch]
+            self.assertEqual(aggregator.spills, len(self.pages))
+            self.assertEqual(normalized(output), normalized(aggregate_records(self.records)))
+            self.assertEqual(list(Path(spill_dir).iterdir()), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
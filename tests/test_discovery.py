@@ -0,0 +1,37 @@
+# tests/test_discovery.py
+import json
+import unittest
+
+from google.auth.credentials import AnonymousCredentials
+
+from src.utils import discovery
+from src.utils.discovery import DISCOVERY_DIR, build_service, load_discovery_document
+
+
+class TestDiscovery(unittest.TestCase):
+
+    def test_vendored_documents_are_parsed_once(self):
+        for name in ("searchconsole", "chat"):
+            self.assertTrue((DISCOVERY_DIR / f"{name}.v1.json").exists())
+            document = load_discovery_document(name, "v1")
+            self.assertIs(load_discovery_document(name, "v1"), document)
+            self.assertEqual(document["name"], name)
+
+    def test_build_service_without_network(self):
+        service = build_service("searchconsole", "v1", credentials=AnonymousCredentials())
+        request = service.searchanalytics().query(siteUrl="https://www.juku.st/", body={"startDate": "2024-12-01"})
+        self.assertIn("searchconsole.googleapis.com", request.uri)
+        self.assertTrue(hasattr(build_service("chat", "v1", credentials=AnonymousCredentials()), "spaces"))
+
+    def test_clients_do_not_mutate_cached_document(self):
+        # 他のテストで構築したクライアントの影響を受けないよう、解析し直したドキュメントで確認
+        discovery._documents.pop(("searchconsole", "v1"), None)
+        document = load_discovery_document("searchconsole", "v1")
+        before = json.dumps(document, sort_keys=True)
+        service = build_service("searchconsole", "v1", credentials=AnonymousCredentials())
+        service.searchanalytics().query(siteUrl="https://www.juku.st/", body={"startDate": "2024-12-01"})
+        self.assertEqual(json.dumps(document, sort_keys=True), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+# tests/test_gsc_pipeline.py
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from modules.gsc_pipeline import GSCPipeline
+from utils.quota_scheduler import QuotaExceededError
+
+
+class FakeConnector:
+    """日付ごとの件数分のレコードを返し、呼び出しを events に記録するコネクタ"""
+
+    def __init__(self, counts, landed=True, fail_at=None, quota_at=None, shards=None, fail_shard=None):
+        self.counts = counts
+        self.shards = shards or {}
+        self.fail_shard = fail_shard
+        self.landed = landed
+        self.fail_at = fail_at
+        self.quota_at = quota_at
+        self.quota = SimpleNamespace(consumed=0)
+        self.events = []
+        self.discarded = []
+        self.page_keys = []
+        self.inserted = []
+        self.buffered = {}
+        self.shard_handled = threading.Event()
+        self._lock = threading.Lock()
+
+    def _record(self, *event):
+        with self._lock:
+            self.events.append(event)
+
+    def needs_split(self, date, estimate=None):
+        return date in self.shards
+
+    def fetch_split(self, date):
+        for shard, size in enumerate(self.shards[date]):
+            if (date, shard) == self.fail_shard:
+                # 先行の shard が下流のステージで処理されてから失敗させる
+                self.shard_handled.wait(5)
+                raise RuntimeError("shard fetch failed")
+            yield [{"date": date, "index": f"{shard}-{index}"} for index in range(size)]
+
+    def buffer_records(self, records, date):
+        with self._lock:
+            self.buffered.setdefault(date, []).extend(records)
+        self.shard_handled.set()
+
+    def fetch_page(self, date, start_record, page_size):
+        if (date, start_record) == self.quota_at:
+            raise QuotaExceededError("daily quota exhausted")
+        self.quota.consumed += 1
+        total = self.counts[date]
+        records = [{"date": date, "index": index} for index in range(start_record, min(total, start_record + page_size))]
+        next_record = start_record + len(records)
+        return records, next_record, len(records) < page_size
+
+    def build_rows(self, records, date):
+        return [dict(record) for record in records]
+
+    def insert_rows(self, rows, date, page_key=None):
+        if (date, rows[0]["index"]) == self.fail_at:
+            raise RuntimeError("insert failed")
+        self.page_keys.append(page_key)
+        self.inserted.extend(rows)
+        self._record("insert", date, rows[0]["index"])
+        self.shard_handled.set()
+        return self.landed
+
+    def flush_date(self, date):
+        with self._lock:
+            rows = self.buffered.pop(date, [])
+        if rows:
+            self.insert_rows(rows, date)
+        self._record("flush", date)
+        return True
+
+    def discard_date(self, date):
+        with self._lock:
+            self.buffered.pop(date, None)
+        self.discarded.append(date)
+
+
+class TestGSCPipeline(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch("modules.gsc_pipeline.send_error_notification")
+        self.notify = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_pipeline(self, connector, dates, completed=(), start_records=None):
+        saved = []
+
+        def save_position(progress):
+            connector._record("save", progress["date"], progress["record"])
+            saved.append(progress)
+
+        pipeline = GSCPipeline(connector, lambda date: date in completed, save_position, batch_size=10, queue_size=1)
+        return pipeline.run(dates, start_records=start_records), saved
+
+    def test_pages_flow_through_all_stages(self):
+        connector = FakeConnector({"2024-11-01": 25, "2024-11-02": 10, "2024-11-03": 5})
+        results, saved = self.run_pipeline(connector, ["2024-11-01", "2024-11-02", "2024-11-03"],
+                                           completed={"2024-11-02"})
+        self.assertEqual(results, [("fetched", 25), ("skipped", 0), ("fetched", 5)])
+        self.assertEqual([(p["date"], p["record"], p["is_date_completed"]) for p in saved], [
+            ("2024-11-01", 10, False),
+            ("2024-11-01", 20, False),
+            ("2024-11-01", 25, True),
+            ("2024-11-03", 5, True),
+        ])
+        self.assertEqual(connector.discarded, [])
+        self.assertEqual(sorted(connector.page_keys), ["r0", "r0", "r10", "r20"])
+
+    def test_resumes_from_start_record(self):
+        connector = FakeConnector({"2024-11-01": 25})
+        results, saved = self.run_pipeline(connector, ["2024-11-01"], start_records={"2024-11-01": 20})
+        self.assertEqual(results, [("fetched", 5)])
+        self.assertEqual([p["record"] for p in saved], [25])
+
+    def test_progress_is_saved_only_after_rows_land(self):
+        # ロードジョブのように挿入が保留される場合は、日付の最終ページの flush 後にのみ進捗を保存する
+        connector = FakeConnector({"2024-11-01": 25}, landed=False)
+        results, saved = self.run_pipeline(connector, ["2024-11-01"])
+        self.assertEqual(results, [("fetched", 25)])
+        self.assertEqual([(p["record"], p["is_date_completed"]) for p in saved], [(25, True)])
+        self.assertEqual(connector.events[-2:], [("flush", "2024-11-01"), ("save", "2024-11-01", 25)])
+
+    def test_each_save_follows_its_insert(self):
+        connector = FakeConnector({"2024-11-01": 35, "2024-11-02": 15})
+        self.run_pipeline(connector, ["2024-11-01", "2024-11-02"])
+        for position, event in enumerate(connector.events):
+            if event[0] == "save":
+                _, date, record = event
+                start = record - 1 - (record - 1) % 10
+                self.assertIn(("insert", date, start), connector.events[:position])
+
+    def test_failed_date_stops_its_later_pages_only(self):
+        connector = FakeConnector({"2024-11-01": 35, "2024-11-02": 15}, fail_at=("2024-11-01", 10))
+        results, saved = self.run_pipeline(connector, ["2024-11-01", "2024-11-02"])
+        self.assertEqual(results[0][0], "incomplete")
+        self.assertEqual(results[1], ("fetched", 15))
+        self.assertEqual([(p["date"], p["record"]) for p in saved if p["date"] == "2024-11-01"], [("2024-11-01", 10)])
+        self.assertNotIn(("insert", "2024-11-01", 20), connector.events)
+        self.assertIn("2024-11-01", connector.discarded)
+        self.notify.assert_called_once()
+
+    def test_failed_split_date_inserts_nothing_until_rerun(self):
+        # shard 1 の取得後に失敗した日付を再実行しても、同じ行が2度挿入されない
+        connector = FakeConnector({}, shards={"2024-11-01": [10, 10, 5]}, fail_shard=("2024-11-01", 1))
+        results, saved = self.run_pipeline(connector, ["2024-11-01"])
+        self.assertEqual(results[0][0], "incomplete")
+        self.assertEqual(saved, [])
+        self.assertEqual(connector.inserted, [])
+
+        connector.fail_shard = None
+        results, saved = self.run_pipeline(connector, ["2024-11-01"])
+        self.assertEqual(results, [("fetched", 25)])
+        self.assertEqual(saved, [{"date": "2024-11-01", "record": 25, "is_date_completed": True}])
+        indexes = [row["index"] for row in connector.inserted]
+        self.assertEqual(len(indexes), 25)
+        self.assertEqual(len(set(indexes)), 25)
+
+    def test_quota_exhaustion_stops_all_stages(self):
+        connector = FakeConnector({"2024-11-01": 15, "2024-11-02": 15, "2024-11-03": 15},
+                                  quota_at=("2024-11-02", 10))
+        results, saved = self.run_pipeline(connector, ["2024-11-01", "2024-11-02", "2024-11-03"])
+        self.assertEqual(results, [("fetched", 15), ("incomplete", 10), ("incomplete", 0)])
+        self.assertEqual(saved[-1], {"date": "2024-11-02", "record": 10, "is_date_completed": False})
+        self.assertEqual(connector.discarded, ["2024-11-02", "2024-11-03"])
+        self.notify.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
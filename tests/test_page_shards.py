@@ -0,0 +1,63 @@
+# tests/test_page_shards.py
+import re
+import unittest
+
+from src.utils.page_shards import ROOT_SHARD, child_key, split_shard, filter_groups
+
+
+def matches(shard, url):
+    for f in shard.filters:
+        if f["dimension"] != "page":
+            continue
+        ok = {
+            "equals": url == f["expression"],
+            "notEquals": url != f["expression"],
+            "includingRegex": re.search(f["expression"], url) is not None,
+            "excludingRegex": re.search(f["expression"], url) is None,
+        }[f["operator"]]
+        if not ok:
+            return False
+    return True
+
+
+class TestPageShards(unittest.TestCase):
+
+    def setUp(self):
+        self.pages = [f"https://www.juku.st/info/entry/{i}" for i in range(40)] + [
+            "https://www.juku.st/",
+            "https://www.juku.st/blog/a.html",
+            "https://www.juku.st/blog/",
+            "https://www.juku.st/school?id=1",
+        ]
+
+    def test_child_key(self):
+        self.assertEqual(child_key("https://www.juku.st/info/entry/1", ""), "https://www.juku.st/info/")
+        self.assertEqual(child_key("https://www.juku.st/info/entry/1", "https://www.juku.st/info/"),
+                         "https://www.juku.st/info/entry/")
+        self.assertEqual(child_key("https://www.juku.st/school?id=1", ""), "https://www.juku.st/school?id=1")
+
+    def test_split_is_disjoint_and_covers_every_page(self):
+        shards = split_shard(ROOT_SHARD, self.pages, fanout=3)
+        self.assertEqual(shards[-1].kind, "rest")
+        for url in self.pages + ["https://www.juku.st/unlisted/page"]:
+            self.assertEqual(sum(matches(shard, url) for shard in shards), 1, url)
+
+        # 上限に達した子をさらに分割しても、親の範囲内で重ならない
+        info = next(shard for shard in shards if matches(shard, self.pages[0]))
+        children = split_shard(info, [url for url in self.pages if matches(info, url)], fanout=4)
+        for url in self.pages:
+            expected = 1 if matches(info, url) else 0
+            self.assertEqual(sum(matches(child, url) for child in children), expected, url)
+
+    def test_single_page_splits_by_device(self):
+        page = split_shard(ROOT_SHARD, ["https://www.juku.st/"], fanout=2)[0]
+        self.assertEqual(page.kind, "page")
+        devices = split_shard(page, [])
+        self.assertEqual([shard.filters[-1]["expression"] for shard in devices], ["DESKTOP", "MOBILE", "TABLET"])
+        self.assertEqual(split_shard(devices[0], []), [])
+        self.assertEqual(filter_groups(devices[0])[0]["filters"][0]["operator"], "equals")
+        self.assertIsNone(filter_groups(ROOT_SHARD))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+# tests/test_progress_store.py
+import datetime
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from modules.progress_store import ProgressSnapshot, get_processing_positions, get_start_records
+
+DAY1, DAY2, DAY3, DAY4 = (datetime.date(2024, 11, day) for day in range(1, 5))
+
+
+class FakeConfig:
+    values = {"PROJECT_ID": "project", "DATASET_ID": "dataset", "PROGRESS_TABLE_ID": "T_progress_tracking"}
+
+    def get_config_value(self, section, key, default=None):
+        return self.values.get(key, default)
+
+
+class TestGetProcessingPositions(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        patcher = mock.patch("modules.progress_store.get_bigquery_client", return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_positions_are_read_in_one_query(self):
+        self.client.query.return_value.result.return_value = [
+            SimpleNamespace(data_date=DAY1, record_position=25000, is_date_completed=True),
+            SimpleNamespace(data_date=DAY2, record_position=500, is_date_completed=False),
+        ]
+        positions = get_processing_positions(FakeConfig(), [DAY1, DAY2, DAY3])
+        self.assertEqual(positions, {
+            DAY1: {"record": 25000, "is_date_completed": True},
+            DAY2: {"record": 500, "is_date_completed": False},
+        })
+        self.client.query.assert_called_once()
+        query = self.client.query.call_args.args[0]
+        self.assertIn("`project.dataset.T_progress_tracking`", query)
+        self.assertIn("ORDER BY updated_at DESC", query)
+        # 完了判定も最新の行から取得する
+        self.assertIn("STRUCT(record_position, is_date_completed)", query)
+        self.assertIn("[OFFSET(0)] AS latest", query)
+        self.assertNotIn("LOGICAL_OR", query)
+        parameter, = self.client.query.call_args.kwargs["job_config"].query_parameters
+        self.assertEqual(parameter.values, [DAY1, DAY2, DAY3])
+
+    def test_empty_date_list_skips_query(self):
+        self.assertEqual(get_processing_positions(FakeConfig(), []), {})
+        self.client.query.assert_not_called()
+
+    def test_query_error_returns_empty(self):
+        self.client.query.side_effect = RuntimeError("query failed")
+        self.assertEqual(get_processing_positions(FakeConfig(), [DAY1]), {})
+
+
+class TestProgressSnapshot(unittest.TestCase):
+
+    def snapshot(self):
+        return ProgressSnapshot(FakeConfig(), {
+            DAY1: {"record": 25000, "is_date_completed": True},
+            DAY2: {"record": 500, "is_date_completed": False},
+            DAY3: {"record": 0, "is_date_completed": True},
+        })
+
+    def test_completion_and_counts(self):
+        snapshot = self.snapshot()
+        self.assertTrue(snapshot.is_completed(DAY1))
+        self.assertFalse(snapshot.is_completed(DAY2))
+        self.assertFalse(snapshot.is_completed(DAY4))
+        self.assertIsNone(snapshot.position(DAY4))
+        # record 0 で完了した日付は行数が分からないため除外
+        self.assertEqual(snapshot.completed_counts(), {DAY1: 25000})
+
+    @mock.patch("modules.progress_store.save_processing_position")
+    def test_save_updates_snapshot(self, save_processing_position):
+        snapshot = self.snapshot()
+        snapshot.save({"date": DAY2, "record": 1000, "is_date_completed": True})
+        self.assertEqual(save_processing_position.call_count, 1)
+        self.assertEqual(snapshot.position(DAY2), {"record": 1000, "is_date_completed": True})
+        self.assertTrue(snapshot.is_completed(DAY2))
+
+    @mock.patch("modules.progress_store.save_processing_position")
+    def test_restarted_and_interrupted_date_is_incomplete(self, _):
+        # 完了 → 強制再取得 → 途中で中断 の日付は、次回の実行で未完了として中断位置から再開する
+        snapshot = self.snapshot()
+        snapshot.save({"date": DAY1, "record": 0, "is_date_completed": False})
+        snapshot.save({"date": DAY1, "record": 10000, "is_date_completed": False})
+        self.assertFalse(snapshot.is_completed(DAY1))
+        self.assertEqual(snapshot.completed_counts(), {})
+        self.assertEqual(get_start_records(snapshot, [DAY1], restart_dates=set()), {DAY1: 10000})
+
+    @mock.patch("modules.progress_store.save_processing_position", side_effect=RuntimeError("insert failed"))
+    def test_failed_save_keeps_snapshot(self, _):
+        snapshot = self.snapshot()
+        with self.assertRaises(RuntimeError):
+            snapshot.save({"date": DAY2, "record": 1000, "is_date_completed": False})
+        self.assertEqual(snapshot.position(DAY2), {"record": 500, "is_date_completed": False})
+
+
+class TestGetStartRecords(unittest.TestCase):
+
+    def setUp(self):
+        self.progress = ProgressSnapshot(FakeConfig(), {
+            DAY1: {"record": 25000, "is_date_completed": True},
+            DAY2: {"record": 500, "is_date_completed": False},
+            DAY3: {"record": 700, "is_date_completed": False},
+        })
+
+    def test_incomplete_dates_resume_from_saved_position(self):
+        start_records = get_start_records(self.progress, [DAY1, DAY2, DAY3, DAY4], restart_dates={DAY3})
+        self.assertEqual(start_records, {DAY1: 0, DAY2: 500, DAY3: 0, DAY4: 0})
+
+    def test_non_resumable_sink_restarts_every_date(self):
+        start_records = get_start_records(self.progress, [DAY2, DAY3], restart_dates=set(), resumable=False)
+        self.assertEqual(start_records, {DAY2: 0, DAY3: 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+# tests/test_property_config.py
+import configparser
+import logging
+import unittest
+from pathlib import Path
+
+from src.utils.gsc_settings import load_gsc_settings
+from src.utils.property_config import PropertyConfig, load_properties
+
+SETTINGS = """
+[GSC]
+site_url = https://www.juku.st/
+batch_size = 25000
+retry_count = 5
+retry_delay = 10
+daily_api_limit = 2000
+metrics = clicks,impressions
+dimensions = query,page
+properties = media, shop
+
+[GSC_INITIAL]
+initial_run = false
+
+[GSC_DAILY]
+initial_fetch_days = 7
+daily_fetch_days = 3
+
+[BIGQUERY]
+project_id = bigquery-jukust
+dataset_id = past_gsc_202411
+table_id = T_searchdata_site_impression
+progress_table_id = T_progress_tracking
+
+[GSC_QUOTA]
+ledger_path = data/gsc_quota_ledger.json
+reserve_block = 50
+
+[GSC_CACHE]
+mode = off
+
+[GSC_PROPERTY_MEDIA]
+site_url = https://media.juku.st/
+table_id = T_searchdata_media
+daily_api_limit = 100
+batch_size = 5000
+split_row_cap = 50000
+pipeline_mode = true
+mode = readwrite
+
+[GSC_PROPERTY_SHOP]
+site_url = https://shop.juku.st/
+table_id = T_searchdata_shop
+progress_table_id = T_progress_shop
+ledger_path = data/shop_ledger.json
+"""
+
+
+class StubConfig:
+    """settings.ini の文字列から生成する共有 Config の代わり"""
+
+    def __init__(self, text=SETTINGS):
+        self.config = configparser.ConfigParser()
+        self.config.read_string(text)
+        self.logger = logging.getLogger(__name__)
+        self.base_path = Path("/srv/bigquery_gsc")
+        self.gsc_settings = load_gsc_settings(self.config, self.base_path)
+
+    def get_config_value(self, section, key, default=None):
+        return self.config[section].get(key, default) if self.config.has_section(section) else default
+
+
+class TestPropertyConfig(unittest.TestCase):
+
+    def setUp(self):
+        self.base = StubConfig()
+        self.media, self.shop = load_properties(self.base, self.base.config)
+
+    def test_properties_are_loaded_in_order(self):
+        self.assertEqual([prop.name for prop in (self.media, self.shop)], ["media", "shop"])
+        self.assertIsInstance(self.media, PropertyConfig)
+
+    def test_no_properties(self):
+        base = StubConfig(SETTINGS.replace("properties = media, shop", "properties ="))
+        self.assertEqual(load_properties(base, base.config), [])
+
+    def test_missing_section_or_table_id_raises(self):
+        base = StubConfig(SETTINGS.replace("properties = media, shop", "properties = media, blog"))
+        with self.assertRaises(KeyError):
+            load_properties(base, base.config)
+        base = StubConfig(SETTINGS.replace("table_id = T_searchdata_media\n", ""))
+        with self.assertRaises(KeyError):
+            load_properties(base, base.config)
+
+    def test_gsc_settings_override_site_and_limit(self):
+        self.assertEqual(self.media.gsc_settings['url'], "https://media.juku.st/")
+        self.assertEqual(self.media.gsc_settings['daily_api_limit'], 100)
+        # 上限を指定しないプロパティは共有の上限を使用
+        self.assertEqual(self.shop.gsc_settings['daily_api_limit'], 2000)
+        self.assertEqual(self.base.gsc_settings['url'], "https://www.juku.st/")
+
+    def test_gsc_settings_override_any_gsc_key(self):
+        # [GSC] のキーはすべて、共有の設定と同じ型変換で上書きできる
+        self.assertEqual(self.media.gsc_settings['batch_size'], 5000)
+        self.assertEqual(self.media.gsc_settings['split_row_cap'], 50000)
+        self.assertIs(self.media.gsc_settings['pipeline_mode'], True)
+        self.assertEqual(self.media.gsc_settings['metrics'], ["clicks", "impressions"])
+        self.assertEqual(self.shop.gsc_settings['batch_size'], 25000)
+        self.assertEqual(self.shop.gsc_settings['split_row_cap'], 0)
+        self.assertIs(self.shop.gsc_settings['pipeline_mode'], False)
+        self.assertEqual(self.base.gsc_settings['batch_size'], 25000)
+
+    def test_invalid_override_raises(self):
+        base = StubConfig(SETTINGS.replace("batch_size = 5000", "batch_size = many"))
+        with self.assertRaises(ValueError):
+            load_properties(base, base.config)
+
+    def test_config_value_fallback_order(self):
+        # プロパティのセクション → プロパティごとの既定値 → 共有の設定 の順
+        self.assertEqual(self.media.get_config_value('BIGQUERY', 'TABLE_ID'), "T_searchdata_media")
+        self.assertEqual(self.media.get_config_value('BIGQUERY', 'PROGRESS_TABLE_ID'), "T_progress_tracking_media")
+        self.assertEqual(self.shop.get_config_value('BIGQUERY', 'PROGRESS_TABLE_ID'), "T_progress_shop")
+        self.assertEqual(self.media.get_config_value('GSC_QUOTA', 'LEDGER_PATH'), "data/gsc_quota_ledger_media.json")
+        self.assertEqual(self.shop.get_config_value('GSC_QUOTA', 'LEDGER_PATH'), "data/shop_ledger.json")
+        self.assertEqual(self.media.get_config_value('GSC_QUOTA', 'RESERVE_BLOCK'), "50")
+        self.assertEqual(self.media.get_config_value('BIGQUERY', 'WRITE_MODE', 'APPEND'), "APPEND")
+
+    def test_other_sections_are_not_overridden(self):
+        # [GSC] / [BIGQUERY] / [GSC_QUOTA] 以外のキーはプロパティのセクションに書いても共有の設定を使用
+        self.assertEqual(self.media.get_config_value('GSC_CACHE', 'MODE'), "off")
+
+    def test_progress_table_id_and_delegation(self):
+        self.assertEqual(self.media.progress_table_id, "bigquery-jukust.past_gsc_202411.T_progress_tracking_media")
+        self.assertEqual(self.media.base_path, self.base.base_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
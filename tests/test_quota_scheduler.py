@@ -0,0 +1,188 @@
+# tests/test_quota_scheduler.py
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from src.utils.quota_scheduler import FileQuotaLedger, QuotaExceededError, QuotaScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestQuotaScheduler(unittest.TestCase):
+
+    def _scheduler(self, clock, per_second=2, per_minute=100, per_day=1000, ledger=None, reserve_block=10,
+                   day_key_func=lambda: "2024-12-01"):
+        return QuotaScheduler(per_second, per_minute, per_day, ledger=ledger, reserve_block=reserve_block,
+                              clock=clock, sleep=clock.sleep, day_key_func=day_key_func)
+
+    def test_per_second_limit_waits(self):
+        clock = FakeClock()
+        scheduler = self._scheduler(clock)
+        for _ in range(6):
+            scheduler.acquire()
+        # 2回/秒 → 最初の2回は即時、残り4回で2秒待機
+        self.assertAlmostEqual(clock.now, 2.0)
+        self.assertEqual(scheduler.consumed, 6)
+
+    def test_daily_limit_raises(self):
+        clock = FakeClock()
+        scheduler = self._scheduler(clock, per_second=100, per_day=3, reserve_block=2)
+        for _ in range(3):
+            scheduler.acquire()
+        with self.assertRaises(QuotaExceededError):
+            scheduler.acquire()
+
+    def test_ledger_is_shared_across_runs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "ledger.json"
+            clock = FakeClock()
+            first = self._scheduler(clock, per_second=100, per_day=5, ledger=FileQuotaLedger(path), reserve_block=4)
+            for _ in range(3):
+                first.acquire()
+            first.close()
+            self.assertEqual(FileQuotaLedger(path).used("2024-12-01"), 3)
+
+            second = self._scheduler(clock, per_second=100, per_day=5, ledger=FileQuotaLedger(path), reserve_block=4)
+            second.acquire()
+            second.acquire()
+            with self.assertRaises(QuotaExceededError):
+                second.acquire()
+            second.close()
+            self.assertEqual(FileQuotaLedger(path).used("2024-12-01"), 5)
+
+    def test_next_block_is_reserved_before_running_out(self):
+        clock = FakeClock()
+        ledger = CountingLedger()
+        scheduler = self._scheduler(clock, per_second=100, ledger=ledger, reserve_block=4)
+        for _ in range(3):
+            scheduler.acquire()
+        # 4回分を予約 → 残りが2回（ブロックの半分）になった時点で次の4回分を先行予約
+        self.assertEqual(ledger.requests, [4, 4])
+        scheduler.close()
+        self.assertEqual(ledger.used("2024-12-01"), 3)
+
+    def test_ledger_reserve_runs_outside_lock(self):
+        clock = FakeClock()
+        ledger = CountingLedger()
+        scheduler = self._scheduler(clock, per_second=100, ledger=ledger, reserve_block=4)
+        locked_during_reserve = []
+        ledger.on_reserve = lambda: locked_during_reserve.append(scheduler._lock._is_owned())
+        threads = [threading.Thread(target=lambda: [scheduler.acquire() for _ in range(5)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        scheduler.close()
+        self.assertFalse(any(locked_during_reserve))
+        self.assertEqual(scheduler.consumed, 20)
+        self.assertEqual(ledger.used("2024-12-01"), 20)
+
+    def test_ledger_release_runs_outside_lock(self):
+        clock = FakeClock()
+        ledger = CountingLedger()
+        day = ["2024-12-01"]
+        scheduler = self._scheduler(clock, per_second=100, ledger=ledger, reserve_block=4, day_key_func=lambda: day[0])
+        locked_during_release = []
+        ledger.on_release = lambda: locked_during_release.append(scheduler._lock._is_owned())
+        scheduler.acquire()
+        # 日付の切り替え時に前日の未使用分を返却
+        day[0] = "2024-12-02"
+        scheduler.acquire()
+        scheduler.close()
+        self.assertEqual(locked_during_release, [False, False])
+        self.assertEqual(ledger.used("2024-12-01"), 1)
+        self.assertEqual(ledger.used("2024-12-02"), 1)
+
+    def test_ledger_error_is_retried_with_backoff(self):
+        clock = FakeClock()
+        ledger = CountingLedger()
+        ledger.failures = 2
+        scheduler = self._scheduler(clock, per_second=100, ledger=ledger, reserve_block=4)
+        # 台帳のエラーは上限到達とはみなさず、1秒・2秒の待機後に予約し直す
+        scheduler.acquire()
+        self.assertEqual(clock.now, 3.0)
+        self.assertEqual(scheduler.consumed, 1)
+        self.assertFalse(scheduler._exhausted)
+
+    def test_persistent_ledger_error_is_raised(self):
+        clock = FakeClock()
+        ledger = CountingLedger()
+        ledger.failures = QuotaScheduler.LEDGER_RETRIES
+        scheduler = self._scheduler(clock, per_second=100, ledger=ledger, reserve_block=4)
+        with self.assertRaises(ConnectionError):
+            scheduler.acquire()
+        self.assertFalse(scheduler._exhausted)
+        self.assertFalse(scheduler._reserving)
+        # 台帳が復旧すれば同じスケジューラで取得を続けられる
+        scheduler.acquire()
+        self.assertEqual(scheduler.consumed, 1)
+
+
+class TestFromConfig(unittest.TestCase):
+
+    def config(self, ledger):
+        values = {"LEDGER": ledger, "LEDGER_PATH": "data/gsc_quota_ledger.json"}
+        return SimpleNamespace(
+            base_path=Path(tempfile.gettempdir()),
+            gsc_settings={"daily_api_limit": 100, "url": "https://www.juku.st/"},
+            get_config_value=lambda section, key, default=None: values.get(key, default),
+        )
+
+    def test_default_ledger_is_file_outside_cloud_run(self):
+        with mock.patch.dict(os.environ, clear=True):
+            scheduler = QuotaScheduler.from_config(self.config(""))
+        self.assertIsInstance(scheduler.ledger, FileQuotaLedger)
+
+    def test_default_ledger_is_bigquery_on_cloud_run(self):
+        # Cloud Run では実行ごとにファイルシステムが破棄されるため、既定の台帳は BigQuery
+        with mock.patch.dict(os.environ, {"CLOUD_RUN_JOB": "bigquery-gsc"}, clear=True), \
+                mock.patch("src.utils.bigquery_quota_ledger.BigQueryQuotaLedger") as ledger_class:
+            scheduler = QuotaScheduler.from_config(self.config(""))
+        self.assertIs(scheduler.ledger, ledger_class.return_value)
+
+
+class CountingLedger:
+    """予約の要求回数を記録するメモリ上の台帳"""
+
+    def __init__(self):
+        self.requests = []
+        self.on_reserve = None
+        self.on_release = None
+        self.failures = 0
+        self._used = {}
+
+    def used(self, day_key):
+        return self._used.get(day_key, 0)
+
+    def reserve(self, day_key, requested, limit):
+        if self.on_reserve:
+            self.on_reserve()
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("ledger unavailable")
+        self.requests.append(requested)
+        granted = max(0, min(requested, limit - self.used(day_key)))
+        self._used[day_key] = self.used(day_key) + granted
+        return granted
+
+    def release(self, day_key, amount):
+        if self.on_release:
+            self.on_release()
+        self._used[day_key] = self.used(day_key) - amount
+
+
+if __name__ == '__main__':
+    unittest.main()
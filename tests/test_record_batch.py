@@ -0,0 +1,85 @@
+# tests/test_record_batch.py
+import random
+import unittest
+from unittest import mock
+
+from src.utils import record_batch
+from src.utils.record_batch import RecordBatch
+from src.utils.date_aggregator import DateAggregator
+from src.utils.parallel_aggregate import ParallelAggregator
+from src.utils.string_dictionary import StringDictionary
+from src.utils.url_utils import aggregate_records, aggregate_records_python
+
+
+def make_rows(count, seed=0):
+    rnd = random.Random(seed)
+    return [
+        {
+            "keys": [f"query{rnd.randint(0, 30)}", f"https://www.juku.st/info/entry/{rnd.randint(0, 10)}?p={rnd.randint(0, 3)}"],
+            "clicks": rnd.randint(0, 5),
+            "impressions": rnd.randint(1, 100),
+            "ctr": 0.1,
+            "position": rnd.random() * 20,
+        }
+        for _ in range(count)
+    ]
+
+
+def comparable(records):
+    return [(r["query"], r["url"], r["clicks"], r["impressions"], round(r["avg_position"], 9)) for r in records]
+
+
+class TestRecordBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = make_rows(1000)
+        self.batch = RecordBatch.from_rows(self.rows)
+
+    def test_interns_strings_and_round_trips(self):
+        self.assertEqual(len(self.batch), len(self.rows))
+        self.assertLessEqual(len(self.batch.urls), 44)
+        self.assertEqual(self.batch.to_records()[5]["keys"], self.rows[5]["keys"])
+        self.assertEqual(self.batch.to_records()[5]["position"], self.rows[5]["position"])
+
+    def test_aggregate_matches_dict_implementation(self):
+        expected = comparable(aggregate_records_python(self.rows))
+        self.assertEqual(comparable(aggregate_records(self.batch)), expected)
+        with mock.patch.object(record_batch, "PANDAS_MIN_RECORDS", 0):
+            self.assertEqual(comparable(aggregate_records(self.batch)), expected)
+
+    def test_date_aggregator_accepts_batches(self):
+        aggregator = DateAggregator()
+        for i in range(0, len(self.rows), 250):
+            aggregator.add(RecordBatch.from_rows(self.rows[i:i + 250]))
+        output = [record for batch in aggregator.finish() for record in batch]
+        self.assertEqual(sorted(comparable(output)), sorted(comparable(aggregate_records_python(self.rows))))
+
+    def test_shared_dictionaries_intern_across_batches(self):
+        queries, urls = StringDictionary("query"), StringDictionary("url")
+        # JSON から復元した場合と同様に、同じ内容でも別オブジェクトの文字列を使用
+        first = RecordBatch.from_rows(make_rows(200, seed=1), queries, urls)
+        second = RecordBatch.from_rows([dict(row, keys=["".join(row["keys"][0]), "".join(row["keys"][1])])
+                                        for row in make_rows(200, seed=1)], queries, urls)
+        self.assertEqual(list(first.query_ids), list(second.query_ids))
+        self.assertLessEqual(len(queries), 31)
+        self.assertGreater(queries.stats()["bytes_saved"], 0)
+
+        records = aggregate_records(second, include_ids=True)
+        for record in records:
+            self.assertIs(record["query"], queries.decode(record["query_id"]))
+            self.assertIs(record["url"], urls.decode(record["url_id"]))
+        self.assertEqual(comparable(records), comparable(aggregate_records_python(make_rows(200, seed=1))))
+
+    def test_parallel_aggregate_matches_sequential_output(self):
+        pool = ParallelAggregator(3, min_records=0)
+        try:
+            records = aggregate_records(self.batch, include_state=True, pool=pool)
+            # マルチスレッドのプロセスから fork しない
+            self.assertNotEqual(pool._executor._mp_context.get_start_method(), "fork")
+        finally:
+            pool.close()
+        self.assertEqual(records, aggregate_records_python(self.rows, include_state=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+# tests/test_request_planner.py
+import unittest
+from datetime import date, timedelta
+
+from src.utils.request_planner import estimate_rows, plan_date_ranges, split_decision
+
+
+class TestPlanDateRanges(unittest.TestCase):
+
+    def setUp(self):
+        self.dates = [date(2024, 11, 1) + timedelta(days=i) for i in range(6)]
+
+    def test_groups_consecutive_low_volume_dates(self):
+        # 履歴は木曜日のみ（対象の金〜水曜日はすべての履歴の中央値で推定）
+        estimates = estimate_rows({date(2024, 10, 24): 100, date(2024, 10, 31): 300}, self.dates)
+        self.assertEqual(set(estimates.values()), {200})
+        ranges = plan_date_ranges(list(reversed(self.dates)), estimates, max_rows=500, max_days=7)
+        self.assertEqual(ranges, [self.dates[0:2], self.dates[2:4], self.dates[4:6]])
+        self.assertEqual(len(plan_date_ranges(self.dates, estimates, max_rows=10000, max_days=4)), 2)
+
+    def test_gaps_and_unknown_volumes_are_not_grouped(self):
+        dates = self.dates[:2] + self.dates[3:]
+        self.assertEqual(plan_date_ranges(dates, dict.fromkeys(dates, 1), 100, 7), [dates[:2], dates[2:]])
+        self.assertEqual(plan_date_ranges(self.dates, estimate_rows({}, self.dates), 100, 7),
+                         [[current_date] for current_date in self.dates])
+
+
+
+class TestVolumeEstimates(unittest.TestCase):
+
+    def test_weekday_median_and_split_decision(self):
+        # 平日 40,000 行・週末 5,000 行の履歴（2024-10-05 は土曜日）
+        history = {
+            date(2024, 10, 5) + timedelta(days=i): 5000 if (date(2024, 10, 5) + timedelta(days=i)).weekday() >= 5 else 40000
+            for i in range(21)
+        }
+        saturday, monday = date(2024, 11, 2), date(2024, 11, 4)
+        estimates = estimate_rows({**history, monday: 60000}, [saturday, date(2024, 11, 1), monday])
+        self.assertEqual(estimates, {saturday: 5000, date(2024, 11, 1): 40000, monday: 60000})
+
+        self.assertEqual([split_decision(estimates[d], 50000) for d in (saturday, date(2024, 11, 1), monday)],
+                         ["none", "probe", "split"])
+        self.assertEqual(split_decision(None, 50000), "probe")
+
+
+if __name__ == '__main__':
+    unittest.main()
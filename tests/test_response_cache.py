@@ -0,0 +1,96 @@
+# tests/test_response_cache.py
+import os
+import tempfile
+import time
+import unittest
+import zlib
+from pathlib import Path
+from unittest import mock
+
+from src.utils import response_cache
+from src.utils.response_cache import GSCResponseCache
+
+SITE_URL = "https://www.juku.st/"
+
+
+def make_body(start_row=0):
+    return {'startDate': '2024-12-01', 'endDate': '2024-12-01', 'dimensions': ['query', 'page'],
+            'rowLimit': 25000, 'startRow': start_row}
+
+
+class TestGSCResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_round_trip(self):
+        cache = GSCResponseCache(self.cache_dir)
+        response = {'rows': [{'keys': ['query1', 'https://www.juku.st/info/entry/843'], 'clicks': 1,
+                              'impressions': 10, 'position': 2.5}]}
+        self.assertIsNone(cache.get(SITE_URL, make_body()))
+        cache.put(SITE_URL, make_body(), response)
+        self.assertEqual(cache.get(SITE_URL, make_body()), response)
+        # キーはリクエスト内容で決まり、startRow が異なれば別エントリ
+        self.assertIsNone(cache.get(SITE_URL, make_body(start_row=25000)))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_key_ignores_dict_order(self):
+        body = make_body()
+        reordered = dict(reversed(list(body.items())))
+        self.assertEqual(GSCResponseCache.make_key(SITE_URL, body), GSCResponseCache.make_key(SITE_URL, reordered))
+
+    def test_offline_mode_does_not_write(self):
+        GSCResponseCache(self.cache_dir).put(SITE_URL, make_body(), {'rows': []})
+        offline = GSCResponseCache(self.cache_dir, mode="offline")
+        offline.put(SITE_URL, make_body(start_row=1), {'rows': []})
+        self.assertEqual(offline.get(SITE_URL, make_body()), {'rows': []})
+        self.assertIsNone(offline.get(SITE_URL, make_body(start_row=1)))
+
+    def test_evicts_oldest_entries_over_size_limit(self):
+        cache = GSCResponseCache(self.cache_dir)
+        response = {'rows': [{'keys': [f'query{i}', f'https://www.juku.st/{i}']} for i in range(50)]}
+        for start_row in range(3):
+            cache.put(SITE_URL, make_body(start_row), response)
+        paths = sorted(self.cache_dir.glob("*/*.gscz"))
+        for age, path in enumerate(paths):
+            os.utime(path, (time.time() - 100 + age, time.time() - 100 + age))
+
+        cache.max_bytes = sum(path.stat().st_size for path in paths[1:])
+        cache.evict()
+        self.assertEqual(sorted(self.cache_dir.glob("*/*.gscz")), paths[1:])
+
+    def test_expired_entries_are_ignored(self):
+        cache = GSCResponseCache(self.cache_dir, max_age_days=1)
+        with mock.patch.object(response_cache.time, "time", return_value=time.time() - 2 * 86400):
+            cache.put(SITE_URL, make_body(), {'rows': []})
+        self.assertIsNone(cache.get(SITE_URL, make_body()))
+
+    def test_age_is_measured_from_fetch_not_last_read(self):
+        cache = GSCResponseCache(self.cache_dir, max_age_days=1)
+        fetched = time.time()
+        cache.put(SITE_URL, make_body(), {'rows': []})
+        # 読み込みのたびに更新時刻は新しくなるが、期限は取得時刻から数える
+        with mock.patch.object(response_cache.time, "time", return_value=fetched + 0.5 * 86400):
+            self.assertEqual(cache.get(SITE_URL, make_body()), {'rows': []})
+        with mock.patch.object(response_cache.time, "time", return_value=fetched + 1.5 * 86400):
+            self.assertIsNone(cache.get(SITE_URL, make_body()))
+            cache.evict()
+        self.assertEqual(list(self.cache_dir.glob("*/*.gscz")), [])
+
+    def test_reads_version_1_entries_using_mtime(self):
+        cache = GSCResponseCache(self.cache_dir, max_age_days=1)
+        path = cache._path(cache.make_key(SITE_URL, make_body()))
+        path.parent.mkdir(parents=True)
+        path.write_bytes(b"GSCZ\x01" + zlib.compress(b'{"rows":[]}'))
+        self.assertEqual(cache.get(SITE_URL, make_body()), {'rows': []})
+        old = time.time() - 2 * 86400
+        os.utime(path, (old, old))
+        self.assertIsNone(cache.get(SITE_URL, make_body()))
+
+
+if __name__ == '__main__':
+    unittest.main()
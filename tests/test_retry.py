@@ -0,0 +1,73 @@
+# tests/test_retry.py
+import json
+import logging
+import unittest
+from unittest import mock
+
+from src.utils.retry import (
+    split_rows_into_chunks, insert_rows_chunked, insert_rows_with_retry, PermanentInsertError
+)
+
+
+def make_rows(count):
+    return [{"query": f"query{i}", "url": f"https://www.juku.st/info/entry/{i}", "clicks": i} for i in range(count)]
+
+
+class TestChunkedInsert(unittest.TestCase):
+
+    def test_split_respects_row_limit(self):
+        chunks = split_rows_into_chunks(make_rows(25), max_rows=10, max_bytes=10 ** 6)
+        self.assertEqual([len(chunk) for chunk, _ in chunks], [10, 10, 5])
+
+    def test_split_respects_byte_limit(self):
+        rows = make_rows(20)
+        row_bytes = max(len(json.dumps(row).encode("utf-8")) + 1 for row in rows)
+        chunks = split_rows_into_chunks(rows, max_rows=1000, max_bytes=row_bytes * 3)
+        self.assertTrue(all(size <= row_bytes * 3 for _, size in chunks))
+        self.assertEqual([row for chunk, _ in chunks for row in chunk], rows)
+
+    def test_only_failed_chunk_is_retried(self):
+        client = mock.Mock()
+        calls = []
+
+        def insert_rows_json(table_id, rows, **kwargs):
+            calls.append(rows[0]["query"])
+            # 2番目のチャンクのみ初回失敗
+            if rows[0]["query"] == "query10" and calls.count("query10") == 1:
+                return [{"index": 0, "errors": [{"reason": "backendError"}]}]
+            return []
+
+        client.insert_rows_json.side_effect = insert_rows_json
+        with mock.patch("src.utils.retry.time.sleep"):
+            insert_rows_chunked(client, "p.d.t", make_rows(30), logging.getLogger(__name__),
+                                max_rows=10, max_bytes=10 ** 6, max_workers=2)
+        self.assertEqual(sorted(calls), ["query0", "query10", "query10", "query20"])
+
+
+class TestInsertRowsWithRetry(unittest.TestCase):
+
+    def test_only_rejected_rows_are_resubmitted(self):
+        client = mock.Mock()
+        client.insert_rows_json.side_effect = [
+            [{"index": 1, "errors": [{"reason": "backendError"}]},
+             {"index": 3, "errors": [{"reason": "stopped"}]}],
+            [],
+        ]
+        rows = make_rows(5)
+        with mock.patch("src.utils.retry.time.sleep") as sleep:
+            insert_rows_with_retry(client, "p.d.t", rows, logging.getLogger(__name__), max_delay=4)
+        self.assertEqual(client.insert_rows_json.call_args_list[1].args[1], [rows[1], rows[3]])
+        self.assertLessEqual(sleep.call_args.args[0], 4)
+
+    def test_invalid_rows_fail_fast(self):
+        client = mock.Mock()
+        client.insert_rows_json.return_value = [{"index": 0, "errors": [{"reason": "invalid"}]}]
+        with mock.patch("src.utils.retry.time.sleep") as sleep:
+            with self.assertRaises(PermanentInsertError):
+                insert_rows_with_retry(client, "p.d.t", make_rows(3), logging.getLogger(__name__))
+        self.assertEqual(client.insert_rows_json.call_count, 1)
+        sleep.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+# tests/test_row_fingerprint.py
+import unittest
+
+from src.utils.row_fingerprint import row_fingerprint, row_fingerprints
+
+
+class TestRowFingerprint(unittest.TestCase):
+
+    def test_fingerprint_is_stable(self):
+        # 値が変わると既存行との重複排除ができなくなるため固定値で確認
+        # BigQuery 側の FINGERPRINT_SQL と同じ値になる必要がある
+        self.assertEqual(row_fingerprint("2024-11-01", "https://a", "q"), "76a8aad0e418a4bfc583bd03b483cbee")
+
+    def test_fields_are_not_ambiguous(self):
+        self.assertNotEqual(row_fingerprint("2024-11-01", "https://a", "bq"),
+                            row_fingerprint("2024-11-01", "https://ab", "q"))
+        self.assertNotEqual(row_fingerprint("2024-11-01", "https://a", "q"),
+                            row_fingerprint("2024-11-02", "https://a", "q"))
+
+    def test_batch_matches_single(self):
+        pairs = [("https://www.juku.st/a", "q1"), ("https://www.juku.st/b", "q2"), ("https://www.juku.st/a", "")]
+        self.assertEqual(row_fingerprints("2024-11-01", pairs),
+                         [row_fingerprint("2024-11-01", url, query) for url, query in pairs])
+
+
+if __name__ == '__main__':
+    unittest.main()
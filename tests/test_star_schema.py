@@ -0,0 +1,99 @@
+# tests/test_star_schema.py
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from google.api_core.exceptions import NotFound
+
+from modules.star_schema import DimensionStore
+
+TABLE_ID = "project.dataset.dim_url"
+
+
+def make_client(existing=None, table_exists=True):
+    """SELECT に既存のID対応を返すクライアントのモック"""
+    client = mock.Mock()
+    client.insert_rows_json.return_value = []
+    if not table_exists:
+        client.get_table.side_effect = NotFound("table not found")
+
+    def query(sql, **kwargs):
+        job = mock.Mock()
+        if sql.lstrip().startswith("SELECT"):
+            job.result.return_value = [SimpleNamespace(id=value_id, value=value)
+                                       for value, value_id in (existing or {}).items()]
+        return job
+
+    client.query.side_effect = query
+    return client
+
+
+class TestDimensionStore(unittest.TestCase):
+
+    def test_new_values_get_ids_after_existing_max(self):
+        client = make_client({"https://www.juku.st/": 1, "https://www.juku.st/info/1": 7})
+        store = DimensionStore(client, TABLE_ID, "url", "url_id")
+        ids = store.ids_for(["https://www.juku.st/info/1", "https://www.juku.st/info/2",
+                             "https://www.juku.st/info/3", "https://www.juku.st/info/2"])
+        self.assertEqual(ids, [7, 8, 9, 8])
+
+        store.flush()
+        rows = client.insert_rows_json.call_args.args[1]
+        self.assertEqual([(row["url_id"], row["url"]) for row in rows],
+                         [(8, "https://www.juku.st/info/2"), (9, "https://www.juku.st/info/3")])
+        self.assertEqual(client.insert_rows_json.call_args.kwargs["row_ids"], ["8", "9"])
+
+    def test_reload_keeps_assigned_ids(self):
+        client = make_client({"https://www.juku.st/info/1": 1})
+        first = DimensionStore(client, TABLE_ID, "url", "url_id")
+        first.ids_for(["https://www.juku.st/info/2"])
+        first.flush()
+
+        # 追記済みのID対応を次回の実行で読み込む
+        added = {row["url"]: row["url_id"] for row in client.insert_rows_json.call_args.args[1]}
+        second = DimensionStore(make_client({"https://www.juku.st/info/1": 1, **added}), TABLE_ID, "url", "url_id")
+        self.assertEqual(second.ids_for(["https://www.juku.st/info/2", "https://www.juku.st/info/1",
+                                         "https://www.juku.st/info/3"]), [2, 1, 3])
+
+    def test_fresh_table_is_appended_with_load_job(self):
+        client = make_client(table_exists=False)
+        store = DimensionStore(client, TABLE_ID, "url", "url_id")
+        store.ids_for(["https://www.juku.st/"])
+        store.flush()
+        client.load_table_from_json.assert_called_once()
+        client.insert_rows_json.assert_not_called()
+
+    def test_flush_waits_for_other_threads_insert(self):
+        client = make_client()
+        store = DimensionStore(client, TABLE_ID, "url", "url_id")
+        inserting = threading.Event()
+        release = threading.Event()
+
+        def slow_insert(table_id, rows, row_ids=None):
+            inserting.set()
+            release.wait(5)
+            return []
+
+        client.insert_rows_json.side_effect = slow_insert
+        store.ids_for(["https://www.juku.st/info/1"])
+        first = threading.Thread(target=store.flush)
+        first.start()
+        inserting.wait(5)
+
+        # 先行の flush が追記中のIDを参照する呼び出し元は、追記の完了まで待つ
+        store.ids_for(["https://www.juku.st/info/1"])
+        second = threading.Thread(target=store.flush)
+        second.start()
+        second.join(0.2)
+        self.assertTrue(second.is_alive())
+
+        release.set()
+        first.join(5)
+        second.join(5)
+        self.assertFalse(second.is_alive())
+        self.assertEqual(client.insert_rows_json.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
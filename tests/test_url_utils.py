@@ -1,6 +1,25 @@
 # tests/test_url_utils.py
+import random
+import string
 import unittest
-from src.utils.url_utils import normalize_url, aggregate_records
+from unittest import mock
+from src.utils import record_batch
+from src.utils.record_batch import RecordBatch
+from src.utils.url_utils import (
+    normalize_url, normalize_url_stats, aggregate_records, aggregate_records_python,
+    merge_aggregated_records,
+    _normalize_url_fast, _normalize_url_slow
+)
+
+
+def random_url(rnd):
+    # 高速パスの判定を誤りやすい要素（大文字スキーム・空ホスト・IPv6・';'・空白・非ASCII）を混ぜたURL
+    scheme = rnd.choice(["https://", "http://", "HTTPS://", "ftp://", "", "//", "http:", "https:///"])
+    netloc = rnd.choice(["www.juku.st", "", "user@www.juku.st:8080", "[::1]", "xn--eckwd4c7c.jp", "塾.jp"])
+    alphabet = string.ascii_letters + string.digits + "/-._~%;:=&+ ?#\t日本"
+    path = "".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 20)))
+    return scheme + netloc + path
+
 
 class TestURLUtils(unittest.TestCase):
 
@@ -55,6 +74,87 @@ class TestURLUtils(unittest.TestCase):
         # ソートして比較
         self.assertEqual(sorted(result, key=lambda x: (x['query'], x['url'])),
                          sorted(expected, key=lambda x: (x['query'], x['url'])))
+        self.assertEqual(aggregate_records(RecordBatch.from_rows(records)), result)
+
+    def test_pandas_matches_python(self):
+        rnd = random.Random(0)
+        records = [
+            {
+                'keys': [f'query{rnd.randint(0, 50)}', f'https://www.juku.st/info/entry/{rnd.randint(0, 20)}?p={rnd.randint(0, 3)}#top'],
+                'clicks': rnd.randint(0, 5),
+                'impressions': rnd.randint(1, 100),
+                'position': rnd.random() * 20
+            }
+            for _ in range(3000)
+        ]
+        records.append({'keys': ['query1', 'https://www.juku.st/info/entry/1']})
+
+        expected = aggregate_records_python(records)
+        batch = RecordBatch.from_rows(records)
+        python_result = batch.aggregate(include_state=True)
+        with mock.patch.object(record_batch, "PANDAS_MIN_RECORDS", 0):
+            result = aggregate_records(RecordBatch.from_rows(records))
+            pandas_result = batch.aggregate(include_state=True)
+        # キーの出現順・値の型・浮動小数点の合計値（逐次加算）も含めて完全に一致すること
+        self.assertEqual(result, expected)
+        self.assertEqual(pandas_result, python_result)
+        for actual in pandas_result:
+            self.assertIsInstance(actual['clicks'], int)
+            self.assertIsInstance(actual['position_count'], int)
+            self.assertIsInstance(actual['avg_position'], float)
+        with mock.patch.object(record_batch, "PANDAS_MIN_RECORDS", 0):
+            self.assertEqual(aggregate_records(RecordBatch.from_rows([])), [])
+
+    def test_normalize_url_matches_urlparse(self):
+        rnd = random.Random(20241101)
+        for _ in range(5000):
+            url = random_url(rnd)
+            try:
+                expected = _normalize_url_slow(url)
+            except ValueError:
+                with self.assertRaises(ValueError):
+                    normalize_url(url)
+                continue
+            self.assertEqual(normalize_url(url), expected, url)
+
+    def test_normalize_url_fast_path_and_stats(self):
+        self.assertEqual(_normalize_url_fast("https://www.juku.st/info/entry/843?a=1#top"),
+                         "https://www.juku.st/info/entry/843")
+        self.assertIsNone(_normalize_url_fast("HTTPS://www.juku.st/a"))
+
+        before = normalize_url_stats()
+        for _ in range(3):
+            normalize_url("https://www.juku.st/info/entry/stats-test?param=value")
+        after = normalize_url_stats()
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 2)
+
+    def test_merge_partial_aggregates(self):
+        rnd = random.Random(1)
+        records = [
+            {
+                'keys': [f'query{rnd.randint(0, 10)}', f'https://www.juku.st/info/entry/{rnd.randint(0, 5)}?p={rnd.randint(0, 3)}'],
+                'clicks': rnd.randint(0, 5),
+                'impressions': rnd.randint(1, 100),
+                'position': rnd.random() * 20
+            }
+            for _ in range(400)
+        ]
+        pages = [aggregate_records(records[i:i + 100], include_state=True) for i in range(0, len(records), 100)]
+        merged = {(r['query'], r['url']): r for r in merge_aggregated_records(*pages)}
+        whole = aggregate_records(records, include_state=True)
+
+        self.assertEqual(len(merged), len(whole))
+        for expected in whole:
+            actual = merged[(expected['query'], expected['url'])]
+            self.assertEqual((actual['clicks'], actual['impressions'], actual['position_count']),
+                             (expected['clicks'], expected['impressions'], expected['position_count']))
+            for name in ('avg_position', 'position_sum', 'weighted_position_sum'):
+                self.assertAlmostEqual(actual[name], expected[name], places=9)
+        with mock.patch.object(record_batch, "PANDAS_MIN_RECORDS", 0):
+            batch_records = aggregate_records(RecordBatch.from_rows(records), include_state=True)
+        self.assertEqual(batch_records[0].keys(), whole[0].keys())
+
 
 if __name__ == '__main__':
     unittest.main()